@@ -0,0 +1,66 @@
+# Copyright 2010 Dirk Holtwick, holtwick.it
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Time the rendering of long tables.
+
+    python benchmark_tables.py 10000 100000 1000000
+"""
+
+import argparse
+import io
+import time
+
+from xhtml2pdf import pisa
+
+HTML = """
+<html>
+<head>
+<style>
+@page {{ size: a4; margin: 2cm; }}
+td, th {{ padding: 2px; border-bottom: 0.5px solid #999; }}
+</style>
+</head>
+<body>
+<table repeat="1">
+<tr><th>Number</th><th>Name</th><th>Amount</th></tr>
+{rows}
+</table>
+</body>
+</html>
+"""
+
+
+def tableHTML(rows):
+    return HTML.format(
+        rows="\n".join(
+            f"<tr><td>{i}</td><td>Row number {i}</td><td>{i * 1.5:.2f}</td></tr>"
+            for i in range(rows)
+        )
+    )
+
+
+def benchmark(rows):
+    html = tableHTML(rows)
+    start = time.perf_counter()
+    pdf = pisa.pisaDocument(html, io.BytesIO())
+    elapsed = time.perf_counter() - start
+    print(f"{rows:>9} rows {elapsed:>9.2f} s {'error' if pdf.err else 'ok'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("rows", nargs="*", type=int, default=[10000, 100000, 1000000])
+    for rows in parser.parse_args().rows:
+        benchmark(rows)
@@ -1,12 +1,15 @@
 # ruff: noqa: RUF001
 import io
-from unittest import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase, mock
 
 from pypdf import PdfReader
 from reportlab.pdfbase import _cidfontdata
 
+from xhtml2pdf import util
+from xhtml2pdf.context import pisaContext
 from xhtml2pdf.document import pisaDocument
-from xhtml2pdf.util import get_default_asian_font
+from xhtml2pdf.util import AsianFontRegistry, get_default_asian_font
 
 
 class AsianFontSupportTests(TestCase):
@@ -139,6 +142,29 @@ class AsianFontSupportTests(TestCase):
             DEFAULT_ASIAN_FONT, {}, "get_default_asian_font return an empty dict!"
         )
 
+    def test_asian_font_registered_once(self):
+        """Tests if each asian font is created once, also from many threads"""
+        registry = AsianFontRegistry()
+        with mock.patch.object(
+            util, "UnicodeCIDFont", side_effect=util.UnicodeCIDFont
+        ) as cid_font, ThreadPoolExecutor(8) as executor:
+            list(executor.map(registry.register, ["HeiseiMin-W3"] * 32))
+            registry.register("STSong-Light")
+            registry.register("Helvetica")
+
+        self.assertEqual(
+            [call.args for call in cid_font.call_args_list],
+            [("HeiseiMin-W3",), ("STSong-Light",)],
+        )
+
+    def test_asian_font_name(self):
+        """Tests if asian font names are found in any case"""
+        with mock.patch.object(util.asian_fonts, "register") as register:
+            font = pisaContext().getFontName("Unknown, hysmyeongjo-MEDIUM")
+
+        self.assertEqual(font, "HYSMyeongJo-Medium")
+        register.assert_called_once_with("HYSMyeongJo-Medium")
+
     def test_asian_reportlab_fonts(self):
         """
         Tests the asian font list that we're getting from reportlab
@@ -1,12 +1,29 @@
+import base64
 import io
+import json
 import os
+import re
 import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from email.message import Message
 from importlib.util import find_spec
-from unittest import TestCase, skipIf
+from pathlib import Path
+from unittest import TestCase, mock, skipIf
 
 from pypdf import PdfReader
 
+from xhtml2pdf import files, xhtml2pdf_reportlab
+from xhtml2pdf.builders.segments import DocumentSegments
 from xhtml2pdf.document import pisaDocument
+from xhtml2pdf.files import (
+    FetchBudget,
+    LocalFileURI,
+    TmpFiles,
+    files_tmp,
+    getFile,
+    pisaTempFile,
+)
 
 DENKER_TRANSPARENT = os.path.join(
     os.path.dirname(__file__), "samples", "img", "denker-transparent.png"
@@ -14,6 +31,10 @@ DENKER_TRANSPARENT = os.path.join(
 
 TREE = os.path.join(os.path.dirname(__file__), "samples", "img", "tree.jpg")
 
+NOTO_SANS = os.path.join(
+    os.path.dirname(__file__), "samples", "font", "Noto_Sans", "NotoSans-Regular.ttf"
+)
+
 HTML_CONTENT: str = """<!DOCTYPE html>
 <html>
 <head>
@@ -166,8 +187,7 @@ class DocumentTest(TestCase):
         css = f"""<style>@page {{@frame {{left: 10pt}}}}
               @page two {{background-image: url('{DENKER_TRANSPARENT}'); @frame {{left: 10 pt}}}}</style>"""
         marker_text = "Backgrounds should start from this page onwards."
-        extra_html = (
-            f"""
+        extra_html = f"""
                 <div>
                     <pdf:toc>
                 </div>
@@ -176,9 +196,7 @@ class DocumentTest(TestCase):
                 <h1>Hello, world!</h1>
                 <!-- special text we can test on. -->
                 <p>{marker_text}</p>
-            """
-            + """<h1>Hello, world!</h1>\n""" * 100
-        )
+            """ + """<h1>Hello, world!</h1>\n""" * 100
 
         with tempfile.TemporaryFile() as pdf_file:
             pisaDocument(
@@ -191,10 +209,16 @@ class DocumentTest(TestCase):
             seen_marker_text = False
             for page in pdf_reader.pages:
                 seen_marker_text |= marker_text in page.extract_text()
+                # The page numbers of the toc are form XObjects
+                backgrounds = [
+                    name
+                    for name in page["/Resources"].get("/XObject", {})
+                    if not name.startswith("/FormXob.pisaDeferred")
+                ]
                 if seen_marker_text:
-                    self.assertIn("/XObject", page["/Resources"])
+                    self.assertTrue(backgrounds)
                 else:
-                    self.assertNotIn("/XObject", page["/Resources"])
+                    self.assertFalse(backgrounds)
 
             assert seen_marker_text
 
@@ -347,3 +371,421 @@ class DocumentTest(TestCase):
                 dest=in_memory_file,
             )
             self.assertGreater(len(in_memory_file.getvalue()), 0)
+
+    def _page_count_document(self) -> PdfReader:
+        extra_html = "<p>Page <pdf:pagenumber/> of <pdf:pagecount/></p>\n" * 12
+        extra_html = extra_html.replace("<p>", '<p style="page-break-after: always">')
+        return self._multi_build_document(extra_html)
+
+    def _multi_build_document(self, extra_html: str) -> PdfReader:
+        with mock.patch.object(
+            xhtml2pdf_reportlab.PmlBaseDoc,
+            "multiBuild",
+            autospec=True,
+            side_effect=xhtml2pdf_reportlab.PmlBaseDoc.multiBuild,
+        ) as multiBuild:
+            context = pisaDocument(HTML_CONTENT.format(head="", extra_html=extra_html))
+        self.multiBuild = multiBuild
+        return PdfReader(context.dest)
+
+    def test_document_page_count_in_one_pass(self) -> None:
+        pdf_reader = self._page_count_document()
+
+        self.multiBuild.assert_not_called()
+        self.assertEqual(len(pdf_reader.pages), 13)
+        # Written into the text, it's extracted with it
+        for i, page in enumerate(pdf_reader.pages[:-1], 1):
+            self.assertIn(f"Page {i} of 13", page.extract_text())
+            self.assertNotIn("/XObject", page["/Resources"])
+
+    def test_document_page_count_changing_layout(self) -> None:
+        with mock.patch.object(
+            xhtml2pdf_reportlab,
+            "stringWidth",
+            side_effect=lambda text, *_args: len(set(text)),
+        ):
+            pdf_reader = self._page_count_document()
+
+        self.multiBuild.assert_called_once()
+        self.assertEqual(len(pdf_reader.pages), 13)
+        self.assertIn("Page 1 of 13", pdf_reader.pages[0].extract_text())
+
+    def test_document_toc_in_one_pass(self) -> None:
+        extra_html = "<pdf:toc />" + "".join(
+            f'<h1 style="page-break-before: always">Chapter {i}</h1>'
+            for i in range(1, 4)
+        )
+        pdf_reader = self._multi_build_document(extra_html)
+
+        self.multiBuild.assert_not_called()
+        self.assertEqual(len(pdf_reader.pages), 4)
+        toc_text = pdf_reader.pages[-1].extract_text()
+        for i in range(1, 4):
+            self.assertIn(f"Chapter {i}", toc_text)
+        self.assertEqual(
+            re.findall(r"^\d+$", toc_text, re.MULTILINE), ["1", "2", "3", "4"]
+        )
+
+    def test_document_toc_changing_entries(self) -> None:
+        extra_html = "<pdf:toc />" + "".join(
+            f'<h1 style="page-break-before: always">Chapter {i}</h1>'
+            for i in range(1, 4)
+        )
+        with mock.patch.object(
+            xhtml2pdf_reportlab.PmlTableOfContents,
+            "isDeferredSatisfied",
+            return_value=False,
+        ):
+            pdf_reader = self._multi_build_document(extra_html)
+
+        self.multiBuild.assert_called_once()
+        self.assertEqual(len(pdf_reader.pages), 4)
+        self.assertEqual(
+            re.findall(r"^\d+$", pdf_reader.pages[-1].extract_text(), re.MULTILINE),
+            ["1", "2", "3", "4"],
+        )
+
+    def _segments_document(
+        self, extra_html: str, parallel: int, link_callback=None, cpu_count: int = 4
+    ) -> PdfReader:
+        head = """<style>
+        @page {
+            @frame footer { -pdf-frame-content: footer; bottom: 1cm; height: 1cm; }
+            @frame content { top: 2cm; bottom: 3cm; }
+        }
+        h1 { page-break-before: always }
+        </style>"""
+        extra_html = (
+            '<div id="footer">Page <pdf:pagenumber/> of <pdf:pagecount/></div>'
+            + extra_html
+            + "".join(
+                f"<h1>Chapter {i}</h1><h2>Section {i}</h2>"
+                + "<p>The quick red fox jumps over the lazy brown dog.</p>" * 20 * i
+                + '<p style="page-break-before: right">Right</p>'
+                for i in range(1, 7)
+            )
+        )
+        with mock.patch.object(
+            DocumentSegments, "join", side_effect=DocumentSegments.join
+        ) as join, mock.patch.object(
+            DocumentSegments, "get_cpu_count", return_value=cpu_count
+        ):
+            context = pisaDocument(
+                HTML_CONTENT.format(head=head, extra_html=extra_html),
+                parallel=parallel,
+                link_callback=link_callback,
+            )
+        self.join = join
+        return PdfReader(context.dest)
+
+    @staticmethod
+    def _outline(pdf_reader: PdfReader, outline: list, level: int = 0) -> list:
+        entries = []
+        for item in outline:
+            if isinstance(item, list):
+                entries += DocumentTest._outline(pdf_reader, item, level + 1)
+            else:
+                entries.append(
+                    (level, item.title, pdf_reader.get_destination_page_number(item))
+                )
+        return entries
+
+    def test_document_parallel_segments(self) -> None:
+        serial = self._segments_document("", 0)
+        parallel = self._segments_document("", 3)
+
+        self.join.assert_called_once()
+        self.assertEqual(len(parallel.pages), len(serial.pages))
+        self.assertEqual(
+            [" ".join(page.extract_text().split()) for page in parallel.pages],
+            [" ".join(page.extract_text().split()) for page in serial.pages],
+        )
+        self.assertIn(
+            f"Page 3 of {len(serial.pages)}", parallel.pages[2].extract_text()
+        )
+        self.assertEqual(
+            self._outline(parallel, parallel.outline),
+            self._outline(serial, serial.outline),
+        )
+
+    def test_document_parallel_segments_with_links(self) -> None:
+        pdf_reader = self._segments_document(
+            '<a href="#end">End</a><a name="end"></a>', 3
+        )
+
+        self.join.assert_not_called()
+        self.assertIn("End", pdf_reader.pages[1].extract_text())
+
+    def test_document_parallel_segments_with_lambda_callback(self) -> None:
+        # The processes get the story by forking, nothing is pickled
+        pdf_reader = self._segments_document("", 3, link_callback=lambda uri, _rel: uri)
+
+        self.join.assert_called_once()
+        self.assertEqual(
+            len(pdf_reader.pages), len(self._segments_document("", 0).pages)
+        )
+
+    def test_document_parallel_segments_with_one_cpu(self) -> None:
+        pdf_reader = self._segments_document("", 3, cpu_count=1)
+
+        self.join.assert_not_called()
+        self.assertEqual(
+            len(pdf_reader.pages), len(self._segments_document("", 0).pages)
+        )
+
+    def test_document_layout_stats(self) -> None:
+        extra_html = (
+            '<p id="intro">Intro</p><table id="numbers"><tr><td>1</td></tr></table>'
+        )
+        context = pisaDocument(
+            HTML_CONTENT.format(head="", extra_html=extra_html), layout_stats=True
+        )
+
+        report = context.layoutStats.report()
+        entries = {(row["type"], row["id"], row["phase"]): row for row in report}
+        self.assertIn(("PmlParagraph", "intro", "wrap"), entries)
+        self.assertIn(("PmlParagraph", "intro", "draw"), entries)
+        self.assertIn(("PmlTable", "numbers", "handle"), entries)
+        self.assertEqual(entries["PmlParagraph", "intro", "placed"]["calls"], 1)
+        table = entries["PmlTable", "numbers", "handle"]
+        self.assertGreaterEqual(table["time"], table["self_time"])
+        self.assertEqual(json.loads(context.layoutStats.toJSON()), report)
+
+    def test_document_layout_stats_off(self) -> None:
+        context = pisaDocument(HTML_CONTENT.format(head="", extra_html=""))
+
+        self.assertIsNone(context.layoutStats)
+
+    def test_document_parallel_segments_layout_stats(self) -> None:
+        with mock.patch.object(
+            DocumentSegments, "join", side_effect=DocumentSegments.join
+        ) as join, mock.patch.object(DocumentSegments, "get_cpu_count", return_value=2):
+            context = pisaDocument(
+                HTML_CONTENT.format(
+                    head="<style>h1 { page-break-before: always }</style>",
+                    extra_html='<h1 id="one">One</h1><h1 id="two">Two</h1>',
+                ),
+                parallel=2,
+                layout_stats=True,
+            )
+
+        join.assert_called_once()
+        entries = {
+            (row["type"], row["id"], row["phase"])
+            for row in context.layoutStats.report()
+        }
+        self.assertIn(("PmlParagraph", "one", "draw"), entries)
+        self.assertIn(("PmlParagraph", "two", "draw"), entries)
+
+    def test_document_keeps_temporary_files_of_other_renders(self) -> None:
+        arena = TmpFiles()
+        with arena.activate():
+            data = base64.b64encode(Path(DENKER_TRANSPARENT).read_bytes()).decode()
+            name = getFile(f"data:image/png;base64,{data}").getNamedFile()
+            pisaDocument(HTML_CONTENT.format(head="", extra_html=""))
+
+            self.assertTrue(os.path.exists(name))
+        self.assertFalse(os.path.exists(name))
+
+    def test_document_keeps_temporary_file_of_destination(self) -> None:
+        # Spills to a temporary file when the PDF is written to it
+        dest = pisaTempFile(capacity=1000)
+        context = pisaDocument(HTML_CONTENT.format(head="", extra_html=""), dest)
+
+        self.assertEqual(context.err, 0)
+        self.assertEqual(dest.strategy, 1)
+        self.assertTrue(dest.getvalue().startswith(b"%PDF"))
+
+    def test_document_concurrent_renders(self) -> None:
+        head = f"""<style>
+        @font-face {{ font-family: Noto; src: url('{NOTO_SANS}'); }}
+        @page {{ background-image: url('{DENKER_TRANSPARENT}'); }}
+        p {{ font-family: Noto }}
+        </style>"""
+
+        def render(i: int) -> tuple:
+            extra_html = f'<p>Render {i}</p><img src="{TREE}">'
+            context = pisaDocument(
+                HTML_CONTENT.format(head=head, extra_html=extra_html)
+            )
+            return context.tmpFiles.files, PdfReader(context.dest)
+
+        with ThreadPoolExecutor(32) as executor:
+            results = list(executor.map(render, range(32)))
+
+        for i, (tmp_files, pdf_reader) in enumerate(results):
+            self.assertEqual(tmp_files, [])
+            self.assertIn(f"Render {i}", pdf_reader.pages[0].extract_text())
+            fonts = pdf_reader.pages[0]["/Resources"]["/Font"].get_object()
+            self.assertIn(
+                "NotoSans", " ".join(str(font["/BaseFont"]) for font in fonts.values())
+            )
+        self.assertEqual(files_tmp.files, [])
+
+    def test_document_fonts_and_backgrounds_from_memory(self) -> None:
+        head = f"""<style>
+        @font-face {{ font-family: Noto; src: url('{NOTO_SANS}'); }}
+        @page {{ background-image: url('{DENKER_TRANSPARENT}'); }}
+        p {{ font-family: Noto }}
+        </style>"""
+        with mock.patch(
+            "tempfile.NamedTemporaryFile", side_effect=tempfile.NamedTemporaryFile
+        ) as named_temporary_file:
+            context = pisaDocument(HTML_CONTENT.format(head=head, extra_html=""))
+
+        named_temporary_file.assert_not_called()
+        pdf_reader = PdfReader(context.dest)
+        fonts = pdf_reader.pages[0]["/Resources"]["/Font"].get_object()
+        self.assertIn(
+            "NotoSans", " ".join(str(font["/BaseFont"]) for font in fonts.values())
+        )
+        self.assertIn("/XObject", pdf_reader.pages[0]["/Resources"])
+
+    def test_document_font_faces_of_one_url(self) -> None:
+        head = """<style>
+        @font-face { font-family: Noto; src: url('https://example.com/noto.ttf'); }
+        @font-face {
+            font-family: Noto; font-weight: bold;
+            src: url('https://example.com/noto.ttf');
+        }
+        p { font-family: Noto }
+        </style>"""
+        response = mock.Mock(status=200, reason="OK", headers=Message())
+        response.getheader.side_effect = lambda name, default=None: {
+            "Content-Type": "font/ttf"
+        }.get(name, default)
+        body = Path(NOTO_SANS).read_bytes()
+
+        for prefetch_workers in (0, 4):
+            with self.subTest(prefetch_workers=prefetch_workers), mock.patch.object(
+                files.http_pool, "request", return_value=(response, body)
+            ):
+                context = pisaDocument(
+                    HTML_CONTENT.format(head=head, extra_html=""),
+                    prefetch_workers=prefetch_workers,
+                )
+
+                self.assertEqual(context.err, 0)
+                self.assertIn("noto_00", context.fontList)
+                self.assertIn("noto_10", context.fontList)
+
+    def test_document_resources_bundle(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            bundle = os.path.join(directory, "bundle.zip")
+            with zipfile.ZipFile(bundle, "w") as archive:
+                archive.writestr(
+                    "manifest.json",
+                    json.dumps({"https://example.com/tree.jpg": "img/tree.jpg"}),
+                )
+                archive.write(TREE, "img/tree.jpg")
+                archive.write(NOTO_SANS, "font/noto.ttf")
+                archive.writestr(
+                    "css/main.css",
+                    "@font-face { font-family: Noto; src: url('../font/noto.ttf') }"
+                    " p { font-family: Noto } h2 { page-break-before: always }",
+                )
+            html = HTML_CONTENT.format(
+                head='<link rel="stylesheet" href="css/main.css">',
+                extra_html='<h2>One</h2><img src="img/tree.jpg">'
+                '<h2>Two</h2><img src="https://example.com/tree.jpg">',
+            )
+            # Nothing is fetched over the network
+            with mock.patch.object(
+                files.http_pool, "request", side_effect=AssertionError
+            ) as request, mock.patch.object(
+                DocumentSegments, "get_cpu_count", return_value=2
+            ):
+                results = [
+                    pisaDocument(
+                        html,
+                        path=os.path.join(directory, "index.html"),
+                        resources=bundle,
+                        parallel=parallel,
+                    )
+                    for parallel in (0, 2)
+                ]
+
+        request.assert_not_called()
+        for context in results:
+            self.assertEqual(context.err, 0)
+            pdf_reader = PdfReader(context.dest)
+            self.assertEqual(len(pdf_reader.pages), 3)
+            fonts = pdf_reader.pages[0]["/Resources"]["/Font"].get_object()
+            self.assertIn(
+                "NotoSans", " ".join(str(font["/BaseFont"]) for font in fonts.values())
+            )
+            self.assertEqual(len(pdf_reader.pages[1].images), 1)
+            self.assertEqual(len(pdf_reader.pages[2].images), 1)
+
+    def test_document_large_files_mapped(self) -> None:
+        head = f"""<style>
+        @font-face {{ font-family: Noto; src: url('{NOTO_SANS}'); }}
+        @page {{
+            background-image: url('{DENKER_TRANSPARENT}');
+            @frame header {{
+                -pdf-frame-content: header; top: 1cm; left: 1cm;
+                width: 5cm; height: 2cm;
+            }}
+        }}
+        p {{ font-family: Noto }}
+        </style>"""
+        extra_html = f"""
+        <div id="header"><img src="{TREE}" width="40" height="40"></div>
+        <img src="{DENKER_TRANSPARENT}">
+        """
+        # Every file is mapped to memory, none is read
+        with mock.patch.object(LocalFileURI, "MMAP_MIN_SIZE", 1), mock.patch.object(
+            Path, "read_bytes", autospec=True
+        ) as read_bytes:
+            context = pisaDocument(
+                HTML_CONTENT.format(head=head, extra_html=extra_html)
+            )
+
+        read_bytes.assert_not_called()
+        self.assertEqual(context.err, 0)
+        pdf_reader = PdfReader(context.dest)
+        fonts = pdf_reader.pages[0]["/Resources"]["/Font"].get_object()
+        self.assertIn(
+            "NotoSans", " ".join(str(font["/BaseFont"]) for font in fonts.values())
+        )
+        # The background, the header and the image
+        self.assertEqual(len(pdf_reader.pages[0].images), 3)
+
+    def test_document_fetch_budget(self) -> None:
+        extra_html = f"""
+        <img src="{TREE}" width="40" height="40">
+        <img src="{DENKER_TRANSPARENT}" width="40" height="40">
+        """
+        context = pisaDocument(
+            HTML_CONTENT.format(head="", extra_html=extra_html),
+            fetch_budget=FetchBudget(max_resources=1, fail_fast=True),
+        )
+
+        self.assertEqual(context.err, 0)
+        records = context.fetchBudget.records
+        self.assertEqual(
+            sorted(str(record["skipped"]) for record in records), ["None", "resources"]
+        )
+        self.assertEqual(context.fetchBudget.resources, 1)
+        # The image over the budget is drawn as a placeholder
+        pdf_reader = PdfReader(context.dest)
+        self.assertEqual(len(pdf_reader.pages[0].images), 2)
+
+    def test_document_fetch_budget_placeholder_of_img_tag(self) -> None:
+        extra_html = """
+        <img src="https://example.com/render?id=1" width="40" height="40">
+        <p style="background-image: url('https://example.com/render?id=2')">Text</p>
+        """
+        with mock.patch.object(
+            files.http_pool, "request", side_effect=AssertionError
+        ) as request, self.assertLogs("xhtml2pdf.files", "WARNING"):
+            context = pisaDocument(
+                HTML_CONTENT.format(head="", extra_html=extra_html),
+                fetch_budget=FetchBudget(max_resources=0, fail_fast=True),
+            )
+
+        request.assert_not_called()
+        self.assertEqual(context.err, 0)
+        # The image of the tag only, whatever its URL
+        pdf_reader = PdfReader(context.dest)
+        self.assertEqual(len(pdf_reader.pages[0].images), 1)
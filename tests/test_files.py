@@ -0,0 +1,665 @@
+from __future__ import annotations
+
+import base64
+import json
+import os
+import pickle
+import socket
+import tempfile
+import threading
+import time
+import urllib.parse
+import zipfile
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO, StringIO
+from pathlib import Path
+from typing import ClassVar
+from unittest import TestCase, mock
+
+from xhtml2pdf import files, pisa
+from xhtml2pdf.config.httpconfig import HttpConfig
+from xhtml2pdf.files import (
+    PLACEHOLDER_IMAGE,
+    BaseFile,
+    BufferReader,
+    BundleFileURI,
+    CachedResource,
+    FetchBudget,
+    HTTPConnectionPool,
+    LocalFileURI,
+    ResourceBundle,
+    ResourceCache,
+    TmpFiles,
+    getFile,
+    mountResources,
+)
+
+IMAGE = Path(__file__).parent / "samples" / "img" / "denker.png"
+
+
+class FilesTest(TestCase):
+    def test_data_fetched_once(self) -> None:
+        file = getFile(str(IMAGE))
+        with mock.patch.object(
+            LocalFileURI,
+            "extract_data",
+            autospec=True,
+            side_effect=LocalFileURI.extract_data,
+        ) as extract_data:
+            self.assertFalse(file.notFound())
+            data = file.getData()
+            name = file.getNamedFile()
+            self.assertEqual(file.getBytesIO().getvalue(), data)
+            self.assertEqual(file.getNamedFile(), name)
+
+        extract_data.assert_called_once()
+        self.assertEqual(data, IMAGE.read_bytes())
+        self.assertEqual(Path(name).read_bytes(), data)
+        self.assertEqual(file.getMimeType(), "image/png")
+
+    def test_data_fetched_again_when_released(self) -> None:
+        file = getFile(str(IMAGE))
+        with mock.patch.object(
+            LocalFileURI,
+            "extract_data",
+            autospec=True,
+            side_effect=LocalFileURI.extract_data,
+        ) as extract_data:
+            file.getData()
+            file.release()
+            self.assertEqual(file.getMimeType(), "image/png")
+            self.assertEqual(file.getData(), IMAGE.read_bytes())
+
+        self.assertEqual(extract_data.call_count, 2)
+
+    def test_local_file_used_by_name(self) -> None:
+        self.assertEqual(getFile(str(IMAGE)).getNamedFile(), str(IMAGE))
+
+    def test_tmp_file_written_in_memory(self) -> None:
+        file = getFile(None, "application/pdf")
+        file.instance.buffer.write(b"%PDF")
+
+        self.assertEqual(file.getBytesIO().getvalue(), b"%PDF")
+        self.assertEqual(Path(file.getNamedFile()).read_bytes(), b"%PDF")
+
+    def test_missing_file_looked_up_once(self) -> None:
+        file = getFile(str(IMAGE.with_name("missing.png")))
+        with mock.patch.object(
+            LocalFileURI,
+            "extract_data",
+            autospec=True,
+            side_effect=LocalFileURI.extract_data,
+        ) as extract_data:
+            self.assertTrue(file.notFound())
+            self.assertIsNone(file.getData())
+
+        extract_data.assert_called_once()
+
+    def test_large_file_mapped(self) -> None:
+        file = getFile(str(IMAGE))
+        with mock.patch.object(LocalFileURI, "MMAP_MIN_SIZE", 1024), mock.patch.object(
+            Path, "read_bytes", autospec=True
+        ) as read_bytes:
+            self.assertFalse(file.notFound())
+            buffer = file.getBuffer()
+            self.assertIsInstance(buffer, memoryview)
+            self.assertEqual(file.getBytesIO().read(), buffer)
+            self.assertEqual(file.getNamedFile(), str(IMAGE))
+
+        read_bytes.assert_not_called()
+        self.assertEqual(buffer, IMAGE.read_bytes())
+        # A copy of the mapped data
+        self.assertIsInstance(file.getData(), bytes)
+        self.assertEqual(file.getData(), IMAGE.read_bytes())
+        self.assertEqual(file.getMimeType(), "image/png")
+
+    def test_mapped_file_unmapped(self) -> None:
+        for end in ("release", "render"):
+            with self.subTest(end), mock.patch.object(
+                LocalFileURI, "MMAP_MIN_SIZE", 1024
+            ):
+                with TmpFiles().activate():
+                    file = getFile(str(IMAGE))
+                    buffer = file.getBuffer()
+                    mapping = file.instance._mapping
+                    if end == "release":
+                        file.release()
+                        self.assertTrue(mapping.closed)
+
+                self.assertTrue(mapping.closed)
+                with self.assertRaises(ValueError):
+                    buffer.tobytes()
+                # Mapped again once needed again
+                self.assertEqual(file.getData(), IMAGE.read_bytes())
+                file.release()
+
+    def test_small_file_read(self) -> None:
+        file = getFile(str(IMAGE))
+
+        self.assertEqual(file.getBuffer(), IMAGE.read_bytes())
+        self.assertIsInstance(file.getBytesIO(), BytesIO)
+
+    def test_data_uri_decoded_once(self) -> None:
+        uri = "data:image/png;base64," + base64.b64encode(IMAGE.read_bytes()).decode()
+        with mock.patch.object(files, "data_uri_cache", ResourceCache()) as cache:
+            data = getFile(uri).getData()
+            file = getFile(uri)
+            self.assertIs(file.getData(), data)
+
+        self.assertEqual(data, IMAGE.read_bytes())
+        self.assertEqual(file.getMimeType(), "image/png")
+        self.assertEqual(cache.metrics["misses"], 1)
+        self.assertEqual(cache.metrics["hits"], 1)
+
+    def test_percent_encoded_data_uri(self) -> None:
+        encoded = base64.b64encode(IMAGE.read_bytes()).decode()
+        uri = "data:image/png;foo=bar;base64," + urllib.parse.quote(encoded)
+        self.assertIn("%", uri)
+        file = getFile(uri)
+
+        self.assertEqual(file.getData(), IMAGE.read_bytes())
+        self.assertEqual(file.instance.mime_params, ["foo=bar", ""])
+
+    def test_malformed_data_uri(self) -> None:
+        with self.assertLogs("xhtml2pdf.files", "ERROR"):
+            self.assertTrue(getFile("data:image/png,iVBORw0KGgo=").notFound())
+
+    def test_buffer_reader(self) -> None:
+        reader = BufferReader(memoryview(b"0123456789"))
+
+        self.assertEqual(reader.read(3), b"012")
+        self.assertEqual(reader.seek(-2, os.SEEK_END), 8)
+        self.assertEqual(reader.read(5), b"89")
+        self.assertEqual(reader.read(), b"")
+        reader.seek(2)
+        buffer = bytearray(4)
+        self.assertEqual(reader.readinto(buffer), 4)
+        self.assertEqual(buffer, b"2345")
+        self.assertEqual(reader.tell(), 6)
+        reader.seek(1, os.SEEK_CUR)
+        self.assertEqual(reader.read(), b"789")
+        self.assertEqual(reader.getvalue(), b"0123456789")
+
+
+class AssetHandler(BaseHTTPRequestHandler):
+    """
+    Serves the same logo with the caching headers named by the path, a
+    redirect, a missing file, the logo after a delay or after an error.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    HEADERS: ClassVar[dict[str, dict[str, str]]] = {
+        "/fresh": {"Cache-Control": "max-age=60"},
+        "/etag": {"Cache-Control": "no-cache", "ETag": '"v1"'},
+        "/modified": {"Last-Modified": "Mon, 05 Oct 2026 10:00:00 GMT"},
+        "/private": {"Cache-Control": "private, max-age=60"},
+        "/plain": {},
+    }
+
+    def do_GET(self) -> None:
+        self.server.requests[self.path] += 1
+        self.server.connections.add(self.client_address)
+        if self.path in {"/moved", "/missing"}:
+            self.send_response(302 if self.path == "/moved" else 404)
+            self.send_header("Location", "/fresh")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path == "/unavailable" and self.server.requests[self.path] < 2:
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path == "/slow":
+            time.sleep(0.5)
+        headers = self.HEADERS.get(self.path, {})
+        etag = headers.get("ETag")
+        if (etag and self.headers["If-None-Match"] == etag) or (
+            "Last-Modified" in headers
+            and self.headers["If-Modified-Since"] == headers["Last-Modified"]
+        ):
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = IMAGE.read_bytes()
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+class AssetServerTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), AssetHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self) -> None:
+        self.server.requests = Counter()
+        self.server.connections = set()
+
+
+class ResourceCacheTest(AssetServerTestCase):
+    def fetch(self, cache: ResourceCache, path: str, times: int = 2) -> list:
+        with mock.patch.object(files, "resource_cache", cache):
+            return [getFile(self.base + path).getData() for _ in range(times)]
+
+    def test_fresh_response_served_from_memory(self) -> None:
+        cache = ResourceCache()
+
+        data = self.fetch(cache, "/fresh")
+
+        self.assertEqual(data, [IMAGE.read_bytes()] * 2)
+        self.assertEqual(self.server.requests["/fresh"], 1)
+        self.assertEqual(cache.metrics["misses"], 1)
+        self.assertEqual(cache.metrics["hits"], 1)
+        self.assertEqual(cache.metrics["bytes_served"], len(data[0]))
+        self.assertEqual(cache.metrics["bytes_fetched"], len(data[0]))
+
+    def test_stale_response_revalidated(self) -> None:
+        for path in ("/etag", "/modified"):
+            with self.subTest(path):
+                cache = ResourceCache()
+
+                data = self.fetch(cache, path, 3)
+
+                self.assertEqual(data, [IMAGE.read_bytes()] * 3)
+                self.assertEqual(self.server.requests[path], 3)
+                self.assertEqual(cache.metrics["misses"], 1)
+                self.assertEqual(cache.metrics["revalidations"], 2)
+                self.assertEqual(cache.metrics["bytes_fetched"], len(data[0]))
+
+    def test_uncacheable_response_fetched_again(self) -> None:
+        for path in ("/private", "/plain"):
+            with self.subTest(path):
+                cache = ResourceCache()
+
+                self.fetch(cache, path)
+
+                self.assertEqual(self.server.requests[path], 2)
+                self.assertEqual(cache.metrics["misses"], 2)
+
+    def test_response_kept_on_disk(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            self.fetch(ResourceCache(directory=directory), "/fresh", 1)
+            cache = ResourceCache(directory=directory)
+
+            data = self.fetch(cache, "/fresh", 1)
+
+        self.assertEqual(data, [IMAGE.read_bytes()])
+        self.assertEqual(self.server.requests["/fresh"], 1)
+        self.assertEqual(cache.metrics["hits"], 1)
+
+    def test_concurrent_stores_on_disk(self) -> None:
+        key = self.base + "/fresh"
+        loaded = []
+
+        def store(n: int) -> None:
+            resource = CachedResource(bytes([n]) * 64 * 1024, None, etag=str(n))
+            for _ in range(20):
+                ResourceCache(directory=directory).put(key, resource)
+                loaded.append(ResourceCache(directory=directory).get(key))
+
+        with tempfile.TemporaryDirectory() as directory:
+            threads = [threading.Thread(target=store, args=(n,)) for n in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            leftovers = list(Path(directory).glob("*.tmp"))
+            last = ResourceCache(directory=directory).get(key)
+
+        self.assertEqual(leftovers, [])
+        self.assertIsNotNone(last)
+        for resource in [*loaded, last]:
+            if resource is not None:
+                self.assertEqual(resource.data, bytes([int(resource.etag)]) * 64 * 1024)
+
+    def test_least_recently_used_evicted(self) -> None:
+        cache = ResourceCache(max_bytes=len(IMAGE.read_bytes()))
+
+        self.fetch(cache, "/fresh", 1)
+        self.fetch(cache, "/etag", 1)
+        self.fetch(cache, "/fresh", 1)
+
+        self.assertEqual(self.server.requests["/fresh"], 2)
+
+    def test_local_file_cached_until_modified(self) -> None:
+        cache = ResourceCache()
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "style.css"
+            path.write_text("p { color: red }")
+            with mock.patch.object(files, "resource_cache", cache):
+                first = getFile(str(path)).getData()
+                second = getFile(str(path)).getData()
+                path.write_text("p { color: blue }")
+                os.utime(path, ns=(0, path.stat().st_mtime_ns + 10**9))
+                third = getFile(str(path)).getData()
+
+        self.assertEqual(first, second)
+        self.assertEqual(third, b"p { color: blue }")
+        self.assertEqual(cache.metrics["hits"], 1)
+        self.assertEqual(cache.metrics["misses"], 2)
+
+
+class HTTPConnectionPoolTest(AssetServerTestCase):
+    def fetch_all(self, pool: HTTPConnectionPool, paths: list) -> list:
+        with mock.patch.object(files, "http_pool", pool):
+            return [getFile(self.base + path).getData() for path in paths]
+
+    def test_connection_reused(self) -> None:
+        pool = HTTPConnectionPool(HttpConfig())
+
+        data = self.fetch_all(pool, ["/fresh", "/etag", "/plain"])
+
+        self.assertEqual(data, [IMAGE.read_bytes()] * 3)
+        self.assertEqual(len(self.server.connections), 1)
+
+    def test_idle_connection_evicted(self) -> None:
+        config = HttpConfig()
+        config.is_http_config("--http_pool_idle_timeout", "0")
+        pool = HTTPConnectionPool(config)
+
+        self.fetch_all(pool, ["/fresh", "/fresh"])
+
+        self.assertEqual(len(self.server.connections), 2)
+
+    def test_closed_connection_replaced(self) -> None:
+        pool = HTTPConnectionPool(HttpConfig())
+        self.fetch_all(pool, ["/fresh"])
+        for connections in pool._idle.values():
+            for _since, conn in connections:
+                conn.sock.shutdown(socket.SHUT_RDWR)
+
+        data = self.fetch_all(pool, ["/fresh"])
+
+        self.assertEqual(data, [IMAGE.read_bytes()])
+
+    def test_redirect_followed(self) -> None:
+        pool = HTTPConnectionPool(HttpConfig())
+
+        data = self.fetch_all(pool, ["/moved"])
+
+        self.assertEqual(data, [IMAGE.read_bytes()])
+        self.assertEqual(self.server.requests["/fresh"], 1)
+
+    def test_too_many_redirects(self) -> None:
+        config = HttpConfig()
+        config.is_http_config("--http_max_redirects", "0")
+
+        data = self.fetch_all(HTTPConnectionPool(config), ["/moved"])
+
+        self.assertEqual(data, [None])
+
+    def test_connection_settings(self) -> None:
+        config = HttpConfig()
+        config.is_http_config("--http_timeout", "2.5")
+        config.is_http_config("--http_pool_maxsize", "2")
+        config.is_http_config("--http_nosslcheck", "")
+
+        self.assertEqual(config["timeout"], 2.5)
+        self.assertEqual(config["pool_maxsize"], 2)
+        self.assertEqual(
+            set(config.get_connection_kwargs(https=True)), {"timeout", "context"}
+        )
+        self.assertEqual(config.get_connection_kwargs(https=False), {"timeout": 2.5})
+
+
+class FetchBudgetTest(AssetServerTestCase):
+    @staticmethod
+    def fetch(budget: FetchBudget, *uris: str) -> list:
+        with budget.activate():
+            files = [getFile(uri) for uri in uris]
+        return [file.getData() for file in files]
+
+    def test_fetches_recorded(self) -> None:
+        budget = FetchBudget()
+
+        data = self.fetch(budget, self.base + "/plain", str(IMAGE))
+
+        self.assertEqual(data, [IMAGE.read_bytes()] * 2)
+        self.assertEqual(
+            [
+                (record["uri"], record["type"], record["bytes"], record["status"])
+                for record in budget.records
+            ],
+            [
+                (self.base + "/plain", "NetworkFileUri", len(data[0]), 200),
+                (str(IMAGE), "LocalFileURI", len(data[0]), None),
+            ],
+        )
+        self.assertEqual(budget.bytes, 2 * len(data[0]))
+        self.assertEqual(budget.resources, 2)
+
+    def test_inline_files_not_counted(self) -> None:
+        budget = FetchBudget(max_resources=0)
+        uri = "data:image/png;base64," + base64.b64encode(IMAGE.read_bytes()).decode()
+
+        self.assertEqual(self.fetch(budget, uri), [IMAGE.read_bytes()])
+        self.assertEqual(budget.records, [])
+
+    def test_limits(self) -> None:
+        for budget, limit in (
+            (FetchBudget(max_resources=1), "resources"),
+            (FetchBudget(max_bytes=1), "bytes"),
+        ):
+            with self.subTest(limit):
+                self.setUp()
+                with self.assertLogs("xhtml2pdf.files", "WARNING"):
+                    data = self.fetch(
+                        budget, self.base + "/plain", self.base + "/fresh"
+                    )
+
+                self.assertEqual(data, [IMAGE.read_bytes(), None])
+                self.assertEqual(self.server.requests["/fresh"], 0)
+                self.assertEqual(
+                    [record["skipped"] for record in budget.records], [None, limit]
+                )
+
+    def test_skipped_files_recorded_by_uri(self) -> None:
+        budget = FetchBudget(max_resources=2)
+
+        with budget.activate():
+            files = [
+                getFile(IMAGE.name, str(IMAGE.parent)),
+                getFile("plain", self.base + "/"),
+                getFile(IMAGE.name, str(IMAGE.parent)),
+                getFile("plain", self.base + "/"),
+            ]
+        with self.assertLogs("xhtml2pdf.files", "WARNING"):
+            for file in files:
+                file.getData()
+
+        self.assertEqual(
+            [(record["uri"], record["skipped"]) for record in budget.records],
+            [
+                (str(IMAGE), None),
+                (self.base + "/plain", None),
+                (str(IMAGE), "resources"),
+                (self.base + "/plain", "resources"),
+            ],
+        )
+
+    def test_request_timed_out_at_time_limit(self) -> None:
+        budget = FetchBudget(max_time=0.2)
+        start = time.monotonic()
+
+        with self.assertLogs("xhtml2pdf.files", "ERROR"):
+            data = self.fetch(budget, self.base + "/slow")
+
+        self.assertEqual(data, [None])
+        self.assertLess(time.monotonic() - start, 0.5)
+        # Not tried again, the time is up
+        self.assertEqual(self.server.requests["/slow"], 1)
+        self.assertEqual(budget.get_exhausted(), "time")
+
+    def test_missing_file_not_requested_again(self) -> None:
+        self.assertEqual(self.fetch(FetchBudget(), self.base + "/missing"), [None])
+        self.assertEqual(self.server.requests["/missing"], 1)
+
+    def test_server_error_requested_again(self) -> None:
+        self.assertEqual(
+            self.fetch(FetchBudget(), self.base + "/unavailable"), [IMAGE.read_bytes()]
+        )
+        self.assertEqual(self.server.requests["/unavailable"], 2)
+
+    def test_placeholder_image(self) -> None:
+        budget = FetchBudget(max_resources=0, fail_fast=True)
+
+        with budget.activate():
+            files = [getFile(self.base + "/render?id=1"), getFile(str(IMAGE))]
+        with self.assertLogs("xhtml2pdf.files", "WARNING"):
+            data = [file.getData() for file in files]
+
+        self.assertEqual(data, [None, None])
+        self.assertEqual(self.server.requests["/render?id=1"], 0)
+        for file in files:
+            self.assertEqual(file.getPlaceholder(), PLACEHOLDER_IMAGE)
+            self.assertEqual(file.getMimeType(), "image/png")
+        # Only when the budget fails fast
+        with FetchBudget(max_resources=0).activate():
+            file = getFile(str(IMAGE))
+        with self.assertLogs("xhtml2pdf.files", "WARNING"):
+            self.assertIsNone(file.getData())
+        self.assertIsNone(file.getPlaceholder())
+
+    def test_budget_merged(self) -> None:
+        budget = FetchBudget(max_resources=2)
+        segment = FetchBudget()
+        self.fetch(budget, str(IMAGE))
+        self.fetch(segment, str(IMAGE))
+
+        budget.merge(segment.records, segment.bytes, segment.resources)
+
+        self.assertEqual([record["uri"] for record in budget.records], [str(IMAGE)] * 2)
+        self.assertEqual(budget.bytes, 2 * len(IMAGE.read_bytes()))
+        self.assertEqual(budget.get_exhausted(), "resources")
+
+    def test_budget_restarted_when_pickled(self) -> None:
+        budget = FetchBudget(max_time=10, max_resources=1, fail_fast=True)
+        self.fetch(budget, str(IMAGE))
+
+        copy = pickle.loads(pickle.dumps(budget))
+
+        self.assertEqual(
+            (copy.max_time, copy.max_resources, copy.fail_fast), (10, 1, True)
+        )
+        self.assertEqual((copy.records, copy.resources, copy.started), ([], 0, None))
+
+
+class ResourceBundleTest(TestCase):
+    CSS = b"@import 'print.css'; p { background-image: url('../img/denker.png') }"
+
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = os.path.join(directory.name, "doc")
+        self.path = Path(directory.name) / "bundle.zip"
+        with zipfile.ZipFile(self.path, "w") as archive:
+            archive.writestr(
+                "manifest.json",
+                json.dumps({"https://example.com/logo.png": "img/denker.png"}),
+            )
+            archive.write(IMAGE, "img/denker.png", zipfile.ZIP_STORED)
+            archive.writestr("css/main.css", self.CSS, zipfile.ZIP_DEFLATED)
+        self.bundle = ResourceBundle(self.path)
+
+    def get_file(self, uri: str, basepath: str | None = None) -> BaseFile:
+        with self.bundle.mount(self.root):
+            return getFile(uri, basepath or self.root).instance
+
+    def test_stored_file_read_in_place(self) -> None:
+        file = self.get_file("img/denker.png")
+
+        self.assertIsInstance(file, BundleFileURI)
+        self.assertIsInstance(file.get_buffer(), memoryview)
+        self.assertEqual(file.get_buffer(), IMAGE.read_bytes())
+        self.assertEqual(file.get_data(), IMAGE.read_bytes())
+        self.assertEqual(file.get_mimetype(), "image/png")
+
+    def test_compressed_file(self) -> None:
+        file = self.get_file("css/main.css")
+
+        self.assertEqual(file.get_buffer(), self.CSS)
+        self.assertEqual(file.get_mimetype(), "text/css")
+        self.assertEqual(file.get_uri(), os.path.join(self.root, "css/main.css"))
+
+    def test_files_found(self) -> None:
+        for uri, basepath in (
+            ("../img/denker.png", os.path.join(self.root, "css")),
+            ("/img/denker.png", None),
+            ("https://example.com/logo.png", None),
+            ("logo.png", "https://example.com/"),
+        ):
+            with self.subTest(uri=uri, basepath=basepath):
+                file = self.get_file(uri, basepath)
+                self.assertIsInstance(file, BundleFileURI)
+                self.assertEqual(file.get_data(), IMAGE.read_bytes())
+
+    def test_other_files_found_elsewhere(self) -> None:
+        self.assertIsInstance(self.get_file(str(IMAGE)), LocalFileURI)
+        self.assertIsInstance(self.get_file("img/missing.png"), LocalFileURI)
+        self.assertIsInstance(
+            getFile("img/denker.png", self.root).instance, LocalFileURI
+        )
+
+    def test_directory_bundle(self) -> None:
+        directory = self.path.with_suffix("")
+        with zipfile.ZipFile(self.path) as archive:
+            archive.extractall(directory)
+        self.bundle = ResourceBundle(directory)
+
+        file = self.get_file("https://example.com/logo.png")
+        self.assertIsInstance(file, LocalFileURI)
+        self.assertEqual(file.get_data(), IMAGE.read_bytes())
+        self.assertEqual(file.get_uri(), directory / "img" / "denker.png")
+
+    def test_bundle_closed(self) -> None:
+        mapping = self.bundle._mapping
+        with mountResources(self.path, self.root) as bundle:
+            bundle_mapping = bundle._mapping
+            self.assertFalse(bundle_mapping.closed)
+
+        self.bundle.close()
+
+        self.assertTrue(mapping.closed)
+        self.assertTrue(bundle_mapping.closed)
+
+    def test_unreadable_bundle(self) -> None:
+        corrupt = self.path.with_name("corrupt.zip")
+        corrupt.write_bytes(b"no zip file")
+        for path, error in (
+            (corrupt, zipfile.BadZipFile),
+            (self.path.with_name("missing.zip"), OSError),
+        ):
+            with self.subTest(path.name):
+                with self.assertRaises(error):
+                    ResourceBundle(path)
+                argv = ["xhtml2pdf", "--bundle", str(path), "index.html"]
+                with mock.patch("sys.argv", argv), mock.patch(
+                    "sys.stdout", new_callable=StringIO
+                ) as stdout, self.assertRaises(SystemExit) as cm:
+                    pisa.execute()
+                self.assertEqual(cm.exception.code, 2)
+                self.assertIn(
+                    f"Resource bundle '{path}' can't be read", stdout.getvalue()
+                )
+
+    def test_bundle_pickled_by_path(self) -> None:
+        bundle = pickle.loads(pickle.dumps(self.bundle))
+
+        self.assertEqual(bundle.index.keys(), self.bundle.index.keys())
@@ -1,8 +1,15 @@
+from __future__ import annotations
+
 import base64
 import os
-from unittest import TestCase
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from unittest import TestCase, mock
 
 from xhtml2pdf.context import pisaContext
+from xhtml2pdf.files import FetchBudget, LocalFileURI
 from xhtml2pdf.parser import pisaParser
 
 _data = b"""
@@ -96,9 +103,97 @@ class ParserTest(TestCase):
               src: url('data:font/ttf;charset=utf-8;base64,%s');
             }
           </style>
-        """ % b64_font.encode(
-            "utf-8"
-        )
+        """ % b64_font.encode("utf-8")
 
         r = pisaParser(data, c)
         self.assertEqual(r.warn, 0)
+
+
+class PrefetchTest(TestCase):
+    SAMPLES = Path(__file__).parent / "samples"
+    HTML = b"""
+    <html>
+    <head>
+    <link rel="stylesheet" href="css/main.css">
+    <style>
+    @font-face { font-family: Noto; src: url(NotoSans-Regular.ttf); }
+    </style>
+    </head>
+    <body>
+    <img src="denker.png"><img src="denker.png"><a href="page.html">Link</a>
+    <p style="font-family: Noto">Text</p>
+    </body>
+    </html>
+    """
+
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        shutil.copy(self.SAMPLES / "img" / "denker.png", self.directory)
+        shutil.copy(
+            self.SAMPLES / "font" / "Noto_Sans" / "NotoSans-Regular.ttf", self.directory
+        )
+        (self.directory / "css").mkdir()
+        (self.directory / "css" / "main.css").write_text("@import 'print.css';")
+        (self.directory / "css" / "print.css").write_text(
+            "p { background-image: url('../denker.png') }"
+        )
+
+    def parse(
+        self, prefetch_workers: int, budget: FetchBudget | None = None
+    ) -> tuple[pisaContext, list]:
+        context = pisaContext(str(self.directory / "index.html"))
+        context.prefetchWorkers = prefetch_workers
+        if budget is not None:
+            context.fetchBudget = budget
+        fetches = []
+        extract_data = LocalFileURI.extract_data
+
+        def fetch(file):
+            fetches.append((file.path, threading.current_thread()))
+            return extract_data(file)
+
+        with mock.patch.object(
+            LocalFileURI, "extract_data", autospec=True, side_effect=fetch
+        ), context.fetchBudget.activate():
+            pisaParser(self.HTML, context)
+        return context, fetches
+
+    def test_files_prefetched(self) -> None:
+        context, fetches = self.parse(4)
+
+        self.assertEqual(
+            sorted(name for name, _relative in context.prefetchedFiles),
+            [
+                "../denker.png",
+                "NotoSans-Regular.ttf",
+                "css/main.css",
+                "denker.png",
+                "print.css",
+            ],
+        )
+        # Every file is fetched once, none by the parser itself
+        self.assertEqual(len(fetches), 5)
+        self.assertNotIn(threading.current_thread(), [t for _path, t in fetches])
+        self.assertIn("noto", context.fontList)
+
+    def test_style_sheets_prefetched_first(self) -> None:
+        with self.assertLogs("xhtml2pdf.files", "WARNING"):
+            context, fetches = self.parse(4, FetchBudget(max_resources=3))
+
+        # The images are over the budget, not the style sheet imported
+        self.assertEqual(
+            [path for path, _t in fetches],
+            ["css/main.css", "print.css", "NotoSans-Regular.ttf"],
+        )
+        self.assertEqual(
+            [record["skipped"] for record in context.fetchBudget.records],
+            [None, None, None, "resources", "resources"],
+        )
+
+    def test_prefetch_off(self) -> None:
+        context, fetches = self.parse(0)
+
+        self.assertEqual(context.prefetchedFiles, {})
+        self.assertIn(threading.current_thread(), [t for _path, t in fetches])
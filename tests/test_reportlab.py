@@ -1,6 +1,17 @@
-from unittest import TestCase
+from collections import OrderedDict
+from pathlib import Path
+from unittest import TestCase, mock
+
+from reportlab.pdfgen.canvas import Canvas
 
 from xhtml2pdf import xhtml2pdf_reportlab
+from xhtml2pdf.context import pisaContext
+from xhtml2pdf.document import pisaDocument, pisaStory
+from xhtml2pdf.parser import pisaParser
+from xhtml2pdf.stats import LayoutStats
+from xhtml2pdf.xhtml2pdf_reportlab import PmlImage
+
+IMAGES = Path(__file__).parent / "samples" / "img"
 
 
 class PTCycleTest(TestCase):
@@ -40,3 +51,204 @@ class PmlMaxHeightMixInTest(TestCase):
         self.assertEqual(0, pmlmaxheightmixin.getMaxHeight())
         pmlmaxheightmixin.availHeightValue = 42
         self.assertEqual(42, pmlmaxheightmixin.getMaxHeight())
+
+
+class PmlPageTemplateTest(TestCase):
+    HTML = """
+    <html><head><style>
+    @page {
+        @frame header { -pdf-frame-content: header; top: 1cm; height: 1cm; }
+        @frame footer { -pdf-frame-content: footer; bottom: 1cm; height: 1cm; }
+        @frame content { top: 3cm; bottom: 3cm; }
+    }
+    </style></head><body>
+    <div id="header">Static header</div>
+    <div id="footer">Page <pdf:pagenumber/></div>
+    <p>One</p><pdf:nextpage/><p>Two</p><pdf:nextpage/><p>Three</p>
+    </body></html>
+    """
+
+    def test_static_frame_is_drawn_as_form(self) -> None:
+        with mock.patch.object(
+            Canvas, "beginForm", autospec=True, side_effect=Canvas.beginForm
+        ) as beginForm, mock.patch.object(
+            Canvas, "doForm", autospec=True, side_effect=Canvas.doForm
+        ) as doForm:
+            context = pisaDocument(self.HTML)
+
+        self.assertFalse(context.err)
+        # The header is laid out once, the footer with the page number isn't
+        self.assertEqual(beginForm.call_count, 1)
+        self.assertEqual(
+            [call.args[1] for call in doForm.call_args_list], ["pisaStatic1"] * 3
+        )
+
+    def test_page_fields(self) -> None:
+        context = pisaContext(".")
+        context.addPara()
+        context.frag.pageNumber = True
+        context.addFrag("0")
+        context.addPara()
+        para = context.story[-1]
+
+        self.assertEqual(
+            list(xhtml2pdf_reportlab.pageFieldFrags([para])), [para.frags[0]]
+        )
+        self.assertEqual(list(xhtml2pdf_reportlab.pageFieldFrags([])), [])
+
+
+class PmlParagraphTest(TestCase):
+    @staticmethod
+    def _paragraph(text: str) -> xhtml2pdf_reportlab.PmlParagraph:
+        context = pisaContext()
+        context.addFrag(text)
+        context.addPara()
+        return context.story[0]
+
+    def test_wrap_reuses_line_breaks_for_same_width(self) -> None:
+        para = self._paragraph("The quick red fox jumps over the lazy brown dog. " * 5)
+        size = para.wrap(200, 1000)
+        blPara = para.blPara
+        self.assertEqual(size, para.wrap(200, 1000))
+        self.assertIs(blPara, para.blPara)
+
+    def test_wrap_breaks_lines_again_for_other_width(self) -> None:
+        para = self._paragraph("The quick red fox jumps over the lazy brown dog. " * 5)
+        para.wrap(200, 1000)
+        blPara = para.blPara
+        para.wrap(300, 1000)
+        self.assertIsNot(blPara, para.blPara)
+        para.wrap(200, 1000)
+        self.assertIs(blPara, para.blPara)
+
+    def test_wrap_breaks_lines_again_for_new_page_number(self) -> None:
+        para = self._paragraph("Page")
+        frag = para.frags[-1].clone(text="1", pageNumber=True)
+        para.frags.append(frag)
+        para.wrap(200, 1000)
+        blPara = para.blPara
+        frag.text = "2"
+        para.wrap(200, 1000)
+        self.assertIsNot(blPara, para.blPara)
+
+
+class PmlKeepInFrameTest(TestCase):
+    @staticmethod
+    def _frame() -> xhtml2pdf_reportlab.PmlKeepInFrame:
+        text = "".join(f"<p>Paragraph {i} {'lorem ipsum ' * i}</p>" for i in range(30))
+        style = "-pdf-keep-in-frame-mode: shrink"
+        (frame,) = pisaStory(f"<div style='{style}'>{text}</div>").story
+        return frame
+
+    @staticmethod
+    def _content_wraps(frame, stats: LayoutStats) -> float:
+        """Times the content of the frame was wrapped, by its paragraphs."""
+        calls = sum(
+            entry["calls"]
+            for entry in stats.report()
+            if (entry["type"], entry["phase"]) == ("PmlParagraph", "wrap")
+        )
+        return calls / len(frame._content)
+
+    def test_shrink_fits_content_in_few_wraps(self) -> None:
+        frame = self._frame()
+        stats = LayoutStats()
+        with stats.collect():
+            width, height = frame.wrapOn(Canvas(None), 200, 300)
+
+        self.assertLessEqual(self._content_wraps(frame, stats), frame.SHRINK_STEPS + 2)
+        self.assertGreater(frame._scale, 1)
+        self.assertLessEqual(width, 200)
+        self.assertLessEqual(height, 300)
+        self.assertGreater(height, 300 * 0.9)
+
+    def test_shrink_reuses_scale_when_wrapped_again(self) -> None:
+        frame = self._frame()
+        size = frame.wrapOn(Canvas(None), 200, 300)
+        scale = frame._scale
+        stats = LayoutStats()
+        with stats.collect():
+            self.assertEqual(frame.wrapOn(Canvas(None), 200, 300), size)
+
+        self.assertEqual(frame._scale, scale)
+        self.assertEqual(self._content_wraps(frame, stats), 1)
+
+    def test_shrink_to_max_height(self) -> None:
+        frame = xhtml2pdf_reportlab.PmlKeepInFrame(
+            maxWidth=0, maxHeight=100, content=self._frame()._content, mode="shrink"
+        )
+        _width, height = frame.wrapOn(Canvas(None), 200, 300)
+
+        self.assertLessEqual(height, 100)
+
+
+class PmlTableFixedLayoutTest(TestCase):
+    @staticmethod
+    def _table(*, fixed: bool) -> xhtml2pdf_reportlab.PmlTable:
+        cells = "".join(
+            f"<tr><td>Row {i}</td><td><span style='font-size: 14pt'>big</span> {i}</td></tr>"
+            for i in range(20)
+        )
+        layout = "fixed" if fixed else "auto"
+        html = f"<table style='table-layout: {layout}'>{cells}</table>"
+        (table,) = pisaParser(html, pisaContext()).story
+        return table
+
+    @staticmethod
+    def _split_rows(table, height: float) -> list:
+        canvas = Canvas(None)
+        table.wrapOn(canvas, 400, height)
+        return [part._rowHeights for part in table.splitOn(canvas, 400, height)]
+
+    def test_cells_as_high_as_measured_one_by_one(self) -> None:
+        table = self._table(fixed=True)
+        auto = self._table(fixed=False)
+        self.assertTrue(table.fixedLayout)
+
+        self.assertEqual(
+            table.wrapOn(Canvas(None), 400, 1000), auto.wrapOn(Canvas(None), 400, 1000)
+        )
+        self.assertEqual(table._rowHeights, auto._rowHeights)
+
+    def test_split_like_measured_one_by_one(self) -> None:
+        table = self._table(fixed=True)
+        auto = self._table(fixed=False)
+
+        rows = self._split_rows(table, 150)
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows, self._split_rows(auto, 150))
+
+
+class PmlImageTest(TestCase):
+    def setUp(self) -> None:
+        for patcher in (
+            mock.patch.object(PmlImage, "_sharedImages", OrderedDict()),
+            mock.patch.object(PmlImage, "_sharedImagesSize", 0),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_decoded_image_shared(self) -> None:
+        data = (IMAGES / "denker-transparent.png").read_bytes()
+        image = PmlImage(data)
+        # The same data in another object, like of another document
+        other = PmlImage(bytes(bytearray(data)))
+
+        self.assertIs(other.getImage(), image.getImage())
+        self.assertEqual((image.imageWidth, image.imageHeight), (70, 137))
+        self.assertEqual(len(PmlImage._sharedImages), 1)
+
+    def test_least_recently_used_image_evicted(self) -> None:
+        first = PmlImage((IMAGES / "denker.png").read_bytes())
+        size = PmlImage._sharedImagesSize
+        with mock.patch.object(PmlImage, "SHARED_IMAGES_MAX_SIZE", size + 1):
+            second = PmlImage((IMAGES / "denker-transparent.png").read_bytes())
+
+        self.assertEqual(list(PmlImage._sharedImages), [second._imgdata])
+        self.assertNotIn(first._imgdata, PmlImage._sharedImages)
+
+    def test_jpeg_not_shared(self) -> None:
+        image = PmlImage((IMAGES / "tree.jpg").read_bytes())
+
+        self.assertIsNot(image.getImage(), image.getImage())
+        self.assertEqual(PmlImage._sharedImages, {})
@@ -0,0 +1,133 @@
+from unittest import TestCase, mock
+
+from reportlab.lib.abag import ABag
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+
+from xhtml2pdf import reportlab_paragraph
+from xhtml2pdf.context import pisaContext
+from xhtml2pdf.reportlab_paragraph import Paragraph
+
+
+class StringWidthTest(TestCase):
+    def test_string_width_matches_reportlab(self) -> None:
+        for word in ("", " ", "EUR", "1.234,56", "Lörem", b"bytes"):
+            self.assertEqual(
+                pdfmetrics.stringWidth(word, "Helvetica", 10),
+                reportlab_paragraph.stringWidth(word, "Helvetica", 10),
+            )
+
+    def test_string_width_is_cached(self) -> None:
+        reportlab_paragraph._fontStringWidth.cache_clear()
+        reportlab_paragraph.stringWidth("Total", "Times-Roman", 12)
+        reportlab_paragraph.stringWidth("Total", "Times-Roman", 12)
+        reportlab_paragraph.stringWidth("Total", "Times-Roman", 14)
+        info = reportlab_paragraph._fontStringWidth.cache_info()
+        self.assertEqual(info.hits, 1)
+        self.assertEqual(info.misses, 2)
+
+
+def _dump(blPara) -> list:
+    lines = []
+    for line in blPara.lines:
+        attrs = {k: v for k, v in line.__dict__.items() if k != "words"}
+        lines.append((type(line), attrs, [w.__dict__ for w in line.words]))
+    return lines
+
+
+class BisectBreakLinesTest(TestCase):
+    TEXT = (
+        "Lörem ipsum dolor sit amet, consectetur adipisicing elit, sed do eiusmod"
+        " tempor incididunt ut labore et dolore magna aliqua. Ut enim ad minim"
+        " veniam, quis nostrud exercitation ullamco laboris nisi ut aliquip ex ea"
+        " commodo consequat. Averyveryveryveryveryveryverylongword 1.234,56 EUR "
+    )
+
+    def _paragraph(self, direction: str = "ltr") -> Paragraph:
+        context = pisaContext()
+        for i in range(30):
+            context.frag.fontName = ("Helvetica", "Times-Roman", "Courier")[i % 3]
+            context.frag.fontSize = 8 + i % 4
+            context.frag.bold = i % 5 == 0
+            context.addFrag(self.TEXT[i:] + " ")
+        context.addPara()
+        para = context.story[0]
+        para.dir = direction
+        return para
+
+    def _compare(self, para, widths) -> None:
+        para.width = widths[-1]
+        with mock.patch.object(reportlab_paragraph, "BISECT_BREAK_MIN_WORDS", 10**9):
+            expected = Paragraph.breakLines(para, list(widths))
+            expected_width = para.width
+        para.width = widths[-1]
+        with mock.patch.object(reportlab_paragraph, "BISECT_BREAK_MIN_WORDS", 0):
+            result = Paragraph.breakLines(para, list(widths))
+        self.assertEqual(_dump(expected), _dump(result))
+        self.assertEqual(expected_width, para.width)
+
+    def test_identical_to_word_by_word_breaking(self) -> None:
+        for widths in ((200, 250), (30, 30), (400, 380), (1000, 1000)):
+            self._compare(self._paragraph(), widths)
+
+    def test_identical_for_right_to_left(self) -> None:
+        self._compare(self._paragraph("rtl"), (180, 200))
+
+    def test_falls_back_for_line_breaks(self) -> None:
+        para = self._paragraph()
+        frag = para.frags[3].clone(text="")
+        frag.lineBreak = 1
+        para.frags.insert(4, frag)
+        para.width = 200
+        with mock.patch.object(
+            Paragraph, "_breakLinesBisect", side_effect=AssertionError
+        ), mock.patch.object(reportlab_paragraph, "BISECT_BREAK_MIN_WORDS", 0):
+            Paragraph.breakLines(para, [200, 200])
+
+
+class CJKFragSplitTest(TestCase):
+    TEXT = (
+        "吾輩は猫である。名前はまだ無い。どこで生れたかとんと見当がつかぬ。"
+        "何でも薄暗いじめじめした所でニャーニャー泣いていた事だけは記憶している。"
+        # Fullwidth parentheses, letters and punctuation
+        "\uff08\uff21\uff22\uff23\uff09、「テスト」ぁぃぅっゃ\uff01\uff1f 123 abc "
+    )
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        pdfmetrics.registerFont(UnicodeCIDFont("HeiseiMin-W3"))
+        pdfmetrics.registerFont(UnicodeCIDFont("HeiseiKakuGo-W5"))
+
+    def _frags(self) -> list:
+        context = pisaContext()
+        for i in range(12):
+            context.frag.fontName = ("HeiseiMin-W3", "HeiseiKakuGo-W5")[i % 2 == 1]
+            context.frag.fontSize = 9 + i % 3
+            context.addFrag(self.TEXT[i * 3 :])
+        frags = context.fragList
+        image = frags[5].clone(text="")
+        image.cbDefn = ABag(kind="img", width=40, height=20, valign="middle")
+        lineBreak = frags[7].clone(text="")
+        lineBreak.lineBreak = 1
+        return [*frags[:5], image, *frags[5:8], lineBreak, *frags[8:], frags[0].clone()]
+
+    def _compare(self, frags, widths, *, calcBounds) -> None:
+        with mock.patch.object(
+            reportlab_paragraph, "_cjkFragSplitRuns", return_value=None
+        ):
+            expected = reportlab_paragraph.cjkFragSplit(frags, widths, calcBounds)
+        result = reportlab_paragraph._cjkFragSplitRuns(frags, widths, calcBounds)
+        self.assertIsNotNone(result)
+        self.assertEqual(_dump(expected), _dump(result))
+
+    def test_identical_to_glyph_by_glyph_breaking(self) -> None:
+        for widths in ((200, 250), (11, 11), (35, 60), (50.5, 400), (5000, 5000)):
+            self._compare(self._frags(), list(widths), calcBounds=True)
+            self._compare(self._frags(), list(widths), calcBounds=False)
+
+    def test_falls_back_for_text_with_line_breaks(self) -> None:
+        frags = self._frags()
+        frags[1].lineBreak = 1
+        self.assertIsNone(
+            reportlab_paragraph._cjkFragSplitRuns(frags, [100], calcBounds=True)
+        )
@@ -219,3 +219,34 @@ class TableTest(TestCase):
             self.assertEqual(width, 2.0, "<td> width in CSS not equal with output!")
         for height in row_heights:
             self.assertEqual(height, 3.0, "<td> height in CSS not equal with output!")
+
+    def test_table_layout_fixed(self) -> None:
+        """
+        Test "table-layout: fixed" on <table> tag;
+        If it works, the column widths come from <col> and the first row only
+        """
+        html = """
+        <html>
+        <body>
+            <table style="table-layout: fixed">
+                <col width="20pt">
+                <tr>
+                    <td style="width: 40pt">AAA</td>
+                    <td style="width: 30pt">BBB</td>
+                    <td>CCC</td>
+                </tr>
+                <tr>
+                    <td>DDD</td>
+                    <td>EEE</td>
+                    <td style="width: 50pt">FFF</td>
+                </tr>
+            </table>
+        </body>
+        </html>
+        """
+
+        context = pisaParser(BytesIO(html.encode("utf-8")), pisaContext())
+        table = context.story[0]
+
+        self.assertTrue(table.fixedLayout)
+        self.assertEqual(table._colWidths, [20.0, 30.0, None])
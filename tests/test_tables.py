@@ -6,7 +6,9 @@ from xml.dom import minidom
 
 from xhtml2pdf import tables
 from xhtml2pdf.context import pisaContext
+from xhtml2pdf.document import pisaStory
 from xhtml2pdf.parser import AttrContainer
+from xhtml2pdf.xhtml2pdf_reportlab import PmlTable
 
 
 class TablesWidthTestCase(TestCase):
@@ -103,6 +105,51 @@ class TableDataTestCase(TestCase):
         data = instance.get_data()
         self.assertEqual(data, [["", "Foo", "Bar"]])
 
+    def test_get_data_will_add_empty_strings_at_their_columns(self) -> None:
+        instance = self.sut()
+        instance.data.append([])
+        instance.add_cell("Foo")
+        instance.add_cell("Bar")
+        instance.add_cell("Baz")
+        instance.add_empty(3, 0)
+        instance.add_empty(1, 0)
+        data = instance.get_data()
+        self.assertEqual(data, [["Foo", "", "Bar", "", "Baz"]])
+
+    def test_get_styles_will_merge_equal_styles_of_adjacent_cells(self) -> None:
+        instance = self.sut()
+        instance.add_style(("LEFTPADDING", (0, 0), (-1, -1), 0))
+        for row in range(3):
+            instance.add_style(("LEFTPADDING", (0, row), (-1, row), 0))
+            for col in range(2):
+                instance.add_style(("LEFTPADDING", (col, row), (col, row), 2))
+                instance.add_style(("LINEBELOW", (col, row), (col, row), 1, "black"))
+        styles = instance.get_styles(3, 2)
+        self.assertEqual(
+            styles,
+            [
+                ("LEFTPADDING", (0, 0), (1, 2), 2),
+                ("LINEBELOW", (0, 0), (1, 2), 1, "black"),
+            ],
+        )
+
+    def test_get_styles_will_keep_the_order_of_overlapping_styles(self) -> None:
+        instance = self.sut()
+        instance.add_style(("BACKGROUND", (0, 0), (0, 0), "red"))
+        instance.add_style(("BACKGROUND", (0, 0), (-1, -1), "blue"))
+        instance.add_style(("BACKGROUND", (1, 0), (1, 0), "red"))
+        instance.add_style(("SPAN", (0, 0), (1, 0)))
+        styles = instance.get_styles(1, 2)
+        self.assertEqual(
+            styles,
+            [
+                ("BACKGROUND", (0, 0), (0, 0), "red"),
+                ("BACKGROUND", (0, 0), (1, 0), "blue"),
+                ("BACKGROUND", (1, 0), (1, 0), "red"),
+                ("SPAN", (0, 0), (1, 0)),
+            ],
+        )
+
     def test_get_data_will_fail_silently_if_invalid_empty_cell_found(self) -> None:
         instance = self.sut()
         instance.data.append([])
@@ -420,6 +467,22 @@ class PisaTagTableTestCase(TestCase):
         self.assertEqual(context.frag.borderTopStyle, "solid")
         self.assertEqual(context.frag.borderBottomStyle, "solid")
 
+    def test_end_will_set_style_count_of_merged_styles_on_table(self) -> None:
+        counts = []
+        for rows in (2, 20):
+            html = (
+                '<table cellpadding="2">'
+                + '<tr><td style="background-color: red">Foo</td><td>Bar</td></tr>'
+                * rows
+                + "</table>"
+            )
+            context = pisaStory(html)
+            (table,) = [f for f in context.story if isinstance(f, PmlTable)]
+            counts.append(table.styleCount)
+
+        self.assertGreater(counts[0], 0)
+        self.assertEqual(counts[0], counts[1])
+
 
 class PisaTagTDTestCase(TestCase):
     def test_td_tag_doesnt_collapse_when_empty(self) -> None:
@@ -448,3 +511,41 @@ class PisaTagTDTestCase(TestCase):
         instance.start(context)
 
         self.assertEqual(context.tableData.colw, [None])
+
+    def test_td_tag_of_fixed_layout_table_takes_widths_from_first_row(self) -> None:
+        dom = minidom.parseString("<td>text</td>")
+        element = dom.getElementsByTagName("td")[0]
+        attrs = AttrContainer(
+            {
+                "align": None,
+                "colspan": None,
+                "rowspan": None,
+                "width": "100",
+                "valign": None,
+            }
+        )
+        context = pisaContext()
+        table_data = tables.TableData()
+        table_data.fixed = True
+        table_data.row = 1
+        table_data.colw = [None]
+        context.tableData = table_data
+
+        instance = tables.pisaTagTD(element, attrs)
+        instance.start(context)
+
+        self.assertEqual(context.tableData.colw, [None])
+
+
+class PisaTagCOLTestCase(TestCase):
+    def test_col_tag_declares_column_widths(self) -> None:
+        dom = minidom.parseString("<col/>")
+        element = dom.getElementsByTagName("col")[0]
+        context = pisaContext()
+        context.tableData.colw = [None]
+
+        instance = tables.pisaTagCOL(element, AttrContainer({"span": 2, "width": "50"}))
+        instance.start(context)
+
+        self.assertEqual(context.tableData.colw, [None, 50.0, 50.0])
+        self.assertEqual(context.tableData.fixedcols, {1, 2})
@@ -1,10 +1,12 @@
-from unittest import TestCase
+from unittest import TestCase, mock
 
 from reportlab.lib.colors import Color
 
+from xhtml2pdf import util
 from xhtml2pdf.files import pisaTempFile
 from xhtml2pdf.tags import int_to_roman
 from xhtml2pdf.util import (
+    arabic_format,
     copy_attrs,
     getBorderStyle,
     getBox,
@@ -322,3 +324,43 @@ class CopyUtils(TestCase):
 
         self.assertEqual(obj.param1, str(19))
         self.assertEqual(obj.param2, str(22))
+
+
+class ArabicFormatTestCase(TestCase):
+    def setUp(self):
+        util._arabic_format.cache_clear()
+        self.addCleanup(util._arabic_format.cache_clear)
+
+    def test_not_rtl_language(self):
+        self.assertIsNone(arabic_format("\u0633\u0644\u0627\u0645", "japanese"))
+
+    def test_shaping(self):
+        text = "\u0633\u0644\u0627\u0645 abc"
+        expected = util.get_display(util.arabic_reshaper.reshape(text))
+        self.assertEqual(arabic_format(text, "arabic"), expected)
+        self.assertEqual(arabic_format(text, "arabic"), expected)
+        info = util._arabic_format.cache_info()
+        self.assertEqual((info.hits, info.misses), (1, 1))
+
+    def test_shaping_shared_by_languages(self):
+        text = "\u05e9\u05dc\u05d5\u05dd"
+        self.assertEqual(arabic_format(text, "hebrew"), arabic_format(text, "arabic"))
+        info = util._arabic_format.cache_info()
+        self.assertEqual((info.hits, info.misses), (1, 1))
+
+    def test_skip_text_without_rtl(self):
+        with mock.patch.object(util.arabic_reshaper, "reshape") as reshape:
+            self.assertEqual(arabic_format("Column (1)", "hebrew"), "Column (1)")
+        reshape.assert_not_called()
+        self.assertEqual(util._arabic_format.cache_info().currsize, 0)
+
+    def test_bidi_controls_reordered(self):
+        for control in ("\u200e", "\u202a", "\u202c", "\u2066", "\u2069"):
+            with self.subTest(control=control):
+                text = f"Column {control}(1)"
+                expected = util.get_display(util.arabic_reshaper.reshape(text))
+                with mock.patch.object(
+                    util.arabic_reshaper, "reshape", wraps=util.arabic_reshaper.reshape
+                ) as reshape:
+                    self.assertEqual(arabic_format(text, "hebrew"), expected)
+                reshape.assert_called_once_with(text)
@@ -0,0 +1,318 @@
+from __future__ import annotations
+
+import gc
+import io
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from itertools import accumulate
+from typing import TYPE_CHECKING
+
+import pypdf
+from reportlab.pdfgen.canvas import Canvas
+from reportlab.platypus.doctemplate import NextPageTemplate
+from reportlab.platypus.flowables import PageBreak
+
+from xhtml2pdf.files import TmpFiles, mountResources
+from xhtml2pdf.stats import LayoutStats
+from xhtml2pdf.xhtml2pdf_reportlab import PmlTableOfContents
+
+if TYPE_CHECKING:
+    from xhtml2pdf.files import ResourceBundle
+    from xhtml2pdf.xhtml2pdf_reportlab import PmlBaseDoc
+
+log = logging.getLogger(__name__)
+
+
+class SegmentCanvas(Canvas):
+    """
+    Canvas of a segment, keeping the outline entries to add them to the
+    joined document instead of writing them.
+    """
+
+    def __init__(self, *args, outlineLast: int = -1, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # Level of the last outline entry of the segments before
+        self.outlineLast = outlineLast
+        self.outlineEntries: list[tuple[str, int, bool | None, int]] = []
+
+    def addOutlineEntry(self, title, key, level=0, closed=None):
+        self.outlineEntries.append((title, level, closed, self.getPageNumber()))
+
+
+# The render whose story the process lays out segments of, inherited from
+# the render forking it
+_segmentRender: tuple | None = None
+
+
+def init_segment_process(context, bundle: ResourceBundle | None) -> None:
+    """Keep the render to lay out segments of. Runs in the worker processes."""
+    global _segmentRender  # noqa: PLW0603
+    # Objects of the render are never collected here, like its temporary
+    # files deleting themselves
+    gc.freeze()
+    _segmentRender = (context, bundle)
+
+
+def layout_segment(
+    *,
+    start: int,
+    end: int,
+    template: str | None,
+    outline_level: int,
+    page_offset: int,
+    page_count: int | None,
+) -> tuple[bytes, int, bool, list[tuple[int, str]], list, dict | None, tuple]:
+    """
+    Lay out story[start:end] of the render on its own, the pages numbered
+    after page_offset pages. Runs in the worker processes.
+    """
+    # don't move up, we are preventing circular import
+    from xhtml2pdf.document import pisaDocTemplate  # noqa: PLC0415
+
+    assert _segmentRender is not None
+    context, bundle = _segmentRender
+    budget = context.fetchBudget
+    fetched = (len(budget.records), budget.bytes, budget.resources)
+    # Deletes the files of the segment, not the ones of the render
+    with TmpFiles().activate(), mountResources(
+        bundle, context.pathDirectory
+    ), budget.activate():
+        out = io.BytesIO()
+        doc = pisaDocTemplate(context, out)
+        doc.pisaPageOffset = page_offset
+        doc.pisaPageCount = page_count
+        doc.pisaFirstPageTemplate = template
+        if context.layoutStats is not None:
+            doc.pisaLayoutStats = LayoutStats()
+        # Undone after the layout like multiBuild does, for the process to
+        # lay out the same flowables again
+        edits: list = []
+        doc._multiBuildEdits = edits.append
+        try:
+            doc.build(
+                context.story[start:end],
+                canvasmaker=partial(SegmentCanvas, outlineLast=outline_level),
+            )
+        finally:
+            for edit, *args in edits:
+                edit(*args)
+
+    return (
+        out.getvalue(),
+        doc.canv.getPageNumber() - 1 - page_offset,
+        doc.pisaPageFieldsUsed,
+        [(page, pt.id) for page, pt in doc.pisaTemplateList],
+        doc.canv.outlineEntries,
+        doc.pisaLayoutStats and doc.pisaLayoutStats.entries,
+        (
+            budget.records[fetched[0] :],
+            budget.bytes - fetched[1],
+            budget.resources - fetched[2],
+        ),
+    )
+
+
+class DocumentSegments:
+    # Rounds of layouts, besides one per part, for page numbers to settle
+    SETTLE_ROUNDS: int = 2
+
+    @staticmethod
+    def split_story(context, count: int) -> list[tuple[int, int]]:
+        """
+        Ranges of the story between hard page breaks, joined into at most
+        count parts of about the same number of flowables. Empty if the
+        parts can't be laid out on their own.
+        """
+        story = context.story
+        if any(isinstance(flowable, PmlTableOfContents) for flowable in story):
+            return []
+        # Links to anchors might cross segments
+        if any(frag.link for frag, _anchor in context.anchorFrag):
+            return []
+
+        segments = []
+        start = 0
+        for i, flowable in enumerate(story):
+            if type(flowable) is PageBreak and i > start:
+                segments.append((start, i))
+                start = i + 1
+        if start < len(story):
+            segments.append((start, len(story)))
+
+        parts: list[tuple[int, int]] = []
+        for start, end in segments:
+            # Join the segment to the last part if it's centered in its share
+            if parts and (start + end) / 2 < len(parts) * len(story) / count:
+                parts[-1] = (parts[-1][0], end)
+            else:
+                parts.append((start, end))
+        return parts
+
+    @staticmethod
+    def get_starts(story, parts) -> list[tuple[str | None, int]]:
+        """Page template and outline level the parts start with."""
+        starts = []
+        template = None
+        outline_level = -1
+        i = 0
+        for start, _end in parts:
+            for flowable in story[i:start]:
+                if isinstance(flowable, NextPageTemplate):
+                    template = flowable.action[1]
+                elif getattr(flowable, "outline", False):
+                    outline_level = flowable.outlineLevel
+            i = start
+            starts.append((template, outline_level))
+        return starts
+
+    @staticmethod
+    def get_cpu_count() -> int:
+        """Number of CPUs the process can run on."""
+        if hasattr(os, "sched_getaffinity"):
+            return len(os.sched_getaffinity(0))
+        return os.cpu_count() or 1
+
+    @staticmethod
+    def build(
+        doc: PmlBaseDoc,
+        out: io.BytesIO,
+        context,
+        bundle: ResourceBundle | None,
+        *,
+        workers: int,
+    ) -> bool:
+        """
+        Lay out the parts of the story between hard page breaks in worker
+        processes and join them into out. The page numbers of the parts are
+        known once the parts before are laid out, parts using them are laid
+        out again until they settle. Returns False, having written nothing,
+        if the story can't be laid out in parts.
+        """
+        if doc.encrypt:
+            return False
+        # The workers get the story by forking, there's no parsing it again
+        if "fork" not in multiprocessing.get_all_start_methods():
+            return False
+        # More processes than CPUs only add their overhead
+        workers = min(workers, DocumentSegments.get_cpu_count())
+        if workers < 2:
+            return False
+        parts = DocumentSegments.split_story(context, workers)
+        if len(parts) < 2:
+            return False
+        starts = DocumentSegments.get_starts(context.story, parts)
+
+        try:
+            layouts = DocumentSegments.layout(parts, starts, context, bundle, workers)
+        except BrokenProcessPool as e:
+            log.debug("Segments not laid out: %r", e)
+            return False
+        if layouts is None:
+            log.debug("Page numbers of the segments don't settle")
+            return False
+
+        DocumentSegments.join(doc, out, layouts)
+        for *_, entries, fetched in layouts:
+            if context.layoutStats is not None:
+                context.layoutStats.update(entries)
+            context.fetchBudget.merge(*fetched)
+        log.debug("Laid out %d segments in %d processes", len(parts), workers)
+        return True
+
+    @staticmethod
+    def layout(
+        parts, starts, context, bundle: ResourceBundle | None, workers: int
+    ) -> list | None:
+        """
+        Lay out the parts until their page numbers settle, None if they
+        don't. Parts are laid out again only for page numbers they weren't
+        laid out with, if their layout depends on the page numbers.
+        """
+        latest: list = [None] * len(parts)
+        layouts: dict[tuple[int, int, int | None], tuple] = {}
+        offsets = [0] * len(parts)
+        page_count = None
+
+        def get_layout(i: int) -> tuple | None:
+            if latest[i] is not None and not latest[i][2]:
+                return latest[i]
+            return layouts.get((i, offsets[i], page_count))
+
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=init_segment_process,
+            initargs=(context, bundle),
+        ) as executor:
+            # Each round settles at least the first part left with the
+            # page count unchanged
+            for _ in range(len(parts) + DocumentSegments.SETTLE_ROUNDS):
+                futures = {
+                    i: executor.submit(
+                        layout_segment,
+                        start=parts[i][0],
+                        end=parts[i][1],
+                        template=starts[i][0],
+                        outline_level=starts[i][1],
+                        page_offset=offsets[i],
+                        page_count=page_count,
+                    )
+                    for i in range(len(parts))
+                    if get_layout(i) is None
+                }
+                for i, future in futures.items():
+                    latest[i] = layouts[i, offsets[i], page_count] = future.result()
+
+                # Number the pages by the layouts known for the numbers
+                for _ in range(len(parts) + 1):
+                    pages = [(get_layout(i) or latest[i])[1] for i in range(len(parts))]
+                    numbering = ([0, *accumulate(pages[:-1])], sum(pages))
+                    if numbering == (offsets, page_count):
+                        break
+                    offsets, page_count = numbering
+                else:
+                    continue
+                if all(get_layout(i) is not None for i in range(len(parts))):
+                    return [get_layout(i) for i in range(len(parts))]
+        return None
+
+    @staticmethod
+    def join(doc: PmlBaseDoc, out: io.BytesIO, layouts: list) -> None:
+        """Join the segments into out, sharing identical fonts and images."""
+        writer = pypdf.PdfWriter()
+        for data, *_ in layouts:
+            writer.append(io.BytesIO(data), import_outline=False)
+        info = pypdf.PdfReader(io.BytesIO(layouts[0][0])).metadata
+        if info:
+            writer.add_metadata(info)
+
+        parents: list = []
+        for _data, _pages, _used, _templates, outline, *_ in layouts:
+            for title, level, closed, page in outline:
+                del parents[level:]
+                parents.append(
+                    writer.add_outline_item(
+                        title,
+                        page - 1,
+                        parent=parents[-1] if parents else None,
+                        is_open=not closed,
+                    )
+                )
+
+        # The pages of the templates, for the backgrounds
+        templates = {pt.id: pt for pt in doc.pageTemplates}
+        doc.pisaTemplateList = []
+        for _data, _pages, _used, pisaTemplateList, *_ in layouts:
+            for page, name in pisaTemplateList:
+                if not doc.pisaTemplateList or doc.pisaTemplateList[-1][1] != (
+                    templates[name]
+                ):
+                    doc.pisaTemplateList.append((page, templates[name]))
+
+        if hasattr(writer, "compress_identical_objects"):
+            writer.compress_identical_objects()
+        writer.write(out)
@@ -7,11 +7,9 @@ import pypdf
 from PIL import Image
 from reportlab.pdfgen.canvas import Canvas
 
-from xhtml2pdf.files import pisaFileObject
+from xhtml2pdf.files import BufferReader, pisaFileObject
 
 if TYPE_CHECKING:
-    from tempfile import _TemporaryFileWrapper
-
     from xhtml2pdf.xhtml2pdf_reportlab import PmlBaseDoc
 
 
@@ -53,11 +51,12 @@ class WaterMarks:
         return x, y, width, height
 
     @staticmethod
-    def get_img_with_opacity(pisafile: pisaFileObject, context: dict) -> BytesIO:
+    def get_img_with_opacity(
+        pisafile: pisaFileObject, context: dict
+    ) -> BytesIO | BufferReader:
         opacity: float = context.get("opacity", None)
         if opacity:
-            file: BytesIO | _TemporaryFileWrapper | None = pisafile.getFile()
-            img: Image.Image = Image.open(file)
+            img: Image.Image = Image.open(pisafile.getBytesIO())
             img = img.convert("RGBA")
             img.putalpha(int(255 * opacity))
             iobuff = BytesIO()
@@ -94,7 +93,7 @@ class WaterMarks:
             img, context, pagesize, is_portrait=is_portrait
         )
 
-        canvas = Canvas(output.getNamedFile(), pagesize=pagesize)
+        canvas = Canvas(output.instance.buffer, pagesize=pagesize)
         canvas.drawImage(img, x, y, width, height, mask="auto")
 
         canvas.save()
@@ -12,7 +12,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from __future__ import annotations
+
 import ssl
+from typing import Callable, ClassVar
 
 
 class HttpConfig(dict):
@@ -28,8 +31,24 @@ class HttpConfig(dict):
     - http_source_address
     - http_timeout
 
+    and of the pool of the connections, see files.HTTPConnectionPool
+
+    - http_pool_maxsize: idle connections kept per host
+    - http_pool_idle_timeout: seconds an idle connection is kept
+    - http_max_redirects
+
     """
 
+    # Settings of the pool, not passed to the connections
+    POOL_KEYS = ("pool_maxsize", "pool_idle_timeout", "max_redirects")
+    # Settings given as text on the command line
+    CONVERTERS: ClassVar[dict[str, Callable]] = {
+        "timeout": float,
+        "pool_maxsize": int,
+        "pool_idle_timeout": float,
+        "max_redirects": int,
+    }
+
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
         self["timeout"] = 5
@@ -37,9 +56,27 @@ class HttpConfig(dict):
     def save_keys(self, name, value):
         if name == "nosslcheck":
             self["context"] = ssl._create_unverified_context()
+        elif name == "source_address" and isinstance(value, str):
+            host, _, port = value.rpartition(":")
+            self[name] = (host, int(port)) if host else (value, 0)
+        elif name in self.CONVERTERS and isinstance(value, str):
+            self[name] = self.CONVERTERS[name](value)
         else:
             self[name] = value
 
+    def get_connection_kwargs(self, *, https: bool) -> dict:
+        """Keyword arguments of HTTPSConnection, or HTTPConnection."""
+        kwargs = {
+            key: value for key, value in self.items() if key not in self.POOL_KEYS
+        }
+        if not https:
+            kwargs = {
+                key: value
+                for key, value in kwargs.items()
+                if key in {"timeout", "source_address"}
+            }
+        return kwargs
+
     def is_http_config(self, name, value):
         if name.startswith("--"):
             name = name[2:]
@@ -17,6 +17,7 @@ import copy
 import logging
 import re
 import urllib.parse as urlparse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import TYPE_CHECKING, Callable
 
@@ -37,19 +38,25 @@ except ImportError:
 from reportlab.platypus.paraparser import ParaFrag, ps2tt, tt2ps
 
 from xhtml2pdf import default, parser
-from xhtml2pdf.files import B64InlineURI, getFile, pisaFileObject
+from xhtml2pdf.files import (
+    B64InlineURI,
+    FetchBudget,
+    LocalFileURI,
+    TmpFiles,
+    getFile,
+    pisaFileObject,
+)
 from xhtml2pdf.tables import TableData
 from xhtml2pdf.util import (
     arabic_format,
+    asian_fonts,
     copy_attrs,
     frag_text_language_check,
-    get_default_asian_font,
     getColor,
     getCoords,
     getFloat,
     getFrameDimensions,
     getSize,
-    set_asian_fonts,
     set_value,
 )
 from xhtml2pdf.w3c import css
@@ -62,8 +69,11 @@ from xhtml2pdf.xhtml2pdf_reportlab import (
 )
 
 if TYPE_CHECKING:
+    from collections.abc import Mapping
+
     from reportlab.platypus.flowables import Flowable
 
+    from xhtml2pdf.stats import LayoutStats
     from xhtml2pdf.xhtml2pdf_reportlab import PmlImage
 
 
@@ -185,6 +195,31 @@ def getDirName(path) -> str:
     return str(Path(path).parent.resolve())
 
 
+reImportString = re.compile(r"""@import\s+(?:"([^"]*)"|'([^']*)')""")
+
+
+def getCSSFiles(cssText: str) -> list[str]:
+    """The url()s and imports of a style sheet."""
+    return [
+        next(group for group in match.groups() if group is not None).strip()
+        for regex in (css.CSSParser.re_uri, reImportString)
+        for match in regex.finditer(cssText)
+    ]
+
+
+def getPrefetchRank(name: str) -> int:
+    """
+    Order files are prefetched in by their names: style sheets, then fonts,
+    then the others, like images.
+    """
+    mimetype = LocalFileURI.guess_mimetype(urlparse.urlsplit(name).path) or ""
+    if mimetype == "text/css":
+        return 0
+    if "font" in mimetype:
+        return 1
+    return 2
+
+
 class pisaCSSBuilder(css.CSSBuilder):
     c: pisaContext
 
@@ -219,6 +254,8 @@ class pisaCSSBuilder(css.CSSBuilder):
             src = self.c.getFile(font, relative=self.c.cssParser.rootPath)
             if src and not src.notFound():
                 self.c.loadFont(names, src, bold=bold, italic=italic)
+                # The font has its own copy of the data now
+                src.release()
         return {}, {}
 
     def _pisaAddFrame(
@@ -504,18 +541,24 @@ class pisaCSSBuilder(css.CSSBuilder):
 
 
 class pisaCSSParser(css.CSSParser):
+    @staticmethod
+    def getRootPath(rootPath, cssResourceName, cssFile):
+        """The path the files of an imported style sheet are relative to."""
+        if rootPath and urlparse.urlparse(rootPath).scheme:
+            return urlparse.urljoin(rootPath, cssResourceName)
+        # Where the file was found, once fetched
+        return getDirName(str(cssFile.getAbsPath() or cssFile.uri))
+
     def parseExternal(self, cssResourceName):
         result = None
         oldRootPath = self.rootPath
         cssFile = self.c.getFile(cssResourceName, relative=self.rootPath)
         if not cssFile:
             return None
-        if self.rootPath and urlparse.urlparse(self.rootPath).scheme:
-            self.rootPath = urlparse.urljoin(self.rootPath, cssResourceName)
-        else:
-            self.rootPath = getDirName(cssFile.uri)
+        data = cssFile.getData()
+        self.rootPath = self.getRootPath(self.rootPath, cssResourceName, cssFile)
         try:
-            result = self.parse(cssFile.getData())
+            result = self.parse(data)
             self.rootPath = oldRootPath
         except Exception:
             log.exception("Error while parsing CSS file")
@@ -580,7 +623,8 @@ class pisaContext:
 
     def __init__(self, path: str = "", debug: int = 0, capacity: int = -1) -> None:
         self.fontList: dict[str, str] = copy.copy(default.DEFAULT_FONT)
-        self.asianFontList: dict[str, str] = copy.copy(get_default_asian_font())
+        # Shared by the contexts, see AsianFontRegistry
+        self.asianFontList: Mapping[str, str] = asian_fonts.names
         self.anchorFrag: list = []
         self.anchorName: list = []
         self.fragAnchor: list = []
@@ -596,6 +640,9 @@ class pisaContext:
         self.image: PmlImage | None = None
         self.indexing_story: PmlPageCount | None = None
         self.keepInFrameIndex = None
+        # Id of the nearest element with one, see addStory
+        self.elementId: str | None = None
+        self.layoutStats: LayoutStats | None = None
         self.node = None
         self.template = None
         self.tableData: TableData = TableData()
@@ -608,10 +655,18 @@ class pisaContext:
         self.cssText: str = ""
         self.language: str = ""
         self.text: str = ""
+        self.cssAttr: dict = {}
         self.frameStatic: dict = {}
         self.imageData: dict = {}
         self.templateList: dict = {}
         self.capacity: int = capacity
+        # Temporary files of the render, see pisaDocument
+        self.tmpFiles: TmpFiles = TmpFiles()
+        # Limits and records of the files fetched, see pisaDocument
+        self.fetchBudget: FetchBudget = FetchBudget()
+        # Threads fetching the files before the layout, see prefetchFiles
+        self.prefetchWorkers: int = 8
+        self.prefetchedFiles: dict[tuple[str, str], pisaFileObject] = {}
         self.toc: PmlTableOfContents = PmlTableOfContents()
         self.multiBuild: bool = False
         self.pageSize: tuple[float, float] = A4
@@ -694,6 +749,9 @@ class pisaContext:
 
     # METHODS FOR STORY
     def addStory(self, data):
+        if self.elementId is not None:
+            # Where the flowable comes from, see stats.LayoutStats
+            data.pisaElementId = self.elementId
         self.story.append(data)
 
     def swapStory(self, story=None):
@@ -1039,8 +1097,60 @@ class pisaContext:
         """Returns a file name or None."""
         if name is None:
             return None
+        prefetched = self.prefetchedFiles.get((name, relative or self.pathDirectory))
+        if prefetched is not None:
+            return prefetched
         return getFile(name, relative or self.pathDirectory, callback=self.pathCallback)
 
+    def prefetchFiles(self, names) -> None:
+        """
+        Fetch the files of names, the attributes of the document, and the
+        files the CSS refers to, in parallel, for getFile to return them.
+        Style sheets are searched for files too once fetched.
+
+        Files are fetched in the order of getPrefetchRank, so that a tight
+        fetch budget skips images rather than the style sheets found.
+        """
+        if self.prefetchWorkers < 1:
+            return
+        pending = [(name, self.pathDirectory) for name in names]
+        pending += [(name, self.pathDirectory) for name in getCSSFiles(self.cssText)]
+        queued: dict[tuple, pisaFileObject] = {}
+        with ThreadPoolExecutor(self.prefetchWorkers) as executor:
+            while pending or queued:
+                for name, relative in pending:
+                    key = (name, relative)
+                    if (
+                        key not in self.prefetchedFiles
+                        and key not in queued
+                        and not name.startswith("data:")
+                    ):
+                        queued[key] = getFile(
+                            name, relative, callback=self.pathCallback
+                        )
+                if not queued:
+                    break
+                # The files of the first rank queued, style sheets they refer
+                # to are queued before the next rank
+                rank = min(getPrefetchRank(name) for name, _relative in queued)
+                files = {
+                    key: queued.pop(key)
+                    for key in list(queued)
+                    if getPrefetchRank(key[0]) == rank
+                }
+                list(executor.map(pisaFileObject.getBuffer, files.values()))
+                self.prefetchedFiles.update(files)
+
+                pending = []
+                for (name, relative), file in files.items():
+                    # The other files needn't be read yet
+                    if file.getMimeType() == "text/css" and (data := file.getData()):
+                        rootPath = pisaCSSParser.getRootPath(relative, name, file)
+                        pending += [
+                            (name, rootPath)
+                            for name in getCSSFiles(data.decode("utf-8", "replace"))
+                        ]
+
     def getFontName(self, names, default="helvetica"):
         """Name of a font."""
         # print names, self.fontList
@@ -1050,9 +1160,10 @@ class pisaContext:
         for name in names:
             name = str(name)
             font = name.strip().lower()
-            if font in self.asianFontList:
-                font = self.asianFontList.get(font, None)
-                set_asian_fonts(font)
+            asian_font = self.asianFontList.get(font)
+            if asian_font is not None:
+                font = asian_font
+                asian_fonts.register(font)
             else:
                 font = self.fontList.get(font, None)
             if font is not None:
@@ -1109,9 +1220,14 @@ class pisaContext:
                         )
                     )
                 else:
-                    # Register TTF font and special name
-                    filename = file.getNamedFile()
-                    file = TTFont(fullFontName, filename)
+                    # Register TTF font and special name, ReportLab reads it
+                    # from memory
+                    fontFile = file.getBytesIO()
+                    if fontFile is None:
+                        fontFile = file.getNamedFile()
+                    else:
+                        fontFile.name = str(file.getAbsPath() or "(ttf)")
+                    file = TTFont(fullFontName, fontFile)
                     pdfmetrics.registerFont(file)
 
                     # Add or replace missing styles
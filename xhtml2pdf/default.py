@@ -321,6 +321,7 @@ TAGS = {
             # "keepmode":             (["error", "overflow", "shrink", "truncate"], "shrink"),
         },
     ),
+    "col": (0, {"span": (INT, "1"), "width": STRING}),
     "tr": (
         1,
         {
@@ -590,6 +591,7 @@ pdftoc {
 table {
 }
 
+col,
 tr,
 th,
 td {
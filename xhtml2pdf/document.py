@@ -20,12 +20,14 @@ from reportlab.lib import pdfencrypt
 from reportlab.platypus.flowables import Spacer
 from reportlab.platypus.frames import Frame
 
+from xhtml2pdf.builders.segments import DocumentSegments
 from xhtml2pdf.builders.signs import PDFSignature
 from xhtml2pdf.builders.watermarks import WaterMarks
 from xhtml2pdf.context import pisaContext
 from xhtml2pdf.default import DEFAULT_CSS
-from xhtml2pdf.files import cleanFiles, pisaTempFile
+from xhtml2pdf.files import mountResources, pisaTempFile
 from xhtml2pdf.parser import pisaParser
+from xhtml2pdf.stats import LayoutStats
 from xhtml2pdf.util import getBox
 from xhtml2pdf.xhtml2pdf_reportlab import PmlBaseDoc, PmlPageTemplate
 
@@ -98,6 +100,49 @@ def get_encrypt_instance(data):
     return data
 
 
+def pisaDocTemplate(context, out, encrypt=None):
+    """Document template with the page templates of the context."""
+    doc = PmlBaseDoc(
+        out,
+        pagesize=context.pageSize,
+        author=context.meta["author"].strip(),
+        subject=context.meta["subject"].strip(),
+        keywords=[x.strip() for x in context.meta["keywords"].strip().split(",") if x],
+        title=context.meta["title"].strip(),
+        showBoundary=0,
+        encrypt=get_encrypt_instance(encrypt),
+        allowSplitting=1,
+    )
+
+    # Prepare templates and their frames
+    body = context.templateList.get("body")
+    if body is None:
+        x, y, w, h = getBox("1cm 1cm -1cm -1cm", context.pageSize)
+        body = PmlPageTemplate(
+            id="body",
+            frames=[
+                Frame(
+                    x,
+                    y,
+                    w,
+                    h,
+                    id="body",
+                    leftPadding=0,
+                    rightPadding=0,
+                    bottomPadding=0,
+                    topPadding=0,
+                )
+            ],
+            pagesize=context.pageSize,
+        )
+
+    # The context keeps them for the segments of the story laid out apart
+    doc.addPageTemplates(
+        [body, *[pt for name, pt in context.templateList.items() if name != "body"]]
+    )
+    return doc
+
+
 def pisaDocument(
     src,
     dest=None,
@@ -114,6 +159,12 @@ def pisaDocument(
     context_meta=None,
     encrypt=None,
     signature=None,
+    *,
+    parallel=0,
+    layout_stats=False,
+    prefetch_workers=None,
+    resources=None,
+    fetch_budget=None,
     **_kwargs,
 ):
     log.debug(
@@ -134,84 +185,64 @@ def pisaDocument(
         context.meta.update(context_meta)
 
     context.pathCallback = link_callback
+    if prefetch_workers is not None:
+        context.prefetchWorkers = prefetch_workers
+    if fetch_budget is not None:
+        context.fetchBudget = fetch_budget
+
+    # The temporary files of the render are deleted at its end, the files of
+    # the bundle of resources are found first, the files fetched are counted
+    with context.tmpFiles.activate(), mountResources(
+        resources, context.pathDirectory
+    ) as bundle, context.fetchBudget.activate():
+        # Build story
+        context = pisaStory(
+            src,
+            path,
+            link_callback,
+            debug,
+            default_css,
+            xhtml,
+            encoding,
+            context=context,
+            xml_output=xml_output,
+        )
 
-    # Build story
-    context = pisaStory(
-        src,
-        path,
-        link_callback,
-        debug,
-        default_css,
-        xhtml,
-        encoding,
-        context=context,
-        xml_output=xml_output,
-    )
+        # Buffer PDF into memory
+        out = io.BytesIO()
 
-    # Buffer PDF into memory
-    out = io.BytesIO()
+        doc = pisaDocTemplate(context, out, encrypt)
 
-    doc = PmlBaseDoc(
-        out,
-        pagesize=context.pageSize,
-        author=context.meta["author"].strip(),
-        subject=context.meta["subject"].strip(),
-        keywords=[x.strip() for x in context.meta["keywords"].strip().split(",") if x],
-        title=context.meta["title"].strip(),
-        showBoundary=0,
-        encrypt=get_encrypt_instance(encrypt),
-        allowSplitting=1,
-    )
+        # Time the layout of the flowables, see LayoutStats.report
+        if layout_stats:
+            context.layoutStats = doc.pisaLayoutStats = LayoutStats()
 
-    # Prepare templates and their frames
-    if "body" in context.templateList:
-        body = context.templateList["body"]
-        del context.templateList["body"]
-    else:
-        x, y, w, h = getBox("1cm 1cm -1cm -1cm", context.pageSize)
-        body = PmlPageTemplate(
-            id="body",
-            frames=[
-                Frame(
-                    x,
-                    y,
-                    w,
-                    h,
-                    id="body",
-                    leftPadding=0,
-                    rightPadding=0,
-                    bottomPadding=0,
-                    topPadding=0,
-                )
-            ],
-            pagesize=context.pageSize,
+        # Lay out the story in parallel if asked to and it has parts between hard
+        # page breaks that can be laid out on their own
+        built = parallel > 1 and DocumentSegments.build(
+            doc, out, context, bundle, workers=parallel
         )
 
-    doc.addPageTemplates([body, *list(context.templateList.values())])
-
-    # Use multibuild e.g. if a TOC has to be created
-    if context.multiBuild:
-        doc.multiBuild(context.story)
-    else:
-        doc.build(context.story)
+        # Use multibuild e.g. if a TOC has to be created
+        if not built and context.multiBuild:
+            doc.deferredBuild(context.story)
+        elif not built:
+            doc.build(context.story)
 
-    # Add watermarks
-    output = io.BytesIO()
-    output, has_bg = WaterMarks.process_doc(doc, out, output)
+        # Add watermarks
+        output = io.BytesIO()
+        output, has_bg = WaterMarks.process_doc(doc, out, output)
 
-    if not has_bg:
-        output = out
-    if signature:
-        signoutput = io.BytesIO()
-        do_ok = PDFSignature.sign(output, signoutput, signature)
-        if do_ok:
-            output = signoutput
-
-    # Get the resulting PDF and write it to the file object
-    # passed from the caller
+        if not has_bg:
+            output = out
+        if signature:
+            signoutput = io.BytesIO()
+            do_ok = PDFSignature.sign(output, signoutput, signature)
+            if do_ok:
+                output = signoutput
 
     # Get the resulting PDF and write it to the file object
-    # passed from the caller
+    # passed from the caller, which outlives the files of the render
 
     if dest is None:
         # No output file was passed - Let's use a pisaTempFile
@@ -220,7 +251,6 @@ def pisaDocument(
 
     data = output.getvalue()
     context.dest.write(data)  # TODO: context.dest is a tempfile as well...
-    cleanFiles()
 
     if dest_bytes:
         return data
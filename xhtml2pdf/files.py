@@ -1,25 +1,38 @@
 from __future__ import annotations
 
 import base64
+import binascii
 import gzip
+import hashlib
 import http.client as httplib
+import json
 import logging
 import mimetypes
+import mmap
+import os
+import struct
 import sys
 import tempfile
 import threading
+import time
 import urllib.parse as urlparse
+import zipfile
 from abc import abstractmethod
-from io import BytesIO
+from collections import OrderedDict
+from contextlib import closing, contextmanager, suppress
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from io import BytesIO, RawIOBase
 from pathlib import Path
 from tempfile import _TemporaryFileWrapper
-from typing import TYPE_CHECKING, Any, Callable, ClassVar
+from typing import TYPE_CHECKING, Any, Callable, Generator
 from urllib import request
 from urllib.parse import unquote as urllib_unquote
 
-from xhtml2pdf.config.httpconfig import httpConfig
+from xhtml2pdf.config.httpconfig import HttpConfig, httpConfig
 
 if TYPE_CHECKING:
+    from email.message import Message
     from http.client import HTTPResponse
     from urllib.parse import SplitResult
 
@@ -31,19 +44,525 @@ STRATEGIES: tuple[type, Any] = (
 )
 
 
-class TmpFiles(threading.local):
-    files: ClassVar[list[_TemporaryFileWrapper[bytes]]] = []
+class TmpFiles:
+    """
+    The temporary files of a render, closed, and so deleted, when it ends.
+    A render activates the ones of its context, the files made outside of
+    renders go to files_tmp.
+    """
+
+    def __init__(self) -> None:
+        self.files: list[_TemporaryFileWrapper[bytes]] = []
+        self._lock = threading.Lock()
 
     def append(self, file) -> None:
-        self.files.append(file)
+        with self._lock:
+            self.files.append(file)
 
     def cleanFiles(self) -> None:
-        for file in self.files:
+        with self._lock:
+            files, self.files = self.files, []
+        for file in files:
             file.close()
-        self.files.clear()
+
+    @contextmanager
+    def activate(self) -> Generator[TmpFiles, None, None]:
+        """Collect the files made in the context, closing them at its end."""
+        token = activeTmpFiles.set(self)
+        try:
+            yield self
+        finally:
+            activeTmpFiles.reset(token)
+            self.cleanFiles()
 
 
 files_tmp: TmpFiles = TmpFiles()  # permanent safe file, to prevent file close
+# The files of the render running in the context, if any
+activeTmpFiles: ContextVar[TmpFiles | None] = ContextVar("activeTmpFiles", default=None)
+
+
+def getTmpFiles() -> TmpFiles:
+    return activeTmpFiles.get() or files_tmp
+
+
+# Light gray pixel, scaled to the size of the image it stands in for
+PLACEHOLDER_IMAGE: bytes = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAIAAACQd1PeAAAADElEQVR42mO4e/cuAAUyApj98CkjAAAAAElFTkSuQmCC"
+)
+
+
+class FetchBudget:
+    """
+    Limits of the files a render fetches: the seconds from its start until
+    the last fetch, the bytes fetched and the number of files. Files
+    aren't fetched once a limit is reached, <img> tags get
+    PLACEHOLDER_IMAGE instead if fail_fast is set. Network requests time
+    out when the time is up.
+
+    records has the URI, file type, bytes, seconds and HTTP status of
+    every file fetched, and the limit it was skipped for, if any.
+    """
+
+    def __init__(
+        self,
+        max_time: float | None = None,
+        max_bytes: int | None = None,
+        max_resources: int | None = None,
+        *,
+        fail_fast: bool = False,
+    ) -> None:
+        self.max_time: float | None = max_time
+        self.max_bytes: int | None = max_bytes
+        self.max_resources: int | None = max_resources
+        self.fail_fast: bool = fail_fast
+        self.records: list[dict] = []
+        self.bytes: int = 0
+        self.resources: int = 0
+        self.started: float | None = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        # Other processes start their own
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state.update(records=[], bytes=0, resources=0, started=None)
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def activate(self) -> Generator[FetchBudget, None, None]:
+        """Count the files of the file objects made in the context."""
+        if self.started is None:
+            self.started = time.monotonic()
+        token = activeFetchBudget.set(self)
+        try:
+            yield self
+        finally:
+            activeFetchBudget.reset(token)
+
+    def get_timeout(self) -> float | None:
+        """Seconds left to fetch, None without a time limit."""
+        if self.max_time is None or self.started is None:
+            return None
+        return max(0.0, self.started + self.max_time - time.monotonic())
+
+    def get_exhausted(self) -> str | None:
+        """The limit reached, if any."""
+        timeout = self.get_timeout()
+        if timeout is not None and timeout <= 0:
+            return "time"
+        if self.max_bytes is not None and self.bytes >= self.max_bytes:
+            return "bytes"
+        if self.max_resources is not None and self.resources >= self.max_resources:
+            return "resources"
+        return None
+
+    def admit(self, file: BaseFile) -> bool:
+        """Count the file if it can be fetched, record it if it can't."""
+        with self._lock:
+            exhausted = self.get_exhausted()
+            if exhausted is None:
+                self.resources += 1
+                return True
+        # Recorded by the URI it would have been fetched from
+        file.resolve()
+        log.warning("Fetch budget exhausted (%s), skipped %s", exhausted, file.uri)
+        self.record(file, None, 0.0, skipped=exhausted)
+        return False
+
+    def merge(self, records: list[dict], size: int, resources: int) -> None:
+        """Add the files fetched by a process laying out a segment."""
+        with self._lock:
+            self.records += records
+            self.bytes += size
+            self.resources += resources
+
+    def record(
+        self,
+        file: BaseFile,
+        data: bytes | memoryview | None,
+        seconds: float,
+        skipped: str | None = None,
+    ) -> None:
+        with self._lock:
+            if data is not None:
+                self.bytes += len(data)
+            self.records.append(
+                {
+                    "uri": str(file.uri or file.path),
+                    "type": type(file).__name__,
+                    "bytes": None if data is None else len(data),
+                    "time": seconds,
+                    "status": getattr(file, "status", None),
+                    "skipped": skipped,
+                }
+            )
+
+
+# The budget of the render running in the context, if any
+activeFetchBudget: ContextVar[FetchBudget | None] = ContextVar(
+    "activeFetchBudget", default=None
+)
+
+
+class CachedResource:
+    """
+    The data of a fetched file and what tells whether it's still valid: the
+    HTTP freshness and validators, or the modification time and size of a
+    local file.
+    """
+
+    def __init__(
+        self,
+        data: bytes,
+        mimetype: str | None,
+        *,
+        expires: float = 0.0,
+        etag: str | None = None,
+        last_modified: str | None = None,
+        mtime: tuple[int, int] | None = None,
+    ) -> None:
+        self.data: bytes = data
+        self.mimetype: str | None = mimetype
+        self.expires: float = expires
+        self.etag: str | None = etag
+        self.last_modified: str | None = last_modified
+        self.mtime: tuple[int, int] | None = mtime
+
+    @staticmethod
+    def get_cache_control(headers: Message) -> dict[str, str | None]:
+        directives: dict[str, str | None] = {}
+        for directive in headers.get("Cache-Control", "").split(","):
+            name, _, value = directive.strip().partition("=")
+            if name:
+                directives[name.lower()] = value.strip('"') or None
+        return directives
+
+    @staticmethod
+    def get_expires(headers: Message) -> float:
+        """Time until which a response can be used without revalidation."""
+        now = time.time()
+        directives = CachedResource.get_cache_control(headers)
+        if "no-cache" in directives:
+            return now
+        if "max-age" in directives:
+            try:
+                return (
+                    now + int(directives["max-age"] or 0) - int(headers.get("Age", 0))
+                )
+            except ValueError:
+                return now
+        if "Expires" in headers:
+            try:
+                return parsedate_to_datetime(headers["Expires"]).timestamp()
+            except (TypeError, ValueError):
+                return now
+        return now
+
+    @classmethod
+    def from_response(
+        cls, data: bytes, mimetype: str | None, headers: Message
+    ) -> CachedResource | None:
+        """The resource of an HTTP response, None if it can't be cached."""
+        directives = cls.get_cache_control(headers)
+        # The cache is shared by the renders of the process
+        if "no-store" in directives or "private" in directives:
+            return None
+        resource = cls(
+            data,
+            mimetype,
+            expires=cls.get_expires(headers),
+            etag=headers.get("ETag"),
+            last_modified=headers.get("Last-Modified"),
+        )
+        if not resource.fresh() and not resource.get_conditional_headers():
+            return None
+        return resource
+
+    def fresh(self) -> bool:
+        return time.time() < self.expires
+
+    def get_conditional_headers(self) -> dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def revalidated(self, headers: Message) -> CachedResource:
+        """The resource after a 304 Not Modified response."""
+        return CachedResource(
+            self.data,
+            self.mimetype,
+            expires=self.get_expires(headers),
+            etag=headers.get("ETag", self.etag),
+            last_modified=headers.get("Last-Modified", self.last_modified),
+        )
+
+
+class ResourceCache:
+    """
+    Resources fetched by the file objects, shared by the renders of the
+    process: the most recently used ones in memory, up to max_bytes, and
+    the ones fetched over HTTP in directory too, if given, to outlive the
+    process. Keyed by absolute URI, or path for local files.
+
+    Set files.resource_cache to use one. Subclasses can keep the resources
+    elsewhere by overriding get and put.
+    """
+
+    METRICS: tuple[str, ...] = (
+        "hits",
+        "revalidations",
+        "misses",
+        "bytes_served",
+        "bytes_fetched",
+    )
+
+    def __init__(
+        self, max_bytes: int = 64 * 1024 * 1024, directory: str | Path | None = None
+    ) -> None:
+        self.max_bytes: int = max_bytes
+        self.directory: Path | None = Path(directory) if directory else None
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self.metrics: dict[str, int] = dict.fromkeys(self.METRICS, 0)
+        self._entries: OrderedDict[str, CachedResource] = OrderedDict()
+        self._size: int = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> CachedResource | None:
+        with self._lock:
+            resource = self._entries.get(key)
+            if resource is not None:
+                self._entries.move_to_end(key)
+                return resource
+        resource = self._load(key)
+        if resource is not None:
+            with self._lock:
+                self._remember(key, resource)
+        return resource
+
+    def put(self, key: str, resource: CachedResource) -> None:
+        with self._lock:
+            self._remember(key, resource)
+        if self.directory is not None and resource.mtime is None:
+            self._store(key, resource)
+
+    def hit(self, resource: CachedResource, *, revalidated: bool = False) -> None:
+        with self._lock:
+            self.metrics["revalidations" if revalidated else "hits"] += 1
+            self.metrics["bytes_served"] += len(resource.data)
+
+    def miss(self, data: bytes) -> None:
+        with self._lock:
+            self.metrics["misses"] += 1
+            self.metrics["bytes_fetched"] += len(data)
+
+    def clear(self) -> None:
+        """Forget the resources in memory, the directory is kept."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _remember(self, key: str, resource: CachedResource) -> None:
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old.data)
+        if len(resource.data) > self.max_bytes:
+            return
+        self._entries[key] = resource
+        self._size += len(resource.data)
+        while self._size > self.max_bytes:
+            _key, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted.data)
+
+    def _get_path(self, key: str) -> Path:
+        assert self.directory is not None
+        return self.directory / hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def _load(self, key: str) -> CachedResource | None:
+        if self.directory is None:
+            return None
+        try:
+            content = self._get_path(key).read_bytes()
+            head, _, data = content.partition(b"\n")
+            meta = json.loads(head)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(meta, dict) or meta.pop("uri", None) != key:
+            return None
+        # Cut short, like by a full disk
+        if meta.pop("length", None) != len(data):
+            return None
+        try:
+            return CachedResource(data, **meta)
+        except TypeError:
+            return None
+
+    def _store(self, key: str, resource: CachedResource) -> None:
+        path = self._get_path(key)
+        meta = {
+            "uri": key,
+            "mimetype": resource.mimetype,
+            "expires": resource.expires,
+            "etag": resource.etag,
+            "last_modified": resource.last_modified,
+            "length": len(resource.data),
+        }
+        # The metadata on the first line, then the data. Written aside and
+        # renamed, for other stores not to read halves
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                tmp_file.write(json.dumps(meta).encode("utf-8") + b"\n")
+                tmp_file.write(resource.data)
+            Path(tmp_name).replace(path)
+        except OSError as e:
+            with suppress(OSError):
+                Path(tmp_name).unlink()
+            log.warning("Could not store %r in the resource cache: %s", key, e)
+
+
+# The resource cache of the process, none by default
+resource_cache: ResourceCache | None = None
+
+# The data URIs decoded by the process, keyed by their hash. Their data
+# never changes, so they're cached by default
+data_uri_cache: ResourceCache | None = ResourceCache(max_bytes=32 * 1024 * 1024)
+
+
+class HTTPConnectionPool:
+    """
+    Keep-alive connections by scheme and host, shared by the renders of the
+    process. The connections are set up with httpConfig, which also has the
+    settings of the pool.
+    """
+
+    MAXSIZE: int = 4
+    IDLE_TIMEOUT: float = 30.0
+    MAX_REDIRECTS: int = 5
+    REDIRECTS: frozenset[int] = frozenset({301, 302, 303, 307, 308})
+
+    def __init__(self, config: HttpConfig | None = None) -> None:
+        self.config: HttpConfig = httpConfig if config is None else config
+        # (scheme, host) -> (release time, connection), the latest last
+        self._idle: dict[tuple[str, str], list] = {}
+        self._lock = threading.Lock()
+
+    def connect(self, scheme: str, host: str) -> httplib.HTTPConnection:
+        if scheme == "https":
+            return httplib.HTTPSConnection(
+                host, **self.config.get_connection_kwargs(https=True)
+            )
+        return httplib.HTTPConnection(
+            host, **self.config.get_connection_kwargs(https=False)
+        )
+
+    def _evict(self, now: float) -> None:
+        """Close the connections idle for too long, with the lock held."""
+        idle_timeout = self.config.get("pool_idle_timeout", self.IDLE_TIMEOUT)
+        for key, connections in list(self._idle.items()):
+            while connections and now - connections[0][0] >= idle_timeout:
+                connections.pop(0)[1].close()
+            if not connections:
+                del self._idle[key]
+
+    def acquire(self, scheme: str, host: str) -> tuple[httplib.HTTPConnection, bool]:
+        """A connection to the host, and whether it was used before."""
+        with self._lock:
+            self._evict(time.monotonic())
+            connections = self._idle.get((scheme, host))
+            if connections:
+                return connections.pop()[1], True
+        return self.connect(scheme, host), False
+
+    def release(self, scheme: str, host: str, conn: httplib.HTTPConnection) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._evict(now)
+            connections = self._idle.setdefault((scheme, host), [])
+            if len(connections) < self.config.get("pool_maxsize", self.MAXSIZE):
+                connections.append((now, conn))
+                return
+        conn.close()
+
+    def forget(self) -> None:
+        """Drop the connections without closing them, e.g. in a forked child."""
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def clear(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for _since, conn in connections:
+                conn.close()
+
+    def request(
+        self,
+        uri: str,
+        headers: dict[str, str] | None = None,
+        timeout: float | None = None,
+    ) -> tuple[HTTPResponse, bytes]:
+        """
+        GET the uri, following redirects, with the response read. The
+        timeout, if given, shortens the one of the connections.
+        """
+        for _ in range(self.config.get("max_redirects", self.MAX_REDIRECTS) + 1):
+            response, body = self._request(uri, headers or {}, timeout)
+            location = response.getheader("Location")
+            if response.status not in self.REDIRECTS or not location:
+                return response, body
+            uri = urlparse.urljoin(uri, location)
+            log.debug("Redirected to %r", uri)
+        return response, body
+
+    def _request(
+        self, uri: str, headers: dict[str, str], timeout: float | None
+    ) -> tuple[HTTPResponse, bytes]:
+        url_splitted: SplitResult = urlparse.urlsplit(uri)
+        scheme, host = url_splitted.scheme, url_splitted.netloc
+        path: str = url_splitted.path or "/"
+        path += f"?{url_splitted.query}" if url_splitted.query else ""
+        configured = self.config.get("timeout")
+        if timeout is None or (configured is not None and configured < timeout):
+            timeout = configured
+        while True:
+            conn, reused = self.acquire(scheme, host)
+            # Connections are shared by renders with different time left
+            conn.timeout = timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+            try:
+                conn.request("GET", path, headers=headers)
+                response: HTTPResponse = conn.getresponse()
+                body = response.read()
+            except (httplib.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                # The server closed the idle connection, try another one
+                if reused:
+                    continue
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            if response.will_close:
+                conn.close()
+            else:
+                self.release(scheme, host, conn)
+            return response, body
+
+
+# The connections of the process
+http_pool: HTTPConnectionPool = HTTPConnectionPool()
+if hasattr(os, "register_at_fork"):
+    # The sockets are the parent's
+    os.register_at_fork(after_in_child=http_pool.forget)
 
 
 class pisaTempFile:
@@ -61,15 +580,21 @@ class pisaTempFile:
 
     CAPACITY: int = 10 * 1024
 
-    def __init__(self, buffer: str = "", capacity: int = CAPACITY) -> None:
+    def __init__(
+        self, buffer: str = "", capacity: int = CAPACITY, *, scoped: bool = False
+    ) -> None:
         """
         Creates a TempFile object containing the specified buffer.
         If capacity is specified, we use a real temporary file once the
         file gets larger than that size.  Otherwise, the data is stored
         in memory.
+
+        A scoped buffer belongs to the render it's made in, its temporary
+        file is deleted when the render ends. Others are the caller's.
         """
         self.name: str | None = None
         self.capacity: int = capacity
+        self.scoped: bool = scoped
         self.strategy: int = int(len(buffer) > self.capacity)
         try:
             self._delegate = self.STRATEGIES[self.strategy]()
@@ -94,6 +619,10 @@ class pisaTempFile:
                 log.warning("Created temporary file %s", self.name)
             except Exception:
                 self.capacity = -1
+            else:
+                arena = activeTmpFiles.get() if self.scoped else None
+                if arena is not None:
+                    arena.append(new_delegate)
 
     def getFileName(self) -> str | None:
         """Get a named temporary file."""
@@ -147,19 +676,133 @@ class pisaTempFile:
             raise AttributeError(msg) from e
 
 
+class BufferReader(RawIOBase):
+    """
+    A binary file reading a buffer, like a memory-mapped file, in place
+    rather than from a copy as BytesIO does.
+    """
+
+    def __init__(self, buffer: bytes | memoryview) -> None:
+        super().__init__()
+        self.view: memoryview = memoryview(buffer)
+        self.position: int = 0
+
+    def readable(self) -> bool:  # noqa: PLR6301
+        return True
+
+    def seekable(self) -> bool:  # noqa: PLR6301
+        return True
+
+    def read(self, size: int | None = -1) -> bytes:
+        end = len(self.view)
+        if size is not None and size >= 0:
+            end = min(end, self.position + size)
+        data = self.view[self.position : end].tobytes()
+        self.position = max(self.position, end)
+        return data
+
+    def readall(self) -> bytes:
+        return self.read()
+
+    def readinto(self, buffer) -> int:
+        data = self.view[self.position : self.position + len(buffer)]
+        buffer[: len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            offset += self.position
+        elif whence == os.SEEK_END:
+            offset += len(self.view)
+        if offset < 0:
+            msg = f"negative seek position {offset}"
+            raise ValueError(msg)
+        self.position = offset
+        return offset
+
+    def tell(self) -> int:
+        return self.position
+
+    def getvalue(self) -> bytes:
+        return self.view.tobytes()
+
+
 class BaseFile:
+    # Whether the files are counted by the fetch budget of the render
+    budgeted: bool = True
+
     def __init__(self, path: str, basepath: str | None) -> None:
         self.path: str = path
         self.basepath: str | None = basepath
         self.mimetype: str | None = None
         self.suffix: str | None = None
         self.uri: str | Path | None = None
+        # The data once fetched, see get_buffer
+        self._data: bytes | memoryview | None = None
+        self._fetched: bool = False
+        self._named_tmp_file: _TemporaryFileWrapper[bytes] | None = None
+        self.budget: FetchBudget | None = (
+            activeFetchBudget.get() if self.budgeted else None
+        )
 
     @abstractmethod
-    def extract_data(self) -> bytes | None:
+    def extract_data(self) -> bytes | memoryview | None:
         raise NotImplementedError
 
+    def resolve(self) -> str | Path | None:
+        """The URI the file is fetched from, without fetching it."""
+        return self.uri
+
+    def get_buffer(self) -> bytes | memoryview | None:
+        """
+        The data of the file, or a view of it where a copy can be avoided,
+        fetched on the first call until released.
+        """
+        if not self._fetched:
+            self._data = self.fetch_data()
+            self._fetched = True
+        return self._data
+
     def get_data(self) -> bytes | None:
+        data = self.get_buffer()
+        if isinstance(data, memoryview):
+            return data.tobytes()
+        return data
+
+    def release(self) -> None:
+        """Drop the fetched data, e.g. once a large font is loaded."""
+        self._data = None
+        self._fetched = False
+
+    def fetch_data(self) -> bytes | memoryview | None:
+        budget = self.budget
+        if budget is None:
+            return self.read_data()
+        data = None
+        if budget.admit(self):
+            start = time.perf_counter()
+            data = self.read_data()
+            budget.record(self, data, time.perf_counter() - start)
+        return data
+
+    def get_placeholder(self) -> bytes | None:
+        """
+        PLACEHOLDER_IMAGE if the file has no data for the fetch budget of
+        the render and the budget fails fast, for callers drawing images.
+        """
+        budget = self.budget
+        if (
+            budget is None
+            or not budget.fail_fast
+            or self.get_buffer() is not None
+            or budget.get_exhausted() is None
+        ):
+            return None
+        self.mimetype = "image/png"
+        return PLACEHOLDER_IMAGE
+
+    def read_data(self) -> bytes | memoryview | None:
         try:
             return self.extract_data()
         except Exception as e:
@@ -179,51 +822,85 @@ class BaseFile:
         return self.mimetype
 
     def get_named_tmp_file(self) -> _TemporaryFileWrapper[bytes]:
+        if self._named_tmp_file is not None and not self._named_tmp_file.closed:
+            return self._named_tmp_file
         data: bytes | None = self.get_data()
         tmp_file = tempfile.NamedTemporaryFile(suffix=self.suffix)
         # print(tmp_file.name, len(data))
         if data:
             tmp_file.write(data)
             tmp_file.flush()
-            files_tmp.append(tmp_file)
+            getTmpFiles().append(tmp_file)
         if self.path is None:
             self.path = tmp_file.name
+        self._named_tmp_file = tmp_file
         return tmp_file
 
-    def get_BytesIO(self) -> BytesIO | None:
-        data: bytes | None = self.get_data()
-        if data:
+    def get_file_name(self) -> str | None:
+        """The name of a file with the data, for APIs that only take names."""
+        return self.get_named_tmp_file().name
+
+    def get_BytesIO(self) -> BytesIO | BufferReader | None:
+        data = self.get_buffer()
+        if not data:
+            return None
+        if isinstance(data, bytes):
+            # Shares the bytes until written to
             return BytesIO(data)
-        return None
+        return BufferReader(data)
 
 
 class B64InlineURI(BaseFile):
+    # Inline, nothing to fetch
+    budgeted = False
     mime_params: list
 
     def extract_data(self) -> bytes | None:
         # RFC 2397 form: data:[<mediatype>][;base64],<data>
-        parts = self.path.split("base64,")
+        uri = self.path
+        start = uri.find("base64,")
         if (
-            not self.path.startswith("data:")
-            or "base64," not in self.path
-            or len(parts) != 2
+            not uri.startswith("data:")
+            or start < 0
+            or uri.find("base64,", start + 1) >= 0
         ):
             msg = "Base64-encoded data URI is malformed"
             raise RuntimeError(msg)
-        data = parts[1]
         # Strip 'data:' prefix and split mime type with optional params
-        mime = parts[0][len("data:") :].split(";")
+        mime = uri[len("data:") : start].split(";")
         # mime_params are preserved for future use
         self.mimetype, self.mime_params = mime[0], mime[1:]
 
-        b64: bytes = urllib_unquote(data).encode("utf-8")
-        return base64.b64decode(b64)
+        encoded = uri.encode("utf-8")
+        cache = data_uri_cache
+        if cache is not None:
+            key = hashlib.sha256(encoded).hexdigest()
+            cached = cache.get(key)
+            if cached is not None:
+                cache.hit(cached)
+                return cached.data
+
+        # Decoded in place, unless it's percent-encoded
+        start += len("base64,")
+        if encoded.find(b"%", start) >= 0:
+            data = binascii.a2b_base64(urllib_unquote(uri[start:]))
+        else:
+            data = binascii.a2b_base64(memoryview(encoded)[start:])
+
+        if cache is not None:
+            cache.miss(data)
+            cache.put(key, CachedResource(data, self.mimetype))
+        return data
 
 
 class LocalProtocolURI(BaseFile):
-    def extract_data(self) -> bytes | None:
+    def resolve(self) -> str | None:
         if self.basepath and self.path.startswith("/"):
             self.uri = urlparse.urljoin(self.basepath, self.path[1:])
+        return self.uri
+
+    def extract_data(self) -> bytes | None:
+        if self.resolve():
             urlResponse = request.urlopen(self.uri)
             self.mimetype = urlResponse.info().get("Content-Type", "").split(";")[0]
             return urlResponse.read()
@@ -235,11 +912,27 @@ class NetworkFileUri(BaseFile):
         super().__init__(path, basepath)
         self.attempts: int = 3
         self.actual_attempts: int = 0
-
-    def get_data(self) -> bytes | None:
+        # Of the last response
+        self.status: int | None = None
+        self.headers: Message | None = None
+
+    def release(self) -> None:
+        super().release()
+        # Requested again when the data is needed again
+        self.actual_attempts = 0
+        self.status = None
+        self.headers = None
+
+    def read_data(self) -> bytes | None:
         data = None
-        # try several attempts if network problems happens
-        while self.attempts > self.actual_attempts and data is None:
+        # try several attempts if network problems or server errors happen,
+        # not if the request was refused or the time of the render is up
+        while (
+            self.attempts > self.actual_attempts
+            and data is None
+            and (self.status is None or self.status >= 500)
+            and (self.budget is None or self.budget.get_exhausted() != "time")
+        ):
             self.actual_attempts += 1
             try:
                 data = self.extract_data()
@@ -254,45 +947,75 @@ class NetworkFileUri(BaseFile):
                 )
         return data
 
-    def get_httplib(self, uri) -> tuple[bytes | None, bool]:
+    def get_httplib(
+        self, uri, headers: dict[str, str] | None = None
+    ) -> tuple[bytes | None, bool]:
         log.debug("Sending request for %r with httplib", uri)
         data: bytes | None = None
         is_gzip: bool = False
-        url_splitted: SplitResult = urlparse.urlsplit(uri)
-        server: str = url_splitted[1]
-        path: str = url_splitted[2]
-        path += f"?{url_splitted[3]}" if url_splitted[3] else ""
-        conn: httplib.HTTPConnection | httplib.HTTPSConnection | None = None
-        if uri.startswith("https://"):
-            conn = httplib.HTTPSConnection(server, **httpConfig)
-        else:
-            conn = httplib.HTTPConnection(server)
-        conn.request("GET", path)
-        r1: HTTPResponse = conn.getresponse()
+        r1, body = http_pool.request(
+            uri, headers, timeout=self.budget and self.budget.get_timeout()
+        )
+        self.status = r1.status
+        self.headers = r1.headers
         if r1.status == 200:
             self.mimetype = r1.getheader("Content-Type", "").split(";")[0]
-            data = r1.read()
+            data = body
             if r1.getheader("content-encoding") == "gzip":
                 is_gzip = True
-        else:
+        elif r1.status != 304:
             log.debug("Received non-200 status: %d %s", r1.status, r1.reason)
         return data, is_gzip
 
-    def extract_data(self) -> bytes | None:
+    def resolve(self) -> str:
         # FIXME: When self.path don't start with http
         if self.basepath and not self.path.startswith("http"):
-            uri = urlparse.urljoin(self.basepath, self.path)
+            self.uri = urlparse.urljoin(self.basepath, self.path)
         else:
-            uri = self.path
-        self.uri = uri
-        data, is_gzip = self.get_httplib(uri)
+            self.uri = self.path
+        return self.uri
+
+    def extract_data(self) -> bytes | None:
+        uri = self.resolve()
+
+        cache = resource_cache
+        cached = cache.get(uri) if cache is not None else None
+        if cache is not None and cached is not None and cached.fresh():
+            self.mimetype = cached.mimetype
+            cache.hit(cached)
+            return cached.data
+
+        data, is_gzip = self.get_httplib(
+            uri, cached.get_conditional_headers() if cached is not None else None
+        )
+        if cache is not None and cached is not None and self.status == 304:
+            cached = cached.revalidated(self.headers)
+            cache.put(uri, cached)
+            cache.hit(cached, revalidated=True)
+            self.mimetype = cached.mimetype
+            return cached.data
+
         if is_gzip and data:
             data = gzip.GzipFile(mode="rb", fileobj=BytesIO(data)).read()
+        if cache is not None and data is not None:
+            cache.miss(data)
+            resource = CachedResource.from_response(data, self.mimetype, self.headers)
+            if resource is not None:
+                cache.put(uri, resource)
         log.debug("Uri parsed: %r", uri)
         return data
 
 
 class LocalFileURI(BaseFile):
+    # Files from this size on are mapped to memory rather than read
+    MMAP_MIN_SIZE: int = 256 * 1024
+
+    def __init__(self, path: str, basepath: str | None) -> None:
+        super().__init__(path, basepath)
+        self._mapping: mmap.mmap | None = None
+        # Closes the mapping at the end of the render making the file
+        self._tmp_files: TmpFiles = getTmpFiles()
+
     @staticmethod
     def guess_mimetype(name) -> str | None:
         """Guess the mime type."""
@@ -301,28 +1024,87 @@ class LocalFileURI(BaseFile):
             mimetype = mimetype.split(";")[0]
         return mimetype
 
-    def extract_data(self) -> bytes | None:
-        data = None
+    def resolve(self) -> Path | None:
+        """The path of the file, None if there is no such file."""
         log.debug("Unrecognized scheme, assuming local file path")
         path = Path(self.path)
-        uri = None
         uri = Path(self.basepath) / path if self.basepath is not None else Path() / path
         if path.exists() and not uri.exists():
             uri = path
-        if uri.is_file():
-            self.uri = uri
-            self.suffix = uri.suffix
-            self.mimetype = self.guess_mimetype(uri)
-            if self.mimetype and self.mimetype.startswith("text"):
-                with open(uri, encoding="utf-8") as file_handler:
-                    data = file_handler.read().encode("utf-8")
-            else:
+        if not uri.is_file():
+            return None
+        self.uri = uri
+        self.suffix = uri.suffix
+        self.mimetype = self.guess_mimetype(uri)
+        return uri
+
+    def extract_data(self) -> bytes | memoryview | None:
+        uri = self.resolve()
+        if uri is None:
+            return None
+
+        if uri.stat().st_size >= self.MMAP_MIN_SIZE:
+            # A view rather than a copy, the system reads the file in as
+            # it's accessed and shares it between processes
+            try:
                 with open(uri, "rb") as file_handler:
-                    data = file_handler.read()
+                    mapping = mmap.mmap(
+                        file_handler.fileno(), 0, access=mmap.ACCESS_READ
+                    )
+            except (OSError, ValueError) as e:
+                log.debug("Can't map %s to memory: %r", uri, e)
+            else:
+                self.close()
+                self._mapping = mapping
+                self._tmp_files.append(self)
+                return memoryview(mapping)
+
+        cache = resource_cache
+        if cache is not None:
+            key = str(uri.resolve())
+            stat = uri.stat()
+            mtime = (stat.st_mtime_ns, stat.st_size)
+            cached = cache.get(key)
+            if cached is not None and cached.mtime == mtime:
+                cache.hit(cached)
+                return cached.data
+
+        # Text is decoded by its readers, e.g. the CSS parser
+        data = uri.read_bytes()
+
+        if cache is not None:
+            cache.miss(data)
+            cache.put(key, CachedResource(data, self.mimetype, mtime=mtime))
         return data
 
+    def release(self) -> None:
+        self.close()
+        super().release()
+
+    def close(self) -> None:
+        """Unmap the file, if mapped, dropping the view of it."""
+        mapping, self._mapping = self._mapping, None
+        if mapping is None:
+            return
+        data, self._data, self._fetched = self._data, None, False
+        try:
+            if isinstance(data, memoryview):
+                data.release()
+            mapping.close()
+        except BufferError:
+            # Views of the data are still used, unmapped once collected
+            log.debug("Mapping of %s still in use", self.uri)
+
+    def get_file_name(self) -> str | None:
+        # The file itself, rather than a copy
+        if self.get_buffer() is not None and self.uri is not None:
+            return str(self.uri)
+        return super().get_file_name()
+
 
 class BytesFileUri(BaseFile):
+    budgeted = False
+
     def extract_data(self) -> bytes | None:
         self.uri = self.path
         return self.path.encode("utf-8")
@@ -335,6 +1117,14 @@ class LocalTmpFile(BaseFile):
         self.mimetype: str | None = basepath
         self.suffix: str | None = None
         self.uri: str | Path | None = None
+        self._named_tmp_file: _TemporaryFileWrapper[bytes] | None = None
+        # Where the file is written to, until it's given a name
+        self.buffer: BytesIO = BytesIO()
+        self.budget: FetchBudget | None = None
+
+    def get_buffer(self) -> bytes | memoryview | None:
+        # The file is written after it's created, read it every time
+        return self.fetch_data()
 
     def get_named_tmp_file(self):
         tmp_file = super().get_named_tmp_file()
@@ -344,17 +1134,204 @@ class LocalTmpFile(BaseFile):
 
     def extract_data(self) -> bytes | None:
         if self.path is None:
-            return None
+            return self.buffer.getvalue() or None
         self.uri = self.path
         with open(self.path, "rb") as arch:
             return arch.read()
 
 
+class BundleFileURI(BaseFile):
+    """A file of a zip file bundle, see ResourceBundle."""
+
+    def __init__(
+        self,
+        path: str,
+        basepath: str | None,
+        bundle: ResourceBundle,
+        entry: zipfile.ZipInfo,
+    ) -> None:
+        super().__init__(path, basepath)
+        self.bundle: ResourceBundle = bundle
+        self.entry: zipfile.ZipInfo = entry
+        self.uri = path
+        self.suffix = Path(self.entry.filename).suffix
+        self.mimetype = LocalFileURI.guess_mimetype(self.entry.filename)
+
+    def extract_data(self) -> bytes | memoryview | None:
+        return self.bundle.read(self.entry)
+
+
+class ResourceBundle:
+    """
+    Files for renders to find before they look elsewhere, in a zip file or
+    a directory: by their path relative to the document, or by the URIs
+    the manifest.json of the bundle maps to names of its files, e.g.
+    {"https://example.com/logo.png": "img/logo.png"}. The files of a zip
+    file are read from the zip file mapped to memory, those stored without
+    compression in place.
+
+    The files are indexed once, a bundle can serve many renders.
+    """
+
+    MANIFEST: str = "manifest.json"
+
+    def __init__(self, path: str | Path) -> None:
+        self.path: Path = Path(path)
+        self._mapping: mmap.mmap | None = None
+        self._zip: zipfile.ZipFile | None = None
+        # Name or URI -> the file
+        self.index: dict[str, zipfile.ZipInfo | Path] = {}
+        if self.path.is_dir():
+            for file in self.path.rglob("*"):
+                if file.is_file():
+                    self.index[file.relative_to(self.path).as_posix()] = file
+        else:
+            with open(self.path, "rb") as file_handler:
+                self._mapping = mmap.mmap(
+                    file_handler.fileno(), 0, access=mmap.ACCESS_READ
+                )
+            try:
+                self._zip = zipfile.ZipFile(BufferReader(self._mapping))
+            except (zipfile.BadZipFile, ValueError) as e:
+                # Seeking before the start of files shorter than a zip file
+                self.close()
+                msg = f"{self.path} is not a zip file"
+                raise zipfile.BadZipFile(msg) from e
+            for info in self._zip.infolist():
+                if not info.is_dir():
+                    self.index[info.filename] = info
+
+        manifest = self.index.get(self.MANIFEST)
+        if manifest is not None:
+            for uri, name in json.loads(bytes(self.read(manifest))).items():
+                if name in self.index:
+                    self.index[uri] = self.index[name]
+                else:
+                    log.warning(
+                        "%s of %s: no file %r for %r",
+                        self.MANIFEST,
+                        self.path,
+                        name,
+                        uri,
+                    )
+
+    def __reduce__(self):
+        # Opened again by other processes
+        return type(self), (self.path,)
+
+    def close(self) -> None:
+        """Unmap the zip file, if any, the bundle can't be read anymore."""
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+        mapping, self._mapping = self._mapping, None
+        if mapping is not None:
+            try:
+                mapping.close()
+            except BufferError:
+                # Files read in place are still used, unmapped once collected
+                log.debug("Mapping of %s still in use", self.path)
+
+    def read(self, entry: zipfile.ZipInfo | Path) -> bytes | memoryview:
+        """The data of a file of the index."""
+        if isinstance(entry, Path):
+            return entry.read_bytes()
+        assert self._zip is not None
+        assert self._mapping is not None
+        if entry.compress_type == zipfile.ZIP_STORED and not entry.flag_bits & 0x1:
+            # After the local header and its variable fields
+            name_length, extra_length = struct.unpack_from(
+                "<2H", self._mapping, entry.header_offset + 26
+            )
+            start = entry.header_offset + 30 + name_length + extra_length
+            return memoryview(self._mapping)[start : start + entry.file_size]
+        return self._zip.read(entry)
+
+    def find(self, uri: str, basepath: str | None, root: str) -> str | None:
+        """
+        The name or URI the index has the file of uri under, None if it's
+        not in the bundle. Paths are relative to root, the directory of the
+        document.
+        """
+        if len(urlparse.urlparse(uri).scheme) > 1:
+            return uri if uri in self.index else None
+        base = basepath or root
+        if len(urlparse.urlparse(base).scheme) > 1:
+            absolute = urlparse.urljoin(base, uri)
+            return absolute if absolute in self.index else None
+
+        names = []
+        with suppress(ValueError):
+            path = os.path.normpath(os.path.join(base, uri))
+            names.append(os.path.relpath(path, root).replace(os.sep, "/"))
+        if uri.startswith("/"):
+            # Absolute paths are relative to the bundle
+            names.append(os.path.normpath(uri).replace(os.sep, "/").lstrip("/"))
+        for name in names:
+            if name in self.index:
+                return name
+        return None
+
+    def get_file(self, uri: str, basepath: str | None, root: str) -> BaseFile | None:
+        """The file object of uri, None if it's not in the bundle."""
+        name = self.find(uri, basepath, root)
+        if name is None:
+            return None
+        entry = self.index[name]
+        if isinstance(entry, Path):
+            return LocalFileURI(str(entry), None)
+        if len(urlparse.urlparse(name).scheme) <= 1:
+            # Where relative references of the file are resolved from
+            name = os.path.join(root, name)
+        return BundleFileURI(name, basepath, self, entry)
+
+    @contextmanager
+    def mount(self, root: str) -> Generator[ResourceBundle, None, None]:
+        """
+        Serve the files of the file objects made in the context, root being
+        the directory of the document.
+        """
+        token = activeBundle.set((self, root))
+        try:
+            yield self
+        finally:
+            activeBundle.reset(token)
+
+
+# The bundle of the render running in the context, and its root
+activeBundle: ContextVar[tuple[ResourceBundle, str] | None] = ContextVar(
+    "activeBundle", default=None
+)
+
+
+@contextmanager
+def mountResources(
+    resources: ResourceBundle | str | Path | None, root: str
+) -> Generator[ResourceBundle | None, None, None]:
+    """Mount the bundle of resources, a bundle or its path, if any."""
+    if resources is None:
+        yield None
+        return
+    if not isinstance(resources, ResourceBundle):
+        # Opened for the context only
+        with closing(ResourceBundle(resources)) as bundle, bundle.mount(root):
+            yield bundle
+        return
+    with resources.mount(root):
+        yield resources
+
+
 class FileNetworkManager:
     @staticmethod
     def get_manager(uri, basepath=None):
         if uri is None:
             return LocalTmpFile(uri, basepath)
+        mounted = activeBundle.get()
+        if mounted is not None and isinstance(uri, str) and not uri.startswith("data:"):
+            bundle, root = mounted
+            instance = bundle.get_file(uri, basepath, root)
+            if instance is not None:
+                return instance
         if isinstance(uri, bytes):
             instance = BytesFileUri(uri, basepath)
         elif uri.startswith("data:"):
@@ -398,8 +1375,7 @@ class pisaFileObject:
         return self.instance.get_data()
 
     def getNamedFile(self) -> str | None:
-        f = self.instance.get_named_tmp_file()
-        return f.name if f else None
+        return self.instance.get_file_name()
 
     def getData(self) -> bytes | None:
         return self.instance.get_data()
@@ -412,12 +1388,21 @@ class pisaFileObject:
     def getMimeType(self) -> str | None:
         return self.instance.get_mimetype()
 
+    def getBuffer(self) -> bytes | memoryview | None:
+        return self.instance.get_buffer()
+
+    def getPlaceholder(self) -> bytes | None:
+        return self.instance.get_placeholder()
+
     def notFound(self) -> bool:
-        return self.getData() is None
+        return self.getBuffer() is None
 
     def getAbsPath(self):
         return self.instance.get_uri()
 
+    def release(self) -> None:
+        self.instance.release()
+
     def getBytesIO(self):
         return self.instance.get_BytesIO()
 
@@ -427,4 +1412,4 @@ def getFile(*a, **kw) -> pisaFileObject:
 
 
 def cleanFiles() -> None:
-    files_tmp.cleanFiles()
+    getTmpFiles().cleanFiles()
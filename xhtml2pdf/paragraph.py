@@ -600,5 +600,7 @@ class PageNumberFlowable(Flowable):
         self.pagecount: str | None = None
 
     def draw(self) -> None:
-        self.page = str(self.canv._doctemplate.page)
-        self.pagecount = str(self.canv._doctemplate._page_count)
+        doc = self.canv._doctemplate
+        doc.pisaPageFieldsUsed = True
+        self.page = str(doc.page)
+        self.pagecount = doc.pageCountText()
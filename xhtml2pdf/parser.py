@@ -22,7 +22,7 @@ from xml.dom import Node
 import html5lib
 from html5lib import treebuilders
 from reportlab.platypus.doctemplate import FrameBreak, NextPageTemplate
-from reportlab.platypus.flowables import KeepInFrame, PageBreak
+from reportlab.platypus.flowables import PageBreak
 
 from xhtml2pdf.default import (
     BOOL,
@@ -43,6 +43,7 @@ from xhtml2pdf.files import pisaTempFile
 #  but if we don't import them, the tests fail. Very strange (fbernhart)
 from xhtml2pdf.tables import (  # noqa: F401
     TableData,
+    pisaTagCOL,
     pisaTagTABLE,
     pisaTagTD,
     pisaTagTH,
@@ -99,7 +100,11 @@ from xhtml2pdf.util import (
     transform_attrs,
 )
 from xhtml2pdf.w3c import cssDOMElementInterface
-from xhtml2pdf.xhtml2pdf_reportlab import PmlLeftPageBreak, PmlRightPageBreak
+from xhtml2pdf.xhtml2pdf_reportlab import (
+    PmlKeepInFrame,
+    PmlLeftPageBreak,
+    PmlRightPageBreak,
+)
 
 log = logging.getLogger(__name__)
 
@@ -249,6 +254,7 @@ attrNames = """
     -pdf-line-spacing
     -pdf-keep-in-frame-mode
     -pdf-word-wrap
+    table-layout
     """.strip().split()
 
 
@@ -544,6 +550,25 @@ def pisaPreLoop(node, context, *, collect=False):
     return data
 
 
+def pisaCollectFiles(node, names=None) -> list[str]:
+    """The values of the file attributes of the elements, see pisaGetAttributes."""
+    if names is None:
+        names = []
+    if node.nodeType == Node.ELEMENT_NODE:
+        tag = node.tagName.replace(":", "").lower()
+        if tag in TAGS and node.attributes:
+            adef = TAGS[tag][1]
+            for k, v in node.attributes.items():
+                kind = adef.get(str(k))
+                if isinstance(kind, tuple):
+                    kind = kind[0]
+                if kind == FILE and v:
+                    names.append(str(v))
+    for child in node.childNodes:
+        pisaCollectFiles(child, names)
+    return names
+
+
 def pisaLoop(node, context, path=None, **kw):
     if path is None:
         path = []
@@ -692,6 +717,9 @@ def pisaLoop(node, context, path=None, **kw):
 
         # Static block
         elementId = attr.get("id", None)
+        parentElementId = context.elementId
+        if elementId:
+            context.elementId = elementId
         staticFrame = context.frameStatic.get(elementId, None)
         if staticFrame:
             context.frag.insideStaticFrame += 1
@@ -734,7 +762,7 @@ def pisaLoop(node, context, path=None, **kw):
             substory = context.story[context.keepInFrameIndex :]
             context.story = context.story[: context.keepInFrameIndex]
             context.story.append(
-                KeepInFrame(
+                PmlKeepInFrame(
                     content=substory,
                     maxWidth=keepInFrameMaxWidth,
                     maxHeight=keepInFrameMaxHeight,
@@ -755,6 +783,8 @@ def pisaLoop(node, context, path=None, **kw):
 
         # context.debug(1, indent, "</%s>" % (node.tagName))
 
+        context.elementId = parentElementId
+
         # Reset frag style
         context.pullFrag()
 
@@ -795,7 +825,7 @@ def pisaParser(
         if not encoding:
             encoding = "utf-8"
         src = src.encode(encoding)
-        src = pisaTempFile(src, capacity=context.capacity)
+        src = pisaTempFile(src, capacity=context.capacity, scoped=True)
         # To pass the encoding used to convert the text_type src to binary_type
         # on to html5lib's parser to ensure proper decoding
         parser_kwargs["transport_encoding"] = encoding
@@ -820,6 +850,7 @@ def pisaParser(
         context.addDefaultCSS(default_css)
 
     pisaPreLoop(document, context)
+    context.prefetchFiles(pisaCollectFiles(document))
     context.parseCSS()
     pisaLoop(document, context)
     return context
@@ -19,12 +19,13 @@ import logging
 import os
 import sys
 import urllib.parse as urlparse
+import zipfile
 
 from xhtml2pdf import __version__
 from xhtml2pdf.config.httpconfig import httpConfig
 from xhtml2pdf.default import DEFAULT_CSS
 from xhtml2pdf.document import pisaDocument
-from xhtml2pdf.files import getFile
+from xhtml2pdf.files import ResourceBundle, getFile
 
 log = logging.getLogger(__name__)
 
@@ -52,6 +53,10 @@ DEST
 [options]
   --base, -b:
     Specify a base path if input come via STDIN
+  --bundle:
+    Zip file or directory with the files SRC refers to, found there
+    before anywhere else. A manifest.json in it may map URIs to its
+    files, e.g. {"https://example.com/logo.png": "img/logo.png"}
   --css, -c:
     Path to default CSS file
   --css-dump:
@@ -89,6 +94,15 @@ See http.client.HTTPSConnection documentation for this parameters
   --http_cert_file
   --http_source_address
   --http_timeout
+
+Connections are kept open for the next resources of the same host
+
+  --http_pool_maxsize:
+    Idle connections kept per host (default 4)
+  --http_pool_idle_timeout:
+    Seconds an idle connection is kept (default 30)
+  --http_max_redirects:
+    Redirects followed per resource (default 5)
 """
 ).strip()
 
@@ -176,6 +190,7 @@ def execute():
                 "format=",
                 "css=",
                 "base=",
+                "bundle=",
                 "css-dump",
                 "xml-dump",
                 "xhtml",
@@ -185,10 +200,13 @@ def execute():
                 "system",
                 "profile",
                 "http_nosslcheck",
-                "http_key_file",
-                "http_cert_file",
-                "http_source_address",
-                "http_timeout",
+                "http_key_file=",
+                "http_cert_file=",
+                "http_source_address=",
+                "http_timeout=",
+                "http_pool_maxsize=",
+                "http_pool_idle_timeout=",
+                "http_max_redirects=",
             ],
         )
     except getopt.GetoptError:
@@ -206,6 +224,7 @@ def execute():
     encoding = None
     xml_output = None
     base_dir = None
+    resources = None
 
     log_level = logging.ERROR
     log_format = LOG_FORMAT
@@ -264,6 +283,14 @@ def execute():
         elif o in {"-b", "--base"}:
             base_dir = a
 
+        elif o == "--bundle":
+            # Indexed once for all the sources
+            try:
+                resources = ResourceBundle(a)
+            except (OSError, ValueError, zipfile.BadZipFile) as e:
+                print(f"Resource bundle '{a}' can't be read: {e}")
+                sys.exit(2)
+
         elif o in {"--encoding"} and a:
             # Encoding
             encoding = a
@@ -383,6 +410,7 @@ def execute():
             xhtml=xhtml,
             encoding=encoding,
             xml_output=xml_output,
+            resources=resources,
         )
 
         if xml_output:
@@ -396,6 +424,9 @@ def execute():
                 print("Open viewer for file %s" % dest)
             startViewer(dest)
 
+    if resources is not None:
+        resources.close()
+
 
 def startViewer(filename):
     """Helper for opening a PDF file."""
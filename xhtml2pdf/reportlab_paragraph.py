@@ -6,7 +6,10 @@ from __future__ import annotations
 
 import re
 import sys
+from bisect import bisect_right
 from copy import deepcopy
+from functools import lru_cache
+from itertools import accumulate
 from operator import truth
 from string import whitespace
 from typing import Callable
@@ -16,7 +19,7 @@ from reportlab.lib.abag import ABag
 from reportlab.lib.colors import Color
 from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_LEFT, TA_RIGHT
 from reportlab.lib.textsplit import ALL_CANNOT_START
-from reportlab.pdfbase.pdfmetrics import getAscentDescent, stringWidth
+from reportlab.pdfbase.pdfmetrics import getAscentDescent, getFont
 from reportlab.platypus.flowables import Flowable
 from reportlab.platypus.paraparser import ParaParser
 from reportlab.rl_settings import _FUZZ
@@ -25,6 +28,10 @@ from xhtml2pdf.util import getSize
 
 PARAGRAPH_DEBUG = False
 LEADING_FACTOR = 1.0
+# Number of (font, size, word) widths kept by stringWidth
+STRING_WIDTH_CACHE_SIZE = 65536
+# Paragraphs with at least this many words are broken with _breakLinesBisect
+BISECT_BREAK_MIN_WORDS = 500
 
 _wsc_re_split = re.compile(
     "[%s]+"
@@ -35,6 +42,23 @@ _wsc_re_split = re.compile(
 ).split
 
 
+@lru_cache(maxsize=STRING_WIDTH_CACHE_SIZE)
+def _fontStringWidth(font, text, fontSize, encoding):
+    return font.stringWidth(text, fontSize, encoding=encoding)
+
+
+def stringWidth(text, fontName, fontSize, encoding="utf8"):
+    """
+    Drop-in replacement for reportlab.pdfbase.pdfmetrics.stringWidth.
+
+    Paragraphs measure the same small vocabulary over and over again, so the
+    widths are kept in a bounded LRU cache. The key holds the font object
+    instead of its name, so a font registered again under the same name is
+    measured again.
+    """
+    return _fontStringWidth(getFont(fontName), text, fontSize, encoding)
+
+
 def split(text, delim=None):
     if isinstance(text, bytes):
         text = text.decode("utf8")
@@ -266,7 +290,11 @@ def _putFragLine(cur_x, tx, line):
                 xs.rise = f.rise
                 tx.setRise(f.rise)
             text = f.text
-            tx._textOut(text, f is words[-1])  # cheap textOut
+            if not (
+                getattr(f, "pageCount", False)
+                and _putPageCount(tx, f, cur_x_s, cur_y, f is words[-1])
+            ):
+                tx._textOut(text, f is words[-1])  # cheap textOut
 
             # XXX Modified for XHTML2PDF
             # Background colors (done like underline)
@@ -374,6 +402,35 @@ def _putFragLine(cur_x, tx, line):
         setXPos(tx, x0 - tx._x0)
 
 
+def _putPageCount(tx, f, x, y, last) -> bool:
+    """
+    Leave a marker where a deferred page count (see PmlBaseDoc.deferredBuild)
+    goes in the text, and room for it. Returns False if the page count isn't
+    deferred.
+    """
+    canvas = tx._canvas
+    pageCountMarker = getattr(
+        getattr(canvas, "_doctemplate", None), "pageCountMarker", None
+    )
+    marker = pageCountMarker and pageCountMarker(f.fontName, f.fontSize, tx._leading)
+    if not marker:
+        return False
+    text = f.text
+    text = text.decode("utf8") if isinstance(text, bytes) else str(text)
+    tx._code.append(marker)
+    # The page count might select another subset of the font
+    tx._curSubset = -1
+    width = (
+        canvas.stringWidth(text, f.fontName, f.fontSize)
+        + len(text) * getattr(tx, "_charSpace", 0)
+        + text.count(" ") * getattr(tx, "_wordSpace", 0)
+    )
+    tx.setTextOrigin(x + width, y)
+    if last:
+        tx._textOut("", 1)
+    return True
+
+
 def _leftDrawParaLineX(tx, offset, line, _last=0):
     setXPos(tx, offset)
     _putFragLine(offset, tx, line)
@@ -421,6 +478,10 @@ def _sameFrag(f, g):
         or hasattr(g, "lineBreak")
     ):
         return 0
+    # XXX Modified for XHTML2PDF
+    # A page count might be written after the last page, see _putPageCount
+    if getattr(f, "pageCount", False) or getattr(g, "pageCount", False):
+        return 0
     for a in (
         "fontName",
         "fontSize",
@@ -476,17 +537,22 @@ def _getFragWords(frags, *, reverse=False):
                 W = []
                 n = 0
 
-            for w in S[:-1]:
+            fontName = f.fontName
+            fontSize = f.fontSize
+            if len(S) > 1:
+                w = S[0]
                 W.append((f, w))
-                n += stringWidth(w, f.fontName, f.fontSize)
+                n += stringWidth(w, fontName, fontSize)
                 W.insert(0, n)
                 R.append(W)
+                # words in between are complete, measure them in one go
+                R.extend([stringWidth(w, fontName, fontSize), (f, w)] for w in S[1:-1])
                 W = []
                 n = 0
 
             w = S[-1]
             W.append((f, w))
-            n += stringWidth(w, f.fontName, f.fontSize)
+            n += stringWidth(w, fontName, fontSize)
             if text and text[-1] in whitespace:
                 W.insert(0, n)
                 R.append(W)
@@ -520,6 +586,73 @@ def _getFragWords(frags, *, reverse=False):
     return R
 
 
+def _isPlainFragWords(frag_words) -> bool:
+    """True if every fragword is a single piece of text with a positive width."""
+    for w in frag_words:
+        if len(w) != 2 or w[0] <= 0:
+            return False
+        f, text = w[1]
+        if (
+            not text
+            or text[:1] in {" ", b" "}
+            or hasattr(f, "cbDefn")
+            or hasattr(f, "lineBreak")
+        ):
+            return False
+    return True
+
+
+def _plainLineWords(frag_words, start: int, stop: int, *, first: bool):
+    """
+    Build the words of one line from the plain fragwords start...stop exactly
+    like the word by word loop in Paragraph.breakLines does, but one run of
+    words sharing a frag at a time.
+    """
+    words = []
+    g = None
+    maxSize = maxAscent = minDescent = None
+    i = start
+    while i < stop:
+        f = frag_words[i][1][0]
+        j = i + 1
+        while j < stop and frag_words[j][1][0] is f:
+            j += 1
+        texts = [
+            t if isinstance(t, str) else str(t, "utf-8")
+            for t in (w[1][1] for w in frag_words[i:j])
+        ]
+        if g is None:
+            g = f.clone()
+            if first or j - i > 1:
+                g.text = " ".join(texts)
+            else:
+                # A line started by a break keeps the undecoded word
+                g.text = frag_words[i][1][1]
+            words.append(g)
+        elif _sameFrag(g, f):
+            if isinstance(g.text, bytes):
+                g.text = g.text.decode("utf8")
+            g.text += " " + " ".join(texts)
+        else:
+            space = " " if isinstance(g.text, str) else b" "
+            if not g.text.endswith(space):
+                g.text += space
+            g = f.clone()
+            g.text = " ".join(texts)
+            words.append(g)
+
+        fontSize = f.fontSize
+        ascent, descent = getAscentDescent(f.fontName, fontSize)
+        if maxSize is None:
+            maxSize, maxAscent, minDescent = fontSize, ascent, descent
+        else:
+            maxSize = max(maxSize, fontSize)
+            maxAscent = max(maxAscent, ascent)
+            minDescent = min(minDescent, descent)
+        i = j
+    return words, maxSize, maxAscent, minDescent
+
+
 def _split_blParaSimple(blPara, start: int, stop: int) -> list:
     f = blPara.clone()
     for a in ("lines", "kind", "text"):
@@ -895,8 +1028,175 @@ def makeCJKParaLine(U, extraSpace, calcBounds):
     )
 
 
+CJK_CANNOT_START = frozenset(ALL_CANNOT_START)
+
+
+def _cjkRuns(frags, encoding):
+    """
+    Split frags into runs of glyphs for _cjkFragSplitRuns.
+
+    Returns the runs as (frag, text, start, stop) with start and stop being
+    glyph indices, and the list of glyph widths. A frag without text is a
+    single empty glyph, like in cjkFragSplit. Returns None for frags the run
+    engine does not handle.
+    """
+    runs = []
+    widths = []
+    charWidths = {}
+    for f in frags:
+        text = f.text
+        if isinstance(text, bytes):
+            text = text.decode(encoding)
+        elif not isinstance(text, str):
+            return None
+        start = len(widths)
+        if not text:
+            if hasattr(f, "cbDefn"):
+                widths.append(getattr(f.cbDefn, "width", 0))
+            else:
+                widths.append(stringWidth(text, f.fontName, f.fontSize))
+            runs.append((f, text, start, start + 1))
+            continue
+        if hasattr(f, "cbDefn") or hasattr(f, "lineBreak"):
+            return None
+        # measure every distinct glyph once per font
+        known = charWidths.setdefault((f.fontName, f.fontSize), {})
+        for c in set(text).difference(known):
+            known[c] = stringWidth(c, f.fontName, f.fontSize)
+        widths.extend(map(known.__getitem__, text))
+        runs.append((f, text, start, len(widths)))
+    return runs, widths
+
+
+def _makeCJKRunsLine(runs, runStarts, start, stop, extraSpace, *, calcBounds):
+    """Build the makeCJKParaLine line for the glyphs start...stop of the runs."""
+    words = []
+    CW = []
+    f0 = FragLine()
+    maxSize = maxAscent = minDescent = 0
+    for k in range(max(bisect_right(runStarts, start) - 1, 0), len(runs)):
+        f, text, rstart, rstop = runs[k]
+        first = max(start, rstart)
+        last = min(stop, rstop)
+        if first >= last:
+            if rstart >= stop:
+                break
+            continue
+        cbDefn = getattr(f, "cbDefn", None)
+        if calcBounds and getattr(cbDefn, "width", 0):
+            descent, ascent = imgVRange(cbDefn.height, cbDefn.valign, f.fontSize)
+        else:
+            ascent, descent = getAscentDescent(f.fontName, f.fontSize)
+        maxSize = max(maxSize, f.fontSize)
+        maxAscent = max(maxAscent, ascent)
+        minDescent = min(minDescent, descent)
+        if not _sameFrag(f0, f):
+            f0 = f0.clone()
+            f0.text = "".join(CW)
+            words.append(f0)
+            CW = []
+            f0 = f
+        # runs of more than one glyph are plain text, see _cjkRuns
+        CW.append(text[first - rstart : last - rstart])
+    if CW:
+        f0 = f0.clone()
+        f0.text = "".join(CW)
+        words.append(f0)
+    return FragLine(
+        kind=1,
+        extraSpace=extraSpace,
+        wordCount=1,
+        words=words[1:],
+        fontSize=maxSize,
+        ascent=maxAscent,
+        descent=minDescent,
+    )
+
+
+def _cjkFragSplitRuns(frags, maxWidths, calcBounds, encoding="utf8"):  # noqa: PLR0914
+    """
+    Variant of cjkFragSplit without an object per glyph.
+
+    The glyph widths are accumulated with itertools.accumulate and the line
+    ends are found by binary search. Kinsoku and the other details of the
+    glyph by glyph loop are kept, so the result is identical. Returns None if
+    the frags are not supported, see _cjkRuns.
+    """
+    prepared = _cjkRuns(frags, encoding)
+    if prepared is None:
+        return None
+    runs, widths = prepared
+    n = len(widths)
+    if min(widths, default=0) < 0:
+        return None
+    lineBreaks = {rstart for f, _, rstart, _ in runs if hasattr(f, "lineBreak")}
+    runStarts = [rstart for _, _, rstart, _ in runs]
+
+    lines = []
+    widthUsed = lineStartPos = 0
+    maxWidth = maxWidths[0]
+    i = 0
+    window = 64
+    while i < n:
+        stop = min(n, i + window)
+        used = list(accumulate(widths[i:stop], initial=widthUsed))
+        j = bisect_right(used, max(maxWidth + _FUZZ, 0), 1)
+        if j == len(used):
+            # no line end within the window
+            widthUsed = used[-1]
+            i = stop
+            window *= 2
+            continue
+        i += j - 1
+        widthUsed = used[j]
+        w = widths[i]
+        if i in lineBreaks:
+            i += 1
+            continue
+        extraSpace = maxWidth - widthUsed + w
+        # This is the most important of the Japanese typography rules.
+        # if next character cannot start a line, wrap it up to this line so it hangs
+        # in the right margin.
+        _, text, rstart, _ = runs[bisect_right(runStarts, i) - 1]
+        # NB an empty glyph counts as a substring of ALL_CANNOT_START in cjkFragSplit
+        stop = i
+        if not text or text[i - rstart] in CJK_CANNOT_START:
+            extraSpace -= w
+            stop = i + 1
+        lines.append(
+            _makeCJKRunsLine(
+                runs, runStarts, lineStartPos, stop, extraSpace, calcBounds=calcBounds
+            )
+        )
+        try:
+            maxWidth = maxWidths[len(lines)]
+        except IndexError:
+            maxWidth = maxWidths[-1]  # use the last one
+        window = 2 * (stop - lineStartPos) + 64
+        lineStartPos = stop
+        widthUsed = w
+        i += 1
+
+    if widthUsed > 0:
+        lines.append(
+            _makeCJKRunsLine(
+                runs,
+                runStarts,
+                lineStartPos,
+                n,
+                maxWidth - widthUsed,
+                calcBounds=calcBounds,
+            )
+        )
+
+    return ParaLines(kind=1, lines=lines)
+
+
 def cjkFragSplit(frags, maxWidths, calcBounds, encoding="utf8"):
     """This attempts to be wordSplit for frags using the dumb algorithm."""
+    result = _cjkFragSplitRuns(frags, maxWidths, calcBounds, encoding)
+    if result is not None:
+        return result
     U = []  # get a list of single glyphs with their widths etc etc
     for f in frags:
         text = f.text
@@ -1316,6 +1616,8 @@ class Paragraph(Flowable):
         frag_words = _getFragWords(frags, reverse=self.dir == "rtl")
         if self.dir == "rtl":
             frag_words.reverse()
+        if len(frag_words) >= BISECT_BREAK_MIN_WORDS and _isPlainFragWords(frag_words):
+            return self._breakLinesBisect(frag_words, maxWidths)
         for w in frag_words:
             f = w[-1][0]
             fontName = f.fontName
@@ -1495,6 +1797,81 @@ class Paragraph(Flowable):
             )
         return ParaLines(kind=1, lines=lines)
 
+    def _breakLinesBisect(self, frag_words, maxWidths):  # noqa: PLR0914
+        """
+        Line breaking for long paragraphs of plain words, see _isPlainFragWords.
+
+        Instead of testing word after word, the line widths are accumulated in
+        C with itertools.accumulate and the end of each line is found with a
+        binary search. Space and word widths are added in the same order as in
+        breakLines, so the result is identical.
+        """
+        n = len(frag_words)
+        steps = []
+        f = spaceWidth = None
+        for w in frag_words:
+            if w[1][0] is not f:
+                f = w[1][0]
+                spaceWidth = stringWidth(" ", f.fontName, f.fontSize)
+            steps.extend((spaceWidth, w[0]))
+
+        lines = []
+        lineno = 0
+        maxWidth = maxWidths[0]
+        start = 0
+        window = 16
+        while start < n:
+            # Widths of the line after each word, grow the window until a
+            # word does not fit anymore or the paragraph ends
+            while True:
+                stop = min(n, start + window)
+                widths = list(
+                    accumulate(
+                        steps[2 * start + 2 : 2 * stop], initial=frag_words[start][0]
+                    )
+                )[::2]
+                count = bisect_right(widths, maxWidth, 1)
+                if count < len(widths) or stop == n:
+                    break
+                window *= 2
+            window = 2 * count + 8
+            currentWidth = widths[count - 1]
+
+            words, maxSize, maxAscent, minDescent = _plainLineWords(
+                frag_words, start, start + count, first=not lines
+            )
+            self.width = max(currentWidth, self.width)
+            start += count
+            if start < n:
+                lines.append(
+                    FragLine(
+                        extraSpace=maxWidth - currentWidth,
+                        wordCount=count,
+                        lineBreak=False,
+                        words=words,
+                        fontSize=maxSize,
+                        ascent=maxAscent,
+                        descent=minDescent,
+                    )
+                )
+                lineno += 1
+                try:
+                    maxWidth = maxWidths[lineno]
+                except IndexError:
+                    maxWidth = maxWidths[-1]  # use the last one
+            else:
+                lines.append(
+                    ParaLines(
+                        extraSpace=maxWidth - currentWidth,
+                        wordCount=count,
+                        words=words,
+                        fontSize=maxSize,
+                        ascent=maxAscent,
+                        descent=minDescent,
+                    )
+                )
+        return ParaLines(kind=1, lines=lines)
+
     def breakLinesCJK(self, width):
         """
         Initially, the dumbest possible wrapping algorithm.
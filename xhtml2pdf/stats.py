@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import json
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter
+from typing import Callable, Generator
+
+# Statistics of the document being built, see PmlBaseDoc.build
+activeLayoutStats: ContextVar[LayoutStats | None] = ContextVar(
+    "activeLayoutStats", default=None
+)
+
+
+class LayoutStats:
+    """
+    Calls and time of the layout phases (handle, wrap, split, draw) by
+    flowable type and id of the element the flowable comes from.
+
+    The time of a call includes the calls it makes to other flowables, like a
+    table wrapping its cells, the self time doesn't.
+    """
+
+    def __init__(self) -> None:
+        # (type, element id, phase) -> [calls, time, self time]
+        self.entries: dict[tuple[str, str | None, str], list] = {}
+        self._nested: list[float] = []
+
+    @contextmanager
+    def collect(self) -> Generator[LayoutStats, None, None]:
+        """Collect the calls of the measured methods in the context."""
+        token = activeLayoutStats.set(self)
+        try:
+            yield self
+        finally:
+            activeLayoutStats.reset(token)
+
+    def _entry(self, flowable, phase: str) -> list:
+        key = (type(flowable).__name__, getattr(flowable, "pisaElementId", None), phase)
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = [0, 0.0, 0.0]
+        return entry
+
+    def call(self, flowable, phase: str, func: Callable, *args, **kwargs):
+        """Call func, adding the call to the phase of the flowable."""
+        self._nested.append(0.0)
+        start = perf_counter()
+        try:
+            result = func(*args, **kwargs)
+            element_id = getattr(flowable, "pisaElementId", None)
+            if phase == "split" and element_id is not None:
+                # The parts come from the element of the flowable
+                for part in result:
+                    if getattr(part, "pisaElementId", None) is None:
+                        part.pisaElementId = element_id
+            return result
+        finally:
+            elapsed = perf_counter() - start
+            nested = self._nested.pop()
+            if self._nested:
+                self._nested[-1] += elapsed
+            entry = self._entry(flowable, phase)
+            entry[0] += 1
+            entry[1] += elapsed
+            entry[2] += elapsed - nested
+
+    def count(self, flowable, phase: str) -> None:
+        """Count an event of the flowable that isn't timed."""
+        self._entry(flowable, phase)[0] += 1
+
+    def update(self, entries: dict) -> None:
+        """Add the entries of other statistics, e.g. of a worker process."""
+        for key, (calls, time, self_time) in entries.items():
+            entry = self.entries.setdefault(key, [0, 0.0, 0.0])
+            entry[0] += calls
+            entry[1] += time
+            entry[2] += self_time
+
+    def report(self) -> list[dict]:
+        """The entries, the most self time first."""
+        return [
+            {
+                "type": flowable_type,
+                "id": element_id,
+                "phase": phase,
+                "calls": calls,
+                "time": time,
+                "self_time": self_time,
+            }
+            for (flowable_type, element_id, phase), (calls, time, self_time) in sorted(
+                self.entries.items(), key=lambda item: -item[1][2]
+            )
+        ]
+
+    def toJSON(self) -> str:
+        return json.dumps(self.report())
+
+
+def measured(method: Callable) -> Callable:
+    """
+    Count the calls of a layout method of a flowable and their time while
+    a LayoutStats collects them.
+    """
+    phase = method.__name__
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        stats = activeLayoutStats.get()
+        if stats is None:
+            return method(self, *args, **kwargs)
+        return stats.call(self, phase, method, self, *args, **kwargs)
+
+    return wrapper
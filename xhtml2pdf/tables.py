@@ -14,6 +14,7 @@
 from __future__ import annotations
 
 import copy
+import itertools
 import logging
 
 from reportlab.platypus.tables import TableStyle
@@ -24,6 +25,49 @@ from xhtml2pdf.xhtml2pdf_reportlab import PmlKeepInFrame, PmlTable
 
 log = logging.getLogger(__name__)
 
+# Style commands of a group set the same cell properties or paint over each
+# other, so only their order within the group matters
+STYLE_GROUPS: dict[str, str] = {
+    **dict.fromkeys(("BACKGROUND", "ROWBACKGROUNDS", "COLBACKGROUNDS"), "BACKGROUND"),
+    **dict.fromkeys(
+        (
+            "GRID",
+            "BOX",
+            "OUTLINE",
+            "INNERGRID",
+            "LINEABOVE",
+            "LINEBELOW",
+            "LINEBEFORE",
+            "LINEAFTER",
+        ),
+        "LINE",
+    ),
+    **dict.fromkeys(
+        ("FONT", "FONTNAME", "FACE", "FONTSIZE", "SIZE", "LEADING"), "FONT"
+    ),
+}
+
+# Style commands setting a property of every cell in their range, the last
+# command setting it wins
+CELL_STYLES: frozenset[str] = frozenset(
+    (
+        "LEFTPADDING",
+        "RIGHTPADDING",
+        "TOPPADDING",
+        "BOTTOMPADDING",
+        "VALIGN",
+        "ALIGN",
+        "FONTSIZE",
+        "LEADING",
+        "TEXTCOLOR",
+    )
+)
+
+# Style commands drawing the same for a range as for each of its cells
+DRAW_STYLES: frozenset[str] = frozenset(
+    ("BACKGROUND", "LINEABOVE", "LINEBELOW", "LINEBEFORE", "LINEAFTER")
+)
+
 
 def _width(value: str | float | None = None) -> str | float | None:
     if value is None:
@@ -45,6 +89,8 @@ class TableData:
         self.col: int = 0
         self.colw: list = []
         self.data: list = []
+        self.fixed: bool = False
+        self.fixedcols: set[int] = set()
         self.mode: str = ""
         self.padding: int = 0
         self.repeat: bool = False
@@ -68,14 +114,89 @@ class TableData:
 
     def get_data(self):
         data = self.data
+        spans: dict[int, list[int]] = {}
         for x, y in self.span:
+            spans.setdefault(y, []).append(x)
+        for y, xs in spans.items():
             # Loop through all the spans that are inside the boundaries of our
-            # tables. If the y-coordinate is valid, we insert an empty cell.
+            # tables. If the y-coordinate is valid, we insert empty cells.
             # As for the x coordinate, we somehow don't care.
             if y < len(data):
-                data[y].insert(x, "")
+                cells = iter(data[y])
+                row = []
+                for x in sorted(xs):
+                    row += itertools.islice(cells, x - len(row))
+                    row.append("")
+                row += cells
+                data[y] = row
         return data
 
+    @staticmethod
+    def _covers(outer: list, inner: list) -> bool:
+        """Whether the cells of the style command outer include those of inner."""
+        return (
+            outer[1] <= inner[1]
+            and inner[3] <= outer[3]
+            and outer[2] <= inner[2]
+            and inner[4] <= outer[4]
+        )
+
+    @staticmethod
+    def _join_styles(prev: list, last: list) -> bool:
+        """
+        Extend a style command by the following command of its group if it is
+        equal and of adjacent cells, return whether it was joined.
+        """
+        cmd, sc, sr, ec, er, args = last
+        if prev[0] != cmd or prev[5] != args or cmd not in CELL_STYLES | DRAW_STYLES:
+            return False
+        if cmd in CELL_STYLES and TableData._covers(prev, last):
+            # Sets what the cells already have
+            return True
+        if (prev[1], prev[3]) == (sc, ec) and prev[4] + 1 == sr:
+            prev[4] = er
+            return True
+        if (prev[2], prev[4]) == (sr, er) and prev[3] + 1 == sc:
+            prev[3] = ec
+            return True
+        return False
+
+    def get_styles(self, rows: int, cols: int) -> list[tuple]:
+        """
+        Return the style commands with runs of equal commands of adjacent
+        cells merged into a command for their range of rows and columns.
+        """
+        styles: list[list] = []
+        groups: dict[str, list[list]] = {}
+        for cmd, (sc, sr), (ec, er), *args in self.styles:
+            sc, ec = (col + cols if col < 0 else col for col in (sc, ec))
+            sr, er = (row + rows if row < 0 else row for row in (sr, er))
+            style = [cmd, sc, sr, ec, er, args]
+            group = groups.setdefault(STYLE_GROUPS.get(cmd, cmd), [])
+            group.append(style)
+            styles.append(style)
+            while len(group) > 1:
+                prev, last = group[-2], group[-1]
+                if (
+                    last[0] in CELL_STYLES
+                    and prev[0] == last[0]
+                    and self._covers(last, prev)
+                ):
+                    # Overridden for all its cells
+                    prev[0] = None
+                    del group[-2]
+                elif self._join_styles(prev, last):
+                    last[0] = None
+                    group.pop()
+                else:
+                    break
+
+        return [
+            (cmd, (sc, sr), (ec, er), *args)
+            for cmd, sc, sr, ec, er, args in styles
+            if cmd is not None
+        ]
+
     def add_cell_styles(self, c, begin, end, mode="td"):
         self.mode = mode.upper()
         if c.frag.backColor and mode != "tr":  # XXX Stimmt das so?
@@ -227,6 +348,9 @@ class pisaTagTABLE(pisaTag):
         tdata.rowh = []
         tdata.repeat = attrs.repeat
         tdata.width = _width(attrs.width)
+        tdata.fixed = (
+            str(c.cssAttr.get("table-layout", "auto")).strip().lower() == "fixed"
+        )
 
     def end(self, c):
         tdata = c.tableData
@@ -246,6 +370,8 @@ class pisaTagTABLE(pisaTag):
 
         log.debug("Col widths: %r", tdata.colw)
         if tdata.data:
+            styles = tdata.get_styles(len(data), maxcols)
+            log.debug("Table styles: %d of %d commands", len(styles), len(tdata.styles))
             # log.debug("Table styles %r", tdata.styles)
             t = PmlTable(
                 data,
@@ -257,9 +383,11 @@ class pisaTagTABLE(pisaTag):
                 repeatRows=tdata.repeat,
                 hAlign=tdata.align,
                 vAlign="TOP",
-                style=TableStyle(tdata.styles),
+                style=TableStyle(styles),
             )
+            t.styleCount = len(styles)
             t.totalWidth = _width(tdata.width)
+            t.fixedLayout = tdata.fixed
             t.spaceBefore = c.frag.spaceBefore
             t.spaceAfter = c.frag.spaceAfter
 
@@ -275,6 +403,20 @@ class pisaTagTABLE(pisaTag):
         c.tableData, self.tableData = self.tableData, None
 
 
+class pisaTagCOL(pisaTag):
+    def start(self, c):
+        tdata = c.tableData
+        width = c.frag.width or self.attr.width
+        for _i in range(max(self.attr.span or 1, 1)):
+            col = len(tdata.colw)
+            tdata.colw.append(_width(width))
+            if width is not None:
+                # Declared widths take precedence over the widths of the cells
+                # in fixed layout tables
+                tdata.fixedcols.add(col)
+                log.debug("Col %d has width %s", col, width)
+
+
 class pisaTagTR(pisaTag):
     def start(self, c):
         tdata = c.tableData
@@ -340,8 +482,9 @@ class pisaTagTD(pisaTag):
         if (col + 1) > len(tdata.colw):
             tdata.colw += (col + 1 - len(tdata.colw)) * [_width()]
 
-        # Get value of with, if no spanning
-        if not cspan:
+        # Get value of with, if no spanning. Fixed layout tables take the widths
+        # only from the columns and the first row.
+        if not cspan and not (tdata.fixed and (row or col in tdata.fixedcols)):
             width = c.frag.width or self.attr.width
             # If is value, the set it in the right place in the array
             if width is not None:
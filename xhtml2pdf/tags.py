@@ -51,7 +51,6 @@ if TYPE_CHECKING:
     from reportlab.platypus.paraparser import ParaFrag
 
     from xhtml2pdf.context import pisaContext
-    from xhtml2pdf.files import pisaFileObject
     from xhtml2pdf.parser import AttrContainer
 
 log = logging.getLogger(__name__)
@@ -313,7 +312,7 @@ class pisaTagLI(pisaTag):
             frag.text = ""
             f = frag.listStyleImage
             if f and (not f.notFound()):
-                img = PmlImage(f.getData(), src=f.uri, width=None, height=None)
+                img = PmlImage(f.getBuffer(), src=f.uri, width=None, height=None)
                 img.drawHeight *= DPI96
                 img.drawWidth *= DPI96
                 img.pisaZoom = frag.zoom
@@ -353,7 +352,9 @@ class pisaTagIMG(pisaTag):
         log.debug("Attrs: %r", attr)
 
         if attr.src:
-            filedata: pisaFileObject = attr.src.getData()
+            filedata: bytes | memoryview | None = (
+                attr.src.getBuffer() or attr.src.getPlaceholder()
+            )
             if filedata:
                 try:
                     align = attr.align or c.frag.vAlign or "baseline"
@@ -16,7 +16,10 @@ from __future__ import annotations
 import contextlib
 import logging
 import re
+import threading
 from copy import copy
+from functools import lru_cache
+from types import MappingProxyType
 from typing import Any
 
 import arabic_reshaper
@@ -579,24 +582,39 @@ COLOR_BY_NAME = {
 }
 
 
-def get_default_asian_font():
-    lower_font_list = []
-    upper_font_list = []
+class AsianFontRegistry:
+    """
+    The CID fonts of ReportLab, each created and registered once per process
+    when first used, by name and lowercase name.
+    """
+
+    def __init__(self) -> None:
+        fonts = reportlab.pdfbase._cidfontdata.defaultUnicodeEncodings
+        self.names: MappingProxyType[str, str] = MappingProxyType(
+            {font.lower(): font for font in fonts}
+        )
+        self._registered: set[str] = set()
+        self._lock = threading.Lock()
+
+    def register(self, fontname: str) -> None:
+        if fontname in self._registered:
+            return
+        with self._lock:
+            if fontname in self._registered or fontname not in self.names.values():
+                return
+            pdfmetrics.registerFont(UnicodeCIDFont(fontname))
+            self._registered.add(fontname)
 
-    font_dict = copy(reportlab.pdfbase._cidfontdata.defaultUnicodeEncodings)
-    fonts = font_dict.keys()
 
-    for font in fonts:
-        upper_font_list.append(font)
-        lower_font_list.append(font.lower())
-    return {lower_font_list[i]: upper_font_list[i] for i in range(len(lower_font_list))}
+asian_fonts = AsianFontRegistry()
+
+
+def get_default_asian_font() -> dict[str, str]:
+    return dict(asian_fonts.names)
 
 
 def set_asian_fonts(fontname):
-    font_dict = copy(reportlab.pdfbase._cidfontdata.defaultUnicodeEncodings)
-    fonts = font_dict.keys()
-    if fontname in fonts:
-        pdfmetrics.registerFont(UnicodeCIDFont(fontname))
+    asian_fonts.register(fontname)
 
 
 def detect_language(name):
@@ -606,20 +624,37 @@ def detect_language(name):
     return None
 
 
+RTL_LANGUAGES = frozenset({"arabic", "hebrew", "persian", "urdu", "pashto", "sindhi"})
+
+# Hebrew, Arabic, Syriac, Thaana, NKo, ... up to Arabic Extended-A, the
+# presentation forms, the right-to-left blocks of the supplementary planes
+# and the bidirectional marks, embeddings, overrides and isolates, which
+# are left to the reordering
+rtl_re = re.compile(
+    r"[\u0590-\u08ff\ufb1d-\ufdff\ufe70-\ufeff"
+    r"\u200e-\u200f\u202a-\u202e\u2066-\u2069"
+    r"\U00010800-\U00010fff\U0001e800-\U0001efff]"
+)
+
+ARABIC_FORMAT_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=ARABIC_FORMAT_CACHE_SIZE)
+def _arabic_format(text):
+    ar = arabic_reshaper.reshape(text)
+    return get_display(ar)
+
+
 def arabic_format(text, language):
     # Note: right now all of the languages are treated the same way.
     # But maybe in the future we have to for example implement something
     # for "hebrew" that isn't used in "arabic"
-    if detect_language(language) in {
-        "arabic",
-        "hebrew",
-        "persian",
-        "urdu",
-        "pashto",
-        "sindhi",
-    }:
-        ar = arabic_reshaper.reshape(text)
-        return get_display(ar)
+    if detect_language(language) in RTL_LANGUAGES:
+        # Reshaping and reordering leave text without right-to-left
+        # characters untouched, so only shape (and cache) the rest
+        if not rtl_re.search(text):
+            return text
+        return _arabic_format(text)
     return None
 
 
@@ -18,7 +18,10 @@ from __future__ import annotations
 import contextlib
 import copy
 import logging
+import math
 import sys
+import threading
+from collections import OrderedDict
 from hashlib import md5
 from html import escape as html_escape
 from io import BytesIO, StringIO
@@ -32,6 +35,7 @@ from reportlab.lib.enums import TA_RIGHT
 from reportlab.lib.styles import ParagraphStyle
 from reportlab.lib.utils import LazyImageReader, flatten, haveImages, open_for_read
 from reportlab.pdfbase import pdfform
+from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.platypus.doctemplate import (
     BaseDocTemplate,
     IndexingFlowable,
@@ -42,13 +46,18 @@ from reportlab.platypus.flowables import (
     Flowable,
     KeepInFrame,
     ParagraphAndImage,
+    _listWrapOn,  # noqa: PLC2701 # wraps the content like KeepInFrame.wrap
 )
 from reportlab.platypus.tableofcontents import TableOfContents
 from reportlab.platypus.tables import Table, TableStyle
-from reportlab.rl_config import register_reset
+from reportlab.rl_config import (
+    _FUZZ,  # noqa: PLC2701 # the tolerance frames fit flowables with
+    register_reset,
+)
 
-from xhtml2pdf.files import pisaFileObject, pisaTempFile
+from xhtml2pdf.files import BufferReader, pisaFileObject, pisaTempFile
 from xhtml2pdf.reportlab_paragraph import Paragraph
+from xhtml2pdf.stats import LayoutStats, measured
 from xhtml2pdf.util import ImageWarning, getBorderStyle
 
 if TYPE_CHECKING:
@@ -98,12 +107,40 @@ class PmlMaxHeightMixIn:
         return self.availHeightValue if hasattr(self, "availHeightValue") else 0
 
 
+class PageCountOverflowError(Exception):
+    """The pages outgrew the digits reserved for the page count."""
+
+
 class PmlBaseDoc(BaseDocTemplate):
     """We use our own document template to get access to the canvas and set some information once."""
 
     # Stores a list of page templates, and the first page from which they're active.
     pisaTemplateList: list[tuple[int, PmlPageTemplate]]
 
+    # Laying out a segment of the document, see builders.segments: the pages
+    # before it, the page count and the page template it starts with
+    pisaPageOffset: int = 0
+    pisaPageCount: int | None = None
+    pisaFirstPageTemplate: str | None = None
+    # Set when the pages depend on their number or the page count
+    pisaPageFieldsUsed: bool = False
+
+    # Collects the calls and time of the layout of the flowables if set
+    pisaLayoutStats: LayoutStats | None = None
+
+    def build(self, flowables, *args, **kwargs):
+        if self.pisaLayoutStats is None:
+            return super().build(flowables, *args, **kwargs)
+        with self.pisaLayoutStats.collect():
+            return super().build(flowables, *args, **kwargs)
+
+    def handle_flowable(self, flowables):
+        if self.pisaLayoutStats is None or not flowables:
+            return super().handle_flowable(flowables)
+        return self.pisaLayoutStats.call(
+            flowables[0], "handle", super().handle_flowable, flowables
+        )
+
     def beforeDocument(self) -> None:
         """
         This is called before any processing is done on the document.
@@ -113,6 +150,156 @@ class PmlBaseDoc(BaseDocTemplate):
         # Clear the list of templates, to ensure the list refers to the *final* rendering, also
         # in a multiBuild rendering.
         self.pisaTemplateList = []
+        if self.pisaPageOffset:
+            self.page = self.pisaPageOffset
+            self.canv._pageNumber = self.pisaPageOffset + 1
+        if self.pisaFirstPageTemplate is not None:
+            self.handle_nextPageTemplate(self.pisaFirstPageTemplate)
+            self._setPageTemplate()
+
+    # Digits of the page count placeholder while building with deferredBuild
+    pisaPageCountDigits: int | None = None
+
+    def deferredBuild(self, story: list[Flowable]) -> None:
+        """
+        Build a document with page count fields or a table of contents in a
+        single pass.
+
+        Page count fields are laid out as a placeholder with a guessed number
+        of digits, the build starts over with more digits as soon as the pages
+        outgrow the guess, and written into the text of the pages after the
+        last page. The table of contents is laid out with the entries expected
+        from the story, their page numbers are drawn from form XObjects defined
+        after the last page. If they turn out to change the layout it falls
+        back to multiBuild.
+        """
+        tocs = [
+            flowable for flowable in story if isinstance(flowable, PmlTableOfContents)
+        ]
+        self._indexingFlowables = tocs
+        # Undo the changes made to the flowables before building again, like
+        # multiBuild does
+        edits: list[tuple] = []
+        self._multiBuildEdits = edits.append
+        self.pisaPageCountDigits = 1
+        while True:
+            self._pageCountMarkers: dict[tuple, str] = {}
+            self._pageCountUsed = False
+            self._deferredForms: list[tuple[str, list[Flowable]]] = []
+            self._deferredPage: list[Flowable] = []
+            for toc in tocs:
+                toc.deferEntries(story)
+            self._doSave = 0
+            try:
+                self.build(story.copy())
+            except PageCountOverflowError:
+                self.pisaPageCountDigits = max(
+                    self.pisaPageCountDigits + 1, len(str(self.page))
+                )
+                while edits:
+                    func, *args = edits.pop(0)
+                    func(*args)
+                continue
+            break
+        del self._multiBuildEdits
+
+        placeholder = "0" * self.pisaPageCountDigits
+        pageCount = str(self.canv.getPageNumber() - 1)
+        self.pisaPageCountDigits = None
+        if not (
+            all(
+                stringWidth(pageCount, fontName, fontSize)
+                == stringWidth(placeholder, fontName, fontSize)
+                for fontName, fontSize, _leading in self._pageCountMarkers
+            )
+            and all(toc.isDeferredSatisfied() for toc in tocs)
+            and all(
+                flowable.isDeferredSatisfied()
+                for _name, flowables in self._deferredForms
+                for flowable in flowables
+            )
+        ):
+            # The page count or the table of contents changes the layout
+            for toc in tocs:
+                toc.deferred = False
+            for func, *args in edits:
+                func(*args)
+            self.multiBuild(story)
+            return
+
+        canvas = self.canv
+        if self._pageCountMarkers:
+            codes = {}
+            for (fontName, fontSize, leading), marker in self._pageCountMarkers.items():
+                tx = canvas.beginText()
+                tx._setFont(fontName, fontSize)
+                tx._leading = leading
+                codes[marker] = tx._formatText(pageCount)
+            for page in canvas._doc.Pages.pages:
+                for marker, code in codes.items():
+                    page.stream = page.stream.replace(marker, code)
+        w, h = canvas._pagesize
+        for name, flowables in self._deferredForms:
+            canvas.beginForm(name, lowerx=-w, lowery=-h, upperx=w, uppery=h)
+            for flowable in flowables:
+                flowable.drawDeferred(canvas)
+            canvas.endForm()
+        canvas.save()
+
+    def pageCountText(self) -> str:
+        """Text of the page count fields laid out on the current page."""
+        self.pisaPageFieldsUsed = True
+        if self.pisaPageCount is not None:
+            return str(self.pisaPageCount)
+        if self.pisaPageCountDigits:
+            self._pageCountUsed = True
+            if len(str(self.page)) > self.pisaPageCountDigits:
+                msg = f"More than {self.pisaPageCountDigits} digits of pages"
+                raise PageCountOverflowError(msg)
+            return "0" * self.pisaPageCountDigits
+        return str(self._page_count)
+
+    def pageCountMarker(
+        self, fontName: str, fontSize: float, leading: float
+    ) -> str | None:
+        """
+        Marker left in the text of the pages where the page count in the given
+        font goes, or None if the page count isn't deferred. Text is escaped,
+        it can't contain the NUL bytes of the marker.
+        """
+        if not self.pisaPageCountDigits:
+            return None
+        key = (fontName, fontSize, leading)
+        if key not in self._pageCountMarkers:
+            self._pageCountMarkers[key] = (
+                f"\0pisaPageCount{len(self._pageCountMarkers) + 1}\0"
+            )
+        return self._pageCountMarkers[key]
+
+    def deferDrawing(self, flowable: Flowable) -> None:
+        """
+        Draw the flowable on the current page with its drawDeferred method
+        after the last page of deferredBuild. The flowables of a page share
+        one form XObject.
+        """
+        self._deferredPage.append(flowable)
+
+    def afterPage(self) -> None:
+        if getattr(self, "_deferredPage", None):
+            name = f"pisaDeferred{len(self._deferredForms) + 1}"
+            self._deferredForms.append((name, self._deferredPage))
+            self._deferredPage = []
+            self.canv.doForm(name)
+
+    def handle_pageBegin(self) -> None:
+        if (
+            self.pisaPageCountDigits
+            and self._pageCountUsed
+            and len(str(self.page + 1)) > self.pisaPageCountDigits
+        ):
+            msg = f"More than {self.pisaPageCountDigits} digits of pages"
+            raise PageCountOverflowError(msg)
+        super().handle_pageBegin()
 
     def beforePage(self) -> None:
         self.canv._doc.info.producer = PRODUCER
@@ -136,13 +323,16 @@ class PmlBaseDoc(BaseDocTemplate):
         """
 
     def afterFlowable(self, flowable: Flowable) -> None:
+        if self.pisaLayoutStats is not None:
+            self.pisaLayoutStats.count(flowable, "placed")
+
         # Does the flowable contain fragments?
         if getattr(flowable, "outline", False):
             self.notify(
                 "TOCEntry",
                 (
                     flowable.outlineLevel,
-                    html_escape(copy.deepcopy(flowable.text), quote=True),
+                    html_escape(flowable.text, quote=True),
                     self.page,
                 ),
             )
@@ -213,6 +403,10 @@ class PmlPageTemplate(PageTemplate):
         self._page_count: int = 0
         self._first_flow: bool = True
 
+        # Form XObject names of the static frames, see drawStaticForm
+        self._staticForms: dict[int, str | None] = {}
+        self._staticFormsCanvas: Canvas | None = None
+
         # Background Image
         self.img = None
         self.ph: int = 0
@@ -239,46 +433,97 @@ class PmlPageTemplate(PageTemplate):
         try:
             if (
                 # No template was set yet, or the previous template differs from the last
-                not doc.pisaTemplateList
-                or doc.pisaTemplateList[-1][-1] != self
+                not doc.pisaTemplateList or doc.pisaTemplateList[-1][-1] != self
             ):
                 doc.pisaTemplateList.append((canvas.getPageNumber(), self))
 
-            def pageNumbering(objList):
-                for obj in flatten(objList):
-                    if isinstance(obj, PmlParagraph):
-                        for frag in obj.frags:
-                            if frag.pageNumber:
-                                frag.text = str(pagenumber)
-                            elif frag.pageCount:
-                                frag.text = str(canvas._doctemplate._page_count)
-
-                    elif isinstance(obj, PmlTable):
-                        # Flatten the cells ([[1,2], [3,4]] becomes [1,2,3,4])
-                        flat_cells = [
-                            item for sublist in obj._cellvalues for item in sublist
-                        ]
-                        pageNumbering(flat_cells)
-
             try:
-                # Paint static frames
-                pagenumber = canvas.getPageNumber()
-                if pagenumber > self._page_count:
-                    self._page_count = canvas.getPageNumber()
-                    canvas._doctemplate._page_count = canvas.getPageNumber()
-
-                for frame in self.pisaStaticList:
-                    frame_copy = copy.deepcopy(frame)
-                    story = frame_copy.pisaStaticStory
-                    pageNumbering(story)
-
-                    frame_copy.addFromList(story, canvas)
-
+                self.drawStaticFrames(canvas, doc)
             except Exception:  # TODO: Kill this!
                 log.debug("PmlPageTemplate", exc_info=True)
         finally:
             canvas.restoreState()
 
+    def drawStaticFrames(self, canvas: Canvas, doc) -> None:
+        """Paint the static frames, with the page fields of the page."""
+        pagenumber = canvas.getPageNumber()
+        if pagenumber > self._page_count:
+            self._page_count = canvas.getPageNumber()
+            canvas._doctemplate._page_count = canvas.getPageNumber()
+
+        for frame in self.pisaStaticList:
+            if self.drawStaticForm(frame, canvas):
+                continue
+
+            frame_copy = copy.deepcopy(frame)
+            story = frame_copy.pisaStaticStory
+            for frag in pageFieldFrags(story):
+                doc.pisaPageFieldsUsed = True
+                if frag.pageNumber:
+                    frag.text = str(pagenumber)
+                else:
+                    frag.text = doc.pageCountText()
+
+            frame_copy.addFromList(story, canvas)
+
+    def drawStaticForm(self, frame, canvas: Canvas) -> bool:
+        """
+        Draw a static frame that doesn't depend on the page as a form XObject.
+
+        The frame is laid out once, on the first page it appears on, and the
+        following pages only reference the form. Returns False if the frame
+        has to be laid out again on this page.
+        """
+        if self._staticFormsCanvas is not canvas:
+            # Every pass of a multiBuild draws on a new canvas
+            self._staticForms = {}
+            self._staticFormsCanvas = canvas
+        if id(frame) not in self._staticForms:
+            self._staticForms[id(frame)] = self._makeStaticForm(frame, canvas)
+        name = self._staticForms[id(frame)]
+        if name is None:
+            return False
+        canvas.doForm(name)
+        return True
+
+    @staticmethod
+    def _makeStaticForm(frame, canvas: Canvas) -> str | None:
+        if any(pageFieldFrags(frame.pisaStaticStory)):
+            return None
+        number = getattr(canvas, "pisaStaticFormCount", 0) + 1
+        canvas.pisaStaticFormCount = number
+        name = f"pisaStatic{number}"
+        annotations = canvas._annotationCount
+        canvas.beginForm(name)
+        try:
+            frame_copy = copy.deepcopy(frame)
+            frame_copy.addFromList(frame_copy.pisaStaticStory, canvas)
+        except Exception:
+            # Anchors can't be set inside of a form
+            log.debug("PmlPageTemplate", exc_info=True)
+            return None
+        finally:
+            canvas.endForm()
+        if canvas._annotationCount != annotations:
+            # Links are annotations of the page, not of the form
+            return None
+        return name
+
+
+def pageFieldFrags(objList) -> Iterator:
+    """Yield the page number and page count fragments of the flowables."""
+    for obj in flatten(objList):
+        if isinstance(obj, PmlParagraph):
+            for frag in obj.frags:
+                if frag.pageNumber or frag.pageCount:
+                    yield frag
+
+        elif isinstance(obj, PmlTable):
+            # Flatten the cells ([[1,2], [3,4]] becomes [1,2,3,4])
+            yield from pageFieldFrags(
+                [item for sublist in obj._cellvalues for item in sublist]
+            )
+
 
 _ctr: int = 1
 
@@ -362,9 +607,9 @@ class PmlImageReader:  # TODO We need a factory here, returning either a class f
             return ImageIO.read(input_stream)
         return PILImage.open(fp)
 
-    def _jpeg_fh(self) -> BytesIO | StringIO | None:
+    def _jpeg_fh(self) -> BytesIO | StringIO | BufferReader | None:
         fp = self.fp
-        if isinstance(fp, (BytesIO, StringIO)):
+        if isinstance(fp, (BytesIO, StringIO, BufferReader)):
             fp.seek(0)
         return fp
 
@@ -449,16 +694,24 @@ class PmlImageReader:  # TODO We need a factory here, returning either a class f
             return None
 
     def __str__(self) -> str:
-        if isinstance(self.fileName, (PmlImage, Image, BytesIO)):
+        if isinstance(self.fileName, (PmlImage, Image, BytesIO, BufferReader)):
             fn = self.fileName.read() or id(self)
             return f"PmlImageObject_{hash(fn)}"
         return str(self.fileName or id(self))
 
 
 class PmlImage(Flowable, PmlMaxHeightMixIn):
+    # Bytes of data and pixels of the decoded images shared by all documents
+    SHARED_IMAGES_MAX_SIZE: ClassVar[int] = 64 * 1024 * 1024
+    _sharedImages: ClassVar[OrderedDict[bytes, tuple[PmlImageReader, int]]] = (
+        OrderedDict()
+    )
+    _sharedImagesSize: ClassVar[int] = 0
+    _sharedImagesLock: ClassVar[threading.Lock] = threading.Lock()
+
     def __init__(
         self,
-        data: pisaFileObject | pisaTempFile | bytes,
+        data: pisaFileObject | pisaTempFile | bytes | memoryview,
         src: str | None = None,
         width: int | None = None,
         height: int | None = None,
@@ -469,13 +722,14 @@ class PmlImage(Flowable, PmlMaxHeightMixIn):
         self.kw: dict = kw
         self.hAlign: str = "CENTER"
         self._mask: str = mask
-        self._imgdata: bytes = b""
-        if isinstance(data, bytes):
+        # A view of a file mapped to memory is read in place
+        self._imgdata: bytes | memoryview = b""
+        if isinstance(data, (bytes, memoryview)):
             self._imgdata = data
         elif isinstance(data, pisaTempFile):
             self._imgdata = data.getvalue()
         elif isinstance(data, pisaFileObject):
-            self._imgdata = data.getData() or b""
+            self._imgdata = data.getBuffer() or b""
         self.src: str | None = src
         # print "###", repr(data)
         self.mimetype: str | None = mimetype
@@ -499,6 +753,7 @@ class PmlImage(Flowable, PmlMaxHeightMixIn):
         self.drawWidth: float = width or self.imageWidth
         self.drawHeight: float = height or self.imageHeight
 
+    @measured
     def wrap(self, availWidth, availHeight):
         """
         Resize the image if necessary.
@@ -523,7 +778,7 @@ class PmlImage(Flowable, PmlMaxHeightMixIn):
         """If this image is a vector image and the library is available, returns a ReportLab Drawing."""
         if svg2rlg:
             try:
-                drawing = svg2rlg(BytesIO(self._imgdata))
+                drawing = svg2rlg(self.openData())
             except Exception:
                 return None
             if drawing:
@@ -544,11 +799,17 @@ class PmlImage(Flowable, PmlMaxHeightMixIn):
                 except ZeroDivisionError:
                     log.warning(
                         "SVG drawing could not be resized: %r",
-                        self.src or self._imgdata[:50],
+                        self.src or bytes(self._imgdata[:50]),
                     )
                 return drawing
         return None
 
+    def openData(self) -> BytesIO | BufferReader:
+        """A file reading the image data."""
+        if isinstance(self._imgdata, bytes):
+            return BytesIO(self._imgdata)
+        return BufferReader(self._imgdata)
+
     def getDrawingRaster(self) -> BytesIO | None:
         """If this image is a vector image and the libraries are available, returns a PNG raster."""
         if svg2rlg and renderPM:
@@ -562,9 +823,47 @@ class PmlImage(Flowable, PmlMaxHeightMixIn):
     def getImage(self) -> PmlImageReader:
         """Return a raster image."""
         vectorRaster = self.getDrawingRaster()
-        imgdata = vectorRaster or BytesIO(self._imgdata)
-        return PmlImageReader(imgdata)
-
+        if vectorRaster is not None:
+            return PmlImageReader(vectorRaster)
+        if isinstance(self._imgdata, bytes):
+            return self.getSharedImage(self._imgdata)
+        return PmlImageReader(self.openData())
+
+    @classmethod
+    def getSharedImage(cls, data: bytes) -> PmlImageReader:
+        """
+        The raster image of data, decoded once for all the images with the
+        same data, e.g. a logo in a data URI, in all documents.
+        """
+        with cls._sharedImagesLock:
+            entry = cls._sharedImages.get(data)
+            if entry is not None:
+                cls._sharedImages.move_to_end(data)
+                return entry[0]
+
+        img = PmlImageReader(BytesIO(data))
+        if img.jpeg_fh() is not None:
+            # Embedded as read from the file, which can't be shared
+            return img
+        try:
+            # Decoded before it's shared, it's only read then
+            size = len(data) + len(img.getRGBData())
+            if img._dataA is not None:
+                size += len(img._dataA.getRGBData())
+        except Exception:
+            # Fails again when drawn, like before
+            return img
+
+        with cls._sharedImagesLock:
+            if data not in cls._sharedImages and size <= cls.SHARED_IMAGES_MAX_SIZE:
+                cls._sharedImages[data] = (img, size)
+                PmlImage._sharedImagesSize += size
+                while PmlImage._sharedImagesSize > cls.SHARED_IMAGES_MAX_SIZE:
+                    _data, (_img, evicted) = cls._sharedImages.popitem(last=False)
+                    PmlImage._sharedImagesSize -= evicted
+        return img
+
+    @measured
     def draw(self) -> None:
         # TODO this code should work, but untested
         # drawing = self.getDrawing(self.dWidth, self.dHeight)
@@ -577,14 +876,24 @@ class PmlImage(Flowable, PmlMaxHeightMixIn):
     def identity(self, maxLen=None):
         return Flowable.identity(self, maxLen)
 
+    def __deepcopy__(self, memo: dict) -> PmlImage:
+        # The copies share the data, views of mapped files can't be copied
+        memo[id(self._imgdata)] = self._imgdata
+        clone = copy.copy(self)
+        memo[id(self)] = clone
+        clone.__dict__.update(copy.deepcopy(self.__dict__, memo))
+        return clone
+
 
 class PmlParagraphAndImage(ParagraphAndImage, PmlMaxHeightMixIn):
+    @measured
     def wrap(self, availWidth, availHeight):
         self.I.canv = self.canv
         result = ParagraphAndImage.wrap(self, availWidth, availHeight)
         del self.I.canv
         return result
 
+    @measured
     def split(self, availWidth, availHeight):
         # print "# split", id(self)
         if not hasattr(self, "wI"):
@@ -595,6 +904,53 @@ class PmlParagraphAndImage(ParagraphAndImage, PmlMaxHeightMixIn):
 
 
 class PmlParagraph(Paragraph, PmlMaxHeightMixIn):
+    # Number of line breaking results kept per paragraph
+    BREAK_LINES_CACHE_SIZE: int = 8
+
+    def _breakLinesKey(self, width) -> tuple:
+        """
+        Everything the result of breakLines depends on besides text and style:
+        the available widths, the (already reduced) inline image sizes and
+        the current text of page number and page count fragments.
+        """
+        images = []
+        pages = []
+        for frag in self.frags:
+            cbDefn = getattr(frag, "cbDefn", None)
+            if getattr(cbDefn, "kind", None) == "img":
+                images.append((cbDefn.width, cbDefn.height))
+            elif getattr(frag, "pageNumber", False) or getattr(
+                frag, "pageCount", False
+            ):
+                pages.append(str(frag.text))
+        widths = tuple(width) if isinstance(width, (list, tuple)) else (width,)
+        return (widths, getattr(self, "autoLeading", None), tuple(images), tuple(pages))
+
+    def _cachedBreakLines(self, func, width):
+        """
+        ReportLab wraps the same paragraph several times with the same width
+        (KeepInFrame, table cell sizing, frame retries, multiBuild), so keep
+        the result of the last line breaking runs.
+        """
+        if getattr(self, "_splitpara", 0):
+            return func(self, width)
+        key = self._breakLinesKey(width)
+        cache = self.__dict__.setdefault("_blParaCache", {})
+        if key in cache:
+            blPara, self.width = cache[key]
+            return blPara
+        blPara = func(self, width)
+        if len(cache) >= self.BREAK_LINES_CACHE_SIZE:
+            del cache[next(iter(cache))]
+        cache[key] = (blPara, self.width)
+        return blPara
+
+    def breakLines(self, width):
+        return self._cachedBreakLines(Paragraph.breakLines, width)
+
+    def breakLinesCJK(self, width):
+        return self._cachedBreakLines(Paragraph.breakLinesCJK, width)
+
     def _calcImageMaxSizes(self, availWidth, availHeight):
         self.hasImages = False
         for frag in self.frags:
@@ -612,6 +968,7 @@ class PmlParagraph(Paragraph, PmlMaxHeightMixIn):
                     img.height *= factor
                     img.width *= factor
 
+    @measured
     def wrap(self, availWidth, availHeight):
         availHeight = self.setMaxHeight(availHeight)
 
@@ -650,6 +1007,7 @@ class PmlParagraph(Paragraph, PmlMaxHeightMixIn):
 
         return self.width, self.height
 
+    @measured
     def split(self, availWidth, availHeight):
         if len(self.frags) <= 0:
             return []
@@ -663,6 +1021,7 @@ class PmlParagraph(Paragraph, PmlMaxHeightMixIn):
 
         return Paragraph.split(self, availWidth, availHeight)
 
+    @measured
     def draw(self):
         # Create outline
         if getattr(self, "outline", False):
@@ -779,15 +1138,111 @@ class PmlParagraph(Paragraph, PmlMaxHeightMixIn):
 
 
 class PmlKeepInFrame(KeepInFrame, PmlMaxHeightMixIn):
+    # Wraps of the content searching the scale to shrink it by, and how close
+    # the scale found has to be to the smallest one fitting
+    SHRINK_STEPS: int = 6
+    SHRINK_PRECISION: float = 0.02
+
+    def __init__(self, maxWidth, maxHeight, *args, **kwargs) -> None:
+        super().__init__(maxWidth, maxHeight, *args, **kwargs)
+        # Limits of the size, tables limit the content to the cell instead
+        self._maxSize = (maxWidth, maxHeight)
+        # Scale the content was shrunk by for a size
+        self._shrinkScales: dict[tuple[float, float], float] = {}
+
+    @measured
     def wrap(self, availWidth, availHeight):
         availWidth = max(availWidth, 1.0)
         availHeight = max(availHeight, 1.0)
-        self.maxWidth = availWidth
+        maxWidth, maxHeight = self._maxSize
+        self.maxWidth = min(maxWidth or availWidth, availWidth)
         self.maxHeight = self.setMaxHeight(availHeight)
+        if maxHeight:
+            self.maxHeight = min(maxHeight, self.maxHeight)
+        if self.mode == "shrink":
+            return self._shrinkWrap(self.maxWidth, min(self.maxHeight, availHeight))
         return KeepInFrame.wrap(self, availWidth, availHeight)
 
+    def _wrapScaled(self, scale: float, maxWidth: float) -> tuple[float, float]:
+        """Wrap the content shrunk by scale, return its size after shrinking."""
+        W, H = _listWrapOn(
+            self._content, scale * maxWidth, self.canv, fakeWidth=self.fakeWidth
+        )
+        return W / scale, H / scale
+
+    def _shrinkWrap(self, maxWidth: float, maxHeight: float) -> tuple[float, float]:
+        """
+        Wrap the content shrunk to fit into maxWidth and maxHeight.
+
+        The scale is estimated from the first measurement, assuming the
+        content flows like text and takes 1/s² of the height when shrunk by s.
+        Further trials refine the exponent from the measurements and
+        interpolate between the largest scale known to overflow and the
+        smallest known to fit, for a bounded number of steps. Trial widths
+        repeat when the frame is wrapped again, so paragraphs reuse their
+        memoized line breaks; the scale found is kept per size.
+        """
+
+        def overflow(size: tuple[float, float]) -> float:
+            return max(
+                (size[0] - _FUZZ) / maxWidth, (size[1] - _FUZZ) / max(maxHeight, 1.0)
+            )
+
+        # Sizes differ by rounding errors between sizing and drawing table cells
+        key = (round(maxWidth, 2), round(maxHeight, 2))
+        scale = self._shrinkScales.get(key)
+        if scale is None or overflow(size := self._wrapScaled(scale, maxWidth)) > 1:
+            scale = 1.0
+            size = self._wrapScaled(scale, maxWidth)
+        if overflow(size) > 1:
+            W, H = size
+            first = lo = overflow(size)
+            lo_scale = 1.0
+            hi = hi_scale = None
+            target = 1 - self.SHRINK_PRECISION / 2
+            scale = max(W / maxWidth, (H / maxHeight) ** 0.5)
+            if first - scale <= first * self.SHRINK_PRECISION:
+                # Little overflow, shrinking by all of it fits and wastes little
+                scale = first
+            for _step in range(self.SHRINK_STEPS):
+                size = self._wrapScaled(scale, maxWidth)
+                if overflow(size) > 1:
+                    lo, lo_scale = overflow(size), scale
+                else:
+                    hi, hi_scale = overflow(size), scale
+                    if (
+                        hi >= target
+                        or hi_scale - lo_scale <= hi_scale * self.SHRINK_PRECISION
+                    ):
+                        break
+                if hi_scale is None:
+                    # Extrapolate with the exponent seen so far, at most up to
+                    # the scale the overflowing height alone needs
+                    power = min(max(math.log(first / lo) / math.log(lo_scale), 1), 2)
+                    scale = lo_scale * min((lo / target) ** (1 / power), lo)
+                else:
+                    # Interpolate, but keep off the bounds
+                    t = math.log(lo / target) / math.log(lo / max(hi, 1e-6))
+                    scale = lo_scale * (hi_scale / lo_scale) ** min(max(t, 0.1), 0.9)
+            if hi_scale is None:
+                return KeepInFrame.wrap(self, maxWidth, maxHeight)
+            if scale != hi_scale:
+                scale = hi_scale
+                size = self._wrapScaled(scale, maxWidth)
+            self._shrinkScales[key] = scale
+        self._scale = scale
+        self.width = size[0] - _FUZZ
+        self.height = size[1] - _FUZZ
+        return self.width, self.height
+
 
 class PmlTable(Table, PmlMaxHeightMixIn):
+    # Set for tables with "table-layout: fixed": the height of cells holding a
+    # single line of text is measured once per column width and fonts
+    fixedLayout: bool = False
+    # Style commands of the table, after merging the ones of its cells
+    styleCount: int = 0
+
     @staticmethod
     def _normWidth(w, maxw):
         """Normalize width when using percentages."""
@@ -797,12 +1252,100 @@ class PmlTable(Table, PmlMaxHeightMixIn):
             w = maxw
         return min(w, maxw)
 
+    @staticmethod
+    def _cellHeightKey(V, aW) -> tuple | None:
+        """
+        Everything the size of a cell depends on if its content is a single
+        line paragraph, None if it may be more than one line or contains
+        anything else than text.
+        """
+        if len(V) != 1 or not isinstance(V[0], PmlKeepInFrame):
+            return None
+        content = V[0]._content
+        if not content:
+            return (aW,)
+        if len(content) != 1 or not isinstance(content[0], PmlParagraph):
+            return None
+        para = content[0]
+        style = para.style
+        if style.wordWrap == "CJK":
+            return None
+        fonts = set()
+        spaces = 0
+        textWidth = 0
+        for frag in para.frags:
+            text = frag.text
+            if (
+                not isinstance(text, str)
+                or hasattr(frag, "cbDefn")
+                or hasattr(frag, "lineBreak")
+                or getattr(frag, "pageNumber", False)
+                or getattr(frag, "pageCount", False)
+            ):
+                return None
+            if text:
+                fonts.add((frag.fontName, frag.fontSize))
+                words = text.split()
+                spaces += len(text) - sum(map(len, words))
+                textWidth += stringWidth("".join(words), frag.fontName, frag.fontSize)
+        # Words are separated by the space of any of the fonts
+        textWidth += spaces * max(
+            (stringWidth(" ", *font) for font in fonts), default=0
+        )
+        maxWidth = (
+            aW
+            - style.paddingLeft
+            - style.paddingRight
+            - style.borderLeftWidth
+            - style.borderRightWidth
+            - style.leftIndent
+            - style.firstLineIndent
+            - style.rightIndent
+        )
+        # Leave a point for differences between the spacing of words
+        if not fonts or textWidth + 1 > maxWidth:
+            return None
+        return (
+            aW,
+            len(para.frags) == 1,
+            frozenset(fonts),
+            style.fontSize,
+            style.leading,
+            style.paddingTop
+            + style.paddingBottom
+            + style.borderTopWidth
+            + style.borderBottomWidth,
+        )
+
     def _listCellGeom(self, V, w, s, W=None, H=None, aH=72000):
         # print "#", self.availHeightValue
         if aH == 72000:
             aH = self.getMaxHeight() or aH
-        return Table._listCellGeom(self, V, w, s, W=W, H=H, aH=aH)
-
+        if not self.fixedLayout or W is not None or H is not None:
+            return Table._listCellGeom(self, V, w, s, W=W, H=H, aH=aH)
+
+        # Sizing a cell of a fixed layout table, skip wrapping cells of the
+        # same size as a cell measured before
+        key = self._cellHeightKey(V, w - s.leftPadding - s.rightPadding)
+        cellHeights = self.__dict__.setdefault("_cellHeights", {})
+        size = cellHeights.get(key)
+        if size is not None and size[1] <= aH - s.topPadding - s.bottomPadding:
+            return size
+        size = Table._listCellGeom(self, V, w, s, aH=aH)
+        if (
+            key is not None
+            and size[1] <= aH - s.topPadding - s.bottomPadding
+            and (len(key) == 1 or len(V[0]._content[0].blPara.lines) == 1)
+        ):
+            cellHeights[key] = size
+        return size
+
+    def onSplit(self, T, byRow=1):
+        # The parts of a split table share the measured cell sizes
+        T.fixedLayout = self.fixedLayout
+        T._cellHeights = self.__dict__.setdefault("_cellHeights", {})
+
+    @measured
     def wrap(self, availWidth, availHeight):
         self.setMaxHeight(availHeight)
 
@@ -851,6 +1394,14 @@ class PmlTable(Table, PmlMaxHeightMixIn):
 
         return Table.wrap(self, availWidth, availHeight)
 
+    @measured
+    def split(self, availWidth, availHeight):
+        return Table.split(self, availWidth, availHeight)
+
+    @measured
+    def draw(self):
+        Table.draw(self)
+
 
 class PmlPageCount(IndexingFlowable):
     def __init__(self) -> None:
@@ -867,6 +1418,25 @@ class PmlPageCount(IndexingFlowable):
 
 
 class PmlTableOfContents(TableOfContents):
+    # Entries are expected from the story and page numbers drawn after the
+    # last page, see PmlBaseDoc.deferredBuild
+    deferred: bool = False
+
+    def deferEntries(self, story: list[Flowable]) -> None:
+        self.deferred = True
+        self.clearEntries()
+        self._lastEntries = [
+            (flowable.outlineLevel, html_escape(flowable.text, quote=True), None)
+            for flowable in story
+            if getattr(flowable, "outline", False)
+        ]
+
+    def isDeferredSatisfied(self) -> bool:
+        return [entry[:2] for entry in self._entries] == [
+            entry[:2] for entry in self._lastEntries
+        ]
+
+    @measured
     def wrap(self, availWidth, availHeight):
         """All table properties should be known by now."""
         widths = (availWidth - self.rightColumnWidth, self.rightColumnWidth)
@@ -911,7 +1481,10 @@ class PmlTableOfContents(TableOfContents):
                 alignment=TA_RIGHT,
             )
             leftPara = Paragraph(text, leftColStyle)
-            rightPara = Paragraph(str(pageNum), rightColStyle)
+            if self.deferred and self._lastEntries:
+                rightPara = PmlTOCPageNumber(self, i, rightColStyle)
+            else:
+                rightPara = Paragraph(str(pageNum), rightColStyle)
             tableData.append([leftPara, rightPara])
 
         self._table = Table(tableData, colWidths=widths, style=TableStyle(tableStyle))
@@ -920,11 +1493,51 @@ class PmlTableOfContents(TableOfContents):
         return self.width, self.height
 
 
+class PmlTOCPageNumber(Flowable):
+    """
+    Page number of a table of contents entry, laid out like a paragraph with
+    one digit and drawn after the last page.
+    """
+
+    def __init__(self, toc: PmlTableOfContents, index: int, style) -> None:
+        super().__init__()
+        self.toc = toc
+        self.index = index
+        self.style = style
+        self._para = Paragraph("0", style)
+
+    def wrap(self, availWidth, availHeight):
+        self.availWidth = availWidth
+        self.availHeight = availHeight
+        self.width, self.height = self._para.wrap(availWidth, availHeight)
+        return self.width, self.height
+
+    def drawOn(self, canvas, x, y, _sW=0):
+        self._pos = (canvas._currentMatrix, x, y, _sW)
+        canvas._doctemplate.deferDrawing(self)
+
+    def _pageParagraph(self) -> Paragraph:
+        para = Paragraph(str(self.toc._entries[self.index][2]), self.style)
+        para.wrap(self.availWidth, self.availHeight)
+        return para
+
+    def isDeferredSatisfied(self) -> bool:
+        return self._pageParagraph().height == self.height
+
+    def drawDeferred(self, canvas) -> None:
+        matrix, x, y, sW = self._pos
+        canvas.saveState()
+        canvas.transform(*matrix)
+        self._pageParagraph().drawOn(canvas, x, y, sW)
+        canvas.restoreState()
+
+
 class PmlRightPageBreak(CondPageBreak):
     def __init__(self) -> None:
         pass
 
     def wrap(self, availWidth, availHeight):
+        self.canv._doctemplate.pisaPageFieldsUsed = True
         if not self.canv.getPageNumber() % 2:
             self.width = availWidth
             self.height = availHeight
@@ -938,6 +1551,7 @@ class PmlLeftPageBreak(CondPageBreak):
         pass
 
     def wrap(self, availWidth, availHeight):
+        self.canv._doctemplate.pisaPageFieldsUsed = True
         if self.canv.getPageNumber() % 2:
             self.width = availWidth
             self.height = availHeight